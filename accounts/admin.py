@@ -1,14 +1,30 @@
 # accounts/admin.py
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from .models import User
+from django.contrib.auth.forms import AdminPasswordChangeForm
+from stax_api.partial_saves import PartialSaveAdminMixin
+from .models import LeaderboardSnapshot, PointsTransaction, User
+
+
+class PasswordOnlyChangeForm(AdminPasswordChangeForm):
+    """AdminPasswordChangeForm that writes the password column alone"""
+
+    def save(self, commit=True):
+        user = super().save(commit=False)
+        if commit:
+            user.save(update_fields=['password'])
+        return user
+
 
 @admin.register(User)
-class UserAdmin(BaseUserAdmin):
+class UserAdmin(PartialSaveAdminMixin, BaseUserAdmin):
     list_display = ['email', 'full_name', 'university', 'points', 'role', 'is_verified', 'created_at']
     list_filter = ['role', 'is_verified', 'university']
     search_fields = ['email', 'full_name', 'university']
     ordering = ['-created_at']
+    # Changed only through add_points()/deduct_points(), which journal every change
+    readonly_fields = ['points']
+    change_password_form = PasswordOnlyChangeForm
     
     fieldsets = (
         (None, {'fields': ('email', 'password')}),
@@ -23,4 +39,22 @@ class UserAdmin(BaseUserAdmin):
             'classes': ('wide',),
             'fields': ('email', 'full_name', 'username', 'password1', 'password2'),
         }),
-    )
\ No newline at end of file
+    )
+
+@admin.register(PointsTransaction)
+class PointsTransactionAdmin(admin.ModelAdmin):
+    list_display = ['user', 'amount', 'reason', 'note', 'created_at']
+    list_filter = ['reason']
+    search_fields = ['user__email', 'note']
+    ordering = ['-created_at']
+    list_select_related = ['user']
+    raw_id_fields = ['user']
+
+
+@admin.register(LeaderboardSnapshot)
+class LeaderboardSnapshotAdmin(admin.ModelAdmin):
+    list_display = ['board', 'rank', 'user', 'points', 'taken_at']
+    list_filter = ['board']
+    ordering = ['-taken_at', 'board', 'rank']
+    list_select_related = ['user']
+    raw_id_fields = ['user']
@@ -0,0 +1,202 @@
+# accounts/authentication.py
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.functional import cached_property
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+
+from stax_api.db_routers import use_primary
+
+from .models import User
+from .tokens import CLAIM_FIELDS, claims_digest, password_fingerprint
+
+DEFAULTS = {
+    'STATUS_CACHE_ALIAS': 'default',
+    # Upper bound on how long another worker may keep accepting tokens of a
+    # deactivated user or changed password (this process is told at once)
+    'STATUS_TTL': 60,
+    'KEY_PREFIX': 'auth:status',
+}
+
+
+def auth_settings():
+    return {**DEFAULTS, **getattr(settings, 'STAX_AUTH', {})}
+
+
+def _status_key(user_id):
+    return f"{auth_settings()['KEY_PREFIX']}:{user_id}"
+
+
+def user_status(user_id):
+    """
+    Active flag, password fingerprint and claims digest of a user, or None if
+    the user does not exist. Cached for STATUS_TTL seconds.
+    """
+    config = auth_settings()
+    cache = caches[config['STATUS_CACHE_ALIAS']]
+    key = _status_key(user_id)
+    status = cache.get(key)
+    if status is None:
+        # From the primary: a lagging replica would re-cache a revoked password
+        with use_primary():
+            row = User.objects.filter(pk=user_id).values('is_active', 'password', *CLAIM_FIELDS).first()
+        status = {} if row is None else {
+            'active': row['is_active'],
+            'password': password_fingerprint(row['password']),
+            'claims': claims_digest(row),
+        }
+        cache.set(key, status, config['STATUS_TTL'])
+    return status or None
+
+
+def invalidate_user_status(user_id):
+    caches[auth_settings()['STATUS_CACHE_ALIAS']].delete(_status_key(user_id))
+
+
+class ClaimsUser(TokenUser):
+    """
+    Request user built from token claims. The User row is only loaded when
+    something outside the claims is read, or through materialize().
+    """
+
+    @cached_property
+    def id(self):
+        return int(self.token[api_settings.USER_ID_CLAIM])
+
+    @cached_property
+    def pk(self):
+        return self.id
+
+    @cached_property
+    def role(self):
+        return self.token.get('role')
+
+    @cached_property
+    def is_verified(self):
+        return self.token.get('is_verified', False)
+
+    @cached_property
+    def university(self):
+        return self.token.get('university')
+
+    @cached_property
+    def instance(self):
+        # Materialized users are about to be modified, so read the current row
+        with use_primary():
+            return User.objects.get(pk=self.id)
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.instance, name)
+
+    # TokenUser answers these from the token alone (an empty username, no
+    # groups or permissions); a request user must behave like the User row
+
+    def __str__(self):
+        return str(self.instance)
+
+    def __eq__(self, other):
+        if not isinstance(other, (User, TokenUser)):
+            return NotImplemented
+        return other.pk is not None and self.pk == other.pk
+
+    def __hash__(self):
+        return hash(self.pk)
+
+    @cached_property
+    def username(self):
+        return self.instance.username
+
+    def get_username(self):
+        return self.instance.get_username()
+
+    @property
+    def groups(self):
+        return self.instance.groups
+
+    @property
+    def user_permissions(self):
+        return self.instance.user_permissions
+
+    def get_group_permissions(self, obj=None):
+        return self.instance.get_group_permissions(obj)
+
+    def get_all_permissions(self, obj=None):
+        return self.instance.get_all_permissions(obj)
+
+    def has_perm(self, perm, obj=None):
+        return self.instance.has_perm(perm, obj)
+
+    def has_perms(self, perm_list, obj=None):
+        return self.instance.has_perms(perm_list, obj)
+
+    def has_module_perms(self, app_label):
+        return self.instance.has_module_perms(app_label)
+
+    def check_password(self, raw_password):
+        return self.instance.check_password(raw_password)
+
+    def set_password(self, raw_password):
+        self.instance.set_password(raw_password)
+
+    def save(self, *args, **kwargs):
+        self.instance.save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        return self.instance.delete(*args, **kwargs)
+
+
+def materialize(user):
+    """The User model instance behind a request user"""
+    return user.instance if isinstance(user, ClaimsUser) else user
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication without the per-request user query.
+
+    Tokens issued by ClaimsRefreshToken are checked against the cached
+    user_status() instead of the User row: inactive users and tokens minted
+    before a password change are rejected, and tokens whose claims no longer
+    match (e.g. after a role change) fall back to the full user lookup.
+    Tokens without claims are handled exactly like JWTAuthentication.
+    """
+
+    def get_user(self, validated_token):
+        if not all(field in validated_token for field in CLAIM_FIELDS):
+            return super().get_user(validated_token)
+        try:
+            user_id = int(validated_token[api_settings.USER_ID_CLAIM])
+        except (KeyError, TypeError, ValueError):
+            raise InvalidToken('Token contained no recognizable user identification')
+
+        status = user_status(user_id)
+        if status is None:
+            raise AuthenticationFailed('User not found', code='user_not_found')
+        if not status['active']:
+            raise AuthenticationFailed('User is inactive', code='user_inactive')
+        if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != status['password']:
+            raise AuthenticationFailed("The user's password has been changed.", code='password_changed')
+        if claims_digest(validated_token) != status['claims']:
+            return super().get_user(validated_token)
+        return ClaimsUser(validated_token)
+
+
+def get_request_user(request):
+    """
+    Resolve the bearer-token user for plain Django (non-DRF) views.
+
+    Only the Authorization header is honoured: those views are csrf_exempt,
+    so falling back to the session cookie would open them to CSRF.
+    Returns None for anonymous or invalid requests.
+    """
+    try:
+        result = StatelessJWTAuthentication().authenticate(request)
+    except (InvalidToken, TokenError, AuthenticationFailed):
+        return None
+    return result[0] if result else None
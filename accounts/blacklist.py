@@ -0,0 +1,157 @@
+# accounts/blacklist.py
+
+import hashlib
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+DEFAULTS = {
+    'ERROR_RATE': 0.001,     # share of unknown tokens that still reach the DB
+    'MIN_CAPACITY': 10000,
+    # Seconds between catch-ups with tokens blacklisted by other workers,
+    # whatever the shared stamp says; tokens issued more recently than this
+    # are always checked against the database
+    'SYNC_INTERVAL': 30,
+    # Must be shared by every worker (redis, file); with a per-process cache
+    # the filter is not used and every check goes to the database
+    'CACHE_ALIAS': 'default',
+    'KEY_PREFIX': 'blacklist',
+}
+
+LOAD_BATCH_SIZE = 5000
+# Ids below the last one seen that are read again on every catch-up, for
+# transactions that committed out of id order
+SYNC_LOOKBACK = 100
+
+
+def blacklist_settings():
+    return {**DEFAULTS, **getattr(settings, 'STAX_TOKEN_BLACKLIST', {})}
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings (no false negatives)"""
+
+    def __init__(self, capacity, error_rate):
+        self.capacity = max(int(capacity), 1)
+        self.size = max(int(-self.capacity * math.log(error_rate) / math.log(2) ** 2), 8)
+        self.hashes = max(round(self.size / self.capacity * math.log(2)), 1)
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, value):
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, value):
+        positions = self._positions(value)
+        if all(self.bits[position >> 3] & (1 << (position & 7)) for position in positions):
+            return
+        for position in positions:
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, value):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
+
+
+class BlacklistFilter:
+    """
+    Bloom filter of the JTIs of unexpired blacklisted tokens.
+
+    Built from the database on first use and kept current from three sides:
+    tokens blacklisted in this process are added by a post_save signal,
+    other processes publish the newest BlacklistedToken id in the shared
+    cache, and every SYNC_INTERVAL seconds new rows are read by primary key
+    regardless.
+
+    A positive answer must be confirmed against the database. A negative one
+    is only as fresh as the last sync: a token blacklisted by another worker
+    is seen once its stamp reaches the shared cache (after commit), at the
+    latest SYNC_INTERVAL seconds later. Callers therefore use the filter
+    only when shared() is true, and still check freshly issued tokens
+    against the database.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.lock = threading.RLock()
+        self.bloom = None
+        self.last_id = 0
+        self.synced_at = 0
+
+    def _cache(self):
+        return caches[self.config['CACHE_ALIAS']]
+
+    def shared(self):
+        """Whether other workers' stamps can reach this process at all"""
+        return not isinstance(self._cache(), (LocMemCache, DummyCache))
+
+    def _stamp_key(self):
+        return f"{self.config['KEY_PREFIX']}:latest"
+
+    def _rows(self, queryset):
+        return queryset.filter(token__expires_at__gt=timezone.now()).values_list('pk', 'token__jti')
+
+    def load(self):
+        with self.lock:
+            rows = self._rows(BlacklistedToken.objects.all())
+            capacity = max(rows.count() * 2, self.config['MIN_CAPACITY'])
+            bloom = BloomFilter(capacity, self.config['ERROR_RATE'])
+            last_id = 0
+            for pk, jti in rows.order_by('pk').iterator(chunk_size=LOAD_BATCH_SIZE):
+                bloom.add(jti)
+                last_id = max(last_id, pk)
+            self.bloom, self.last_id = bloom, last_id
+            self.synced_at = time.monotonic()
+
+    def sync(self):
+        with self.lock:
+            if self.bloom is None or self.bloom.count > self.bloom.capacity:
+                self.load()
+                return
+            latest = self._cache().get(self._stamp_key()) or 0
+            if latest <= self.last_id and time.monotonic() - self.synced_at < self.config['SYNC_INTERVAL']:
+                return
+            rows = self._rows(BlacklistedToken.objects.filter(pk__gt=self.last_id - SYNC_LOOKBACK)).order_by('pk')
+            for pk, jti in rows.iterator(chunk_size=LOAD_BATCH_SIZE):
+                self.bloom.add(jti)
+                self.last_id = max(self.last_id, pk)
+            # The stamp is published after commit, so everything up to it has been read
+            self.last_id = max(self.last_id, latest)
+            self.synced_at = time.monotonic()
+
+    def add(self, pk, jti):
+        """Record a token blacklisted by this process and tell the others"""
+        with self.lock:
+            if self.bloom is not None:
+                self.bloom.add(jti)
+                if pk == self.last_id + 1:
+                    self.last_id = pk
+        self._cache().set(self._stamp_key(), pk, timeout=None)
+
+    def might_contain(self, jti):
+        with self.lock:
+            self.sync()
+            return jti in self.bloom
+
+
+_filter = None
+_filter_lock = threading.Lock()
+
+
+def get_blacklist_filter():
+    global _filter
+    if _filter is None:
+        with _filter_lock:
+            if _filter is None:
+                _filter = BlacklistFilter(blacklist_settings())
+    return _filter
@@ -0,0 +1,18 @@
+# accounts/hashers.py
+
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+
+class TunedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """
+    PBKDF2-SHA256 with the iteration count taken from
+    STAX_LOGIN['PBKDF2_ITERATIONS'] (Django's default when unset).
+
+    The algorithm name is unchanged, so existing hashes keep verifying and
+    are migrated to the configured count by the login rehash.
+    """
+
+    @property
+    def iterations(self):
+        return getattr(settings, 'STAX_LOGIN', {}).get('PBKDF2_ITERATIONS') or PBKDF2PasswordHasher.iterations
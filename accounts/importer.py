@@ -0,0 +1,329 @@
+# accounts/importer.py
+
+import csv
+import fcntl
+import json
+import os
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.password_validation import validate_password
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import IntegrityError, transaction
+
+from .models import User
+
+DEFAULTS = {
+    # Uploaded CSVs hold passwords, so they are kept outside MEDIA_ROOT
+    'DIRECTORY': '/var/tmp/stax_imports',
+    'CHUNK_SIZE': 1000,
+    'WORKERS': os.cpu_count() or 2,
+    'POLL_INTERVAL': 5,  # seconds the run_user_imports worker sleeps when no job is waiting
+    # Also start API imports on the web process's background threads, for
+    # development setups that do not run the run_user_imports worker
+    'INLINE': False,
+}
+
+COLUMNS = ['email', 'username', 'full_name', 'password', 'university', 'course_of_study', 'phone_number']
+REQUIRED_COLUMNS = ['email', 'username', 'full_name']
+
+
+def import_settings():
+    return {**DEFAULTS, **getattr(settings, 'STAX_USER_IMPORT', {})}
+
+
+@dataclass
+class ImportState:
+    """Progress of one import, saved after every committed chunk"""
+    rows_done: int = 0
+    created: int = 0
+    failed: int = 0
+    finished: bool = False
+    error: str = ''
+    # A run has begun: the chunk after rows_done may already be committed
+    started: bool = False
+    # Length of the errors file covering rows_done (None: not recorded)
+    errors_size: int = None
+
+
+def _read_state(path):
+    try:
+        with open(path) as handle:
+            return ImportState(**json.load(handle))
+    except FileNotFoundError:
+        return ImportState()
+
+
+def _write_state(path, state):
+    # Write-then-rename so a crash never leaves a truncated state file
+    tmp = f'{path}.tmp'
+    with open(tmp, 'w') as handle:
+        json.dump(asdict(state), handle)
+    os.replace(tmp, path)
+
+
+def _clean_row(row, university):
+    """Normalise one CSV row into User fields, raising ValidationError"""
+    data = {column: (row.get(column) or '').strip() for column in COLUMNS}
+    data['email'] = data['email'].lower()
+    data['username'] = data['username'].lower()
+    if university and not data['university']:
+        data['university'] = university
+    missing = [column for column in REQUIRED_COLUMNS if not data[column]]
+    if missing:
+        raise ValidationError(f"Missing {', '.join(missing)}")
+    validate_email(data['email'])
+    User.username_validator(data['username'])
+    for column in COLUMNS:
+        max_length = User._meta.get_field(column).max_length if column != 'password' else None
+        if max_length and len(data[column]) > max_length:
+            raise ValidationError(f'{column} is longer than {max_length} characters')
+    if data['password']:
+        validate_password(data['password'], User(**{k: v for k, v in data.items() if k != 'password'}))
+    return data
+
+
+def _taken(rows):
+    """Emails and usernames from `rows` that already exist, in two queries"""
+    emails = set(User.objects.filter(email__in=[row['email'] for row in rows]).values_list('email', flat=True))
+    usernames = set(
+        User.objects.filter(username__in=[row['username'] for row in rows]).values_list('username', flat=True)
+    )
+    return emails, usernames
+
+
+def _hash(password):
+    # Rows without a password get an unusable one and go through password reset
+    return make_password(password or None)
+
+
+class UserImporter:
+    """
+    Create users from a CSV file (columns: email, username, full_name and
+    optionally password, university, course_of_study, phone_number).
+
+    Rows are validated in Python, checked for uniqueness with one query per
+    column per chunk, hashed on a worker pool and inserted with bulk_create,
+    one transaction per chunk. Rejected rows go to `errors_path` (without the
+    password) and progress is saved to `state_path` after each chunk, so a
+    rerun picks up after the last committed chunk.
+
+    A run that dies between committing a chunk and saving its progress
+    leaves that chunk's users behind; the rerun counts rows whose email and
+    username both match an existing user as created rather than rejecting
+    them, and drops error lines written after the saved progress.
+    """
+
+    def __init__(self, source_path, state_path, errors_path, university='', chunk_size=None,
+                 workers=None, use_processes=True):
+        config = import_settings()
+        self.source_path = source_path
+        self.state_path = state_path
+        self.errors_path = errors_path
+        self.university = university
+        self.chunk_size = chunk_size or config['CHUNK_SIZE']
+        self.workers = workers or config['WORKERS']
+        # Forking a threaded web worker is unsafe, so imports run inside one
+        # use threads instead (hashlib releases the GIL while hashing)
+        self.use_processes = use_processes
+
+    def _chunks(self, reader, skip):
+        chunk = []
+        for number, row in enumerate(reader, start=2):  # line 1 is the header
+            if number - 2 < skip:
+                continue
+            chunk.append((number, row))
+            if len(chunk) == self.chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def _prepare(self, chunk, seen):
+        """Split a chunk into valid User field dicts and (line, row, error) rejects"""
+        valid, rejected = [], []
+        for number, row in chunk:
+            try:
+                data = _clean_row(row, self.university)
+            except ValidationError as e:
+                rejected.append((number, row, '; '.join(e.messages)))
+                continue
+            if data['email'] in seen['email'] or data['username'] in seen['username']:
+                rejected.append((number, row, 'Duplicate email or username in file'))
+                continue
+            seen['email'].add(data['email'])
+            seen['username'].add(data['username'])
+            valid.append((number, row, data))
+        return valid, rejected
+
+    def _insert(self, valid, hashes, resumed=False):
+        """
+        Insert one chunk, re-checking uniqueness if a concurrent signup wins
+        a race. With `resumed`, rows already inserted by an interrupted run
+        are counted as created.
+        """
+        already = 0
+        if resumed:
+            pairs = set(
+                User.objects.filter(email__in=[data['email'] for _, _, data in valid])
+                .values_list('email', 'username')
+            )
+            kept = [
+                (item, hashed) for item, hashed in zip(valid, hashes)
+                if (item[2]['email'], item[2]['username']) not in pairs
+            ]
+            already = len(valid) - len(kept)
+            valid, hashes = [item for item, _ in kept], [hashed for _, hashed in kept]
+        for attempt in range(2):
+            emails, usernames = _taken([data for _, _, data in valid])
+            rejected = [
+                (number, row, 'Email already registered' if data['email'] in emails else 'Username already taken')
+                for number, row, data in valid if data['email'] in emails or data['username'] in usernames
+            ]
+            users = [
+                User(password=hashed, **{k: v for k, v in data.items() if k != 'password'})
+                for (_, _, data), hashed in zip(valid, hashes)
+                if data['email'] not in emails and data['username'] not in usernames
+            ]
+            try:
+                with transaction.atomic():
+                    User.objects.bulk_create(users)
+                return already + len(users), rejected
+            except IntegrityError:
+                if attempt:
+                    raise
+
+    def run(self):
+        state = _read_state(self.state_path)
+        if state.finished:
+            return state
+        seen = {'email': set(), 'username': set()}
+        resumed, state.started = state.started, True
+        if state.errors_size is None and not state.rows_done:
+            state.errors_size = 0
+        _write_state(self.state_path, state)
+        if state.errors_size is not None and os.path.exists(self.errors_path):
+            os.truncate(self.errors_path, state.errors_size)
+        pool_class = ProcessPoolExecutor if self.use_processes else ThreadPoolExecutor
+        with open(self.source_path, newline='', encoding='utf-8-sig') as source, \
+                open(self.errors_path, 'a', newline='') as errors_file, \
+                pool_class(self.workers) as pool:
+            reader = csv.DictReader(source)
+            missing = [column for column in REQUIRED_COLUMNS if column not in (reader.fieldnames or [])]
+            if missing:
+                state.error = f"CSV is missing columns: {', '.join(missing)}"
+                state.finished = True
+                _write_state(self.state_path, state)
+                return state
+            errors = csv.writer(errors_file)
+            if errors_file.tell() == 0:
+                errors.writerow(['line', 'email', 'username', 'error'])
+
+            for chunk in self._chunks(reader, state.rows_done):
+                valid, rejected = self._prepare(chunk, seen)
+                hashes = list(pool.map(
+                    _hash, [data['password'] for _, _, data in valid],
+                    chunksize=max(len(valid) // (self.workers * 4), 1),
+                ))
+                created, taken = self._insert(valid, hashes, resumed=resumed)
+                resumed = False
+                rejected += taken
+                for number, row, message in sorted(rejected, key=lambda item: item[0]):
+                    errors.writerow([number, row.get('email', ''), row.get('username', ''), message])
+                errors_file.flush()
+                state.errors_size = errors_file.tell()
+                state.rows_done += len(chunk)
+                state.created += created
+                state.failed += len(rejected)
+                _write_state(self.state_path, state)
+
+        state.finished = True
+        _write_state(self.state_path, state)
+        return state
+
+
+def job_paths(job_id):
+    directory = os.path.join(import_settings()['DIRECTORY'], job_id)
+    return {
+        'directory': directory,
+        'source': os.path.join(directory, 'users.csv'),
+        'job': os.path.join(directory, 'job.json'),
+        'state': os.path.join(directory, 'state.json'),
+        'errors': os.path.join(directory, 'errors.csv'),
+        'lock': os.path.join(directory, 'lock'),
+    }
+
+
+def create_job(upload, university=''):
+    """Store an uploaded CSV and its options; returns the new job id"""
+    job_id = uuid.uuid4().hex
+    paths = job_paths(job_id)
+    os.makedirs(paths['directory'], mode=0o700)
+    with open(paths['source'], 'wb') as handle:
+        for chunk in upload.chunks():
+            handle.write(chunk)
+    with open(paths['job'], 'w') as handle:
+        json.dump({'university': university}, handle)
+    # Written last: a job directory without a state file is still being created
+    _write_state(paths['state'], ImportState())
+    return job_id
+
+
+def pending_jobs():
+    """Ids of jobs not finished yet, oldest first, including ones a dead process left half done"""
+    directory = import_settings()['DIRECTORY']
+    try:
+        entries = sorted(os.scandir(directory), key=lambda entry: entry.stat().st_mtime)
+    except FileNotFoundError:
+        return []
+    return [
+        entry.name for entry in entries
+        if entry.is_dir() and os.path.exists(job_paths(entry.name)['state'])
+        and not _read_state(job_paths(entry.name)['state']).finished
+    ]
+
+
+def run_job(job_id, workers=None, use_processes=True):
+    """
+    Run or resume an API import; deletes the CSV once done. Returns False
+    without doing anything if another process is already running the job.
+    """
+    paths = job_paths(job_id)
+    with open(paths['lock'], 'w') as lock:
+        # Released by the OS if this process dies, so the job can be resumed
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return False
+        try:
+            with open(paths['job']) as handle:
+                options = json.load(handle)
+            UserImporter(paths['source'], paths['state'], paths['errors'], university=options['university'],
+                         workers=workers, use_processes=use_processes).run()
+        except Exception as e:
+            state = _read_state(paths['state'])
+            state.error = str(e)
+            state.finished = True
+            _write_state(paths['state'], state)
+            raise
+        finally:
+            if _read_state(paths['state']).finished and os.path.exists(paths['source']):
+                os.remove(paths['source'])
+    return True
+
+
+def run_job_inline(job_id):
+    """Background task for INLINE mode; threads, as forking a web worker is unsafe"""
+    run_job(job_id, use_processes=False)
+
+
+def job_state(job_id):
+    """ImportState for a job id, or None if there is no such job"""
+    paths = job_paths(job_id)
+    if not os.path.exists(paths['state']):
+        return None
+    return _read_state(paths['state'])
@@ -0,0 +1,320 @@
+# accounts/leaderboard.py
+
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, Sum
+from django.utils import timezone
+
+from .models import PointsTransaction, User
+from .skiplist import SkipList
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'BACKEND': 'memory',  # 'memory' (per process) or 'redis' (shared sorted sets)
+    'REDIS_URL': 'redis://127.0.0.1:6379/2',
+    'KEY_PREFIX': 'leaderboard',
+    'SYNC_INTERVAL': 10,  # memory backend: seconds between journal catch-ups
+}
+
+SYNC_BATCH_SIZE = 5000
+# Ids below the last one applied that are read again on every catch-up, for
+# transactions that committed out of id order
+SYNC_LOOKBACK = 100
+
+
+def leaderboard_settings():
+    return {**DEFAULTS, **getattr(settings, 'STAX_LEADERBOARD', {})}
+
+
+def board_name(kind, university=None):
+    """'global', 'weekly' or 'university:<NORMALIZED NAME>'"""
+    if kind == 'university':
+        return 'university:' + ' '.join((university or '').split()).upper()
+    return kind
+
+
+def week_start(now=None):
+    """Monday 00:00 (local time) of the current week"""
+    today = timezone.localtime(now).date()
+    monday = today - timedelta(days=today.weekday())
+    return timezone.make_aware(datetime.combine(monday, datetime.min.time()))
+
+
+@contextmanager
+def _snapshot():
+    """Run the block's queries against one consistent view of the database"""
+    connection = transaction.get_connection()
+    outermost = not connection.in_atomic_block
+    with transaction.atomic():
+        if outermost and connection.vendor == 'postgresql':
+            # READ COMMITTED would give each query its own snapshot
+            with connection.cursor() as cursor:
+                cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ')
+        yield
+
+
+class Board:
+    """Scores for one ranking, ordered by (points desc, user id asc)"""
+
+    def __init__(self):
+        self.scores = {}
+        self.ranking = SkipList()
+
+    def add(self, user_id, delta):
+        self.set(user_id, self.scores.get(user_id, 0) + delta)
+
+    def set(self, user_id, score):
+        old = self.scores.pop(user_id, None)
+        if old is not None:
+            self.ranking.delete((-old, user_id))
+        if score > 0:
+            self.scores[user_id] = score
+            self.ranking.insert((-score, user_id))
+
+    def top(self, limit, offset=0):
+        return [(user_id, -score) for score, user_id in self.ranking.slice(offset + 1, limit)]
+
+    def rank(self, user_id):
+        score = self.scores.get(user_id)
+        if score is None:
+            return None
+        return self.ranking.rank((-score, user_id)), score
+
+
+class MemoryLeaderboard:
+    """
+    Rankings held in this process, loaded once from User.points and then
+    caught up from the PointsTransaction journal (a primary-key range scan)
+    at most every SYNC_INTERVAL seconds, and right after this process awards
+    points. Every gunicorn worker therefore converges on the same ranking
+    without sharing memory.
+
+    The load reads the journal position and the balances from one snapshot,
+    so no transaction is counted in both. Catch-ups re-read the last
+    SYNC_LOOKBACK ids and skip the ones already applied, so a transaction
+    that commits after a higher id was seen is still picked up once.
+
+    A user's university board score always equals their global score. When
+    a journal entry shows a user under another university (changing it
+    journals a zero-amount entry, see accounts/points.py), the whole score
+    moves to the new board.
+    """
+
+    def __init__(self, sync_interval):
+        self.sync_interval = sync_interval
+        self.lock = threading.RLock()
+        self.boards = None
+        self.week = None
+        self.last_transaction_id = 0
+        # Ids within SYNC_LOOKBACK of last_transaction_id already applied
+        self.recent_ids = set()
+        # user id -> the university board they are on
+        self.universities = {}
+        self.synced_at = 0
+
+    def _board(self, name):
+        if name not in self.boards:
+            self.boards[name] = Board()
+        return self.boards[name]
+
+    def _place(self, user_id, university):
+        """Keep the user's university board in step with their global score"""
+        name = board_name('university', university) if university else None
+        old = self.universities.get(user_id)
+        if old is not None and old != name:
+            self._board(old).set(user_id, 0)
+        if name is None:
+            self.universities.pop(user_id, None)
+            return
+        self.universities[user_id] = name
+        self._board(name).set(user_id, self._board('global').scores.get(user_id, 0))
+
+    def load(self):
+        with self.lock:
+            self.boards = {}
+            self.universities = {}
+            self.week = week_start()
+            with _snapshot():
+                self.last_transaction_id = PointsTransaction.objects.aggregate(last=Max('pk'))['last'] or 0
+                self.recent_ids = set(
+                    PointsTransaction.objects
+                    .filter(pk__gt=self.last_transaction_id - SYNC_LOOKBACK, pk__lte=self.last_transaction_id)
+                    .values_list('pk', flat=True)
+                )
+                users = User.objects.filter(points__gt=0).values_list('pk', 'points', 'university')
+                for user_id, points, university in users.iterator(chunk_size=SYNC_BATCH_SIZE):
+                    self._board('global').add(user_id, points)
+                    self._place(user_id, university)
+                weekly = (
+                    PointsTransaction.objects
+                    .filter(pk__lte=self.last_transaction_id, created_at__gte=self.week)
+                    .values('user_id').annotate(total=Sum('amount'))
+                )
+                for row in weekly:
+                    self._board('weekly').add(row['user_id'], row['total'])
+            self.synced_at = time.monotonic()
+
+    def sync(self, force=False):
+        with self.lock:
+            if self.boards is None or week_start() != self.week:
+                self.load()
+                return
+            if not force and time.monotonic() - self.synced_at < self.sync_interval:
+                return
+            after = self.last_transaction_id - SYNC_LOOKBACK
+            while True:
+                rows = list(
+                    PointsTransaction.objects.filter(pk__gt=after).order_by('pk')
+                    .values_list('pk', 'user_id', 'amount', 'created_at', 'user__university')[:SYNC_BATCH_SIZE]
+                )
+                for pk, user_id, amount, created_at, university in rows:
+                    after = pk
+                    if pk in self.recent_ids:
+                        continue
+                    self._board('global').add(user_id, amount)
+                    self._place(user_id, university)
+                    if created_at >= self.week:
+                        self._board('weekly').add(user_id, amount)
+                    self.recent_ids.add(pk)
+                    self.last_transaction_id = max(self.last_transaction_id, pk)
+                if len(rows) < SYNC_BATCH_SIZE:
+                    break
+            floor = self.last_transaction_id - SYNC_LOOKBACK
+            self.recent_ids = {pk for pk in self.recent_ids if pk > floor}
+            self.synced_at = time.monotonic()
+
+    def record(self, changes):
+        self.sync(force=True)
+
+    def top(self, name, limit, offset=0):
+        self.sync()
+        with self.lock:
+            board = self.boards.get(name)
+            return board.top(limit, offset) if board else []
+
+    def rank(self, name, user_id):
+        self.sync()
+        with self.lock:
+            board = self.boards.get(name)
+            return board.rank(user_id) if board else None
+
+    def rebuild(self):
+        self.load()
+
+
+class RedisLeaderboard:
+    """
+    Rankings in Redis sorted sets shared by every worker. A hash records
+    which university board each user is on, so a user whose university
+    changed takes their whole global score to the new board.
+    """
+
+    def __init__(self, url, prefix):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def _key(self, name):
+        if name == 'weekly':
+            return f'{self.prefix}:weekly:{week_start():%G-W%V}'
+        return f'{self.prefix}:{name}'
+
+    def record(self, changes):
+        """Apply [(user_id, delta)] to every board the users belong to"""
+        if not changes:
+            return
+        user_ids = [user_id for user_id, _ in changes]
+        universities = dict(User.objects.filter(pk__in=user_ids).values_list('pk', 'university'))
+        placed = self._key('universities')
+        pipe = self.client.pipeline(transaction=False)
+        weekly = self._key('weekly')
+        for user_id, delta in changes:
+            pipe.zincrby(self._key('global'), delta, user_id)
+            pipe.zincrby(weekly, delta, user_id)
+        pipe.hmget(placed, user_ids)
+        *scores, boards = pipe.execute()
+        global_scores = scores[::2]
+
+        pipe = self.client.pipeline(transaction=False)
+        for (user_id, delta), score, old in zip(changes, global_scores, boards):
+            old = old.decode() if old else None
+            name = board_name('university', universities[user_id]) if universities.get(user_id) else None
+            if old and old != name:
+                pipe.zrem(self._key(old), user_id)
+            if name is None:
+                pipe.hdel(placed, user_id)
+            elif name == old:
+                pipe.zincrby(self._key(name), delta, user_id)
+            else:
+                # New to this board: it gets the whole score
+                pipe.zadd(self._key(name), {user_id: score})
+                pipe.hset(placed, user_id, name)
+            for key in [self._key('global'), weekly] + ([self._key(name)] if name else []):
+                pipe.zremrangebyscore(key, '-inf', 0)
+        pipe.expire(weekly, 8 * 24 * 3600)
+        pipe.execute()
+
+    def top(self, name, limit, offset=0):
+        rows = self.client.zrevrange(self._key(name), offset, offset + limit - 1, withscores=True)
+        return [(int(member), int(score)) for member, score in rows]
+
+    def rank(self, name, user_id):
+        key = self._key(name)
+        pipe = self.client.pipeline(transaction=False)
+        pipe.zrevrank(key, user_id)
+        pipe.zscore(key, user_id)
+        rank, score = pipe.execute()
+        return None if rank is None else (rank + 1, int(score))
+
+    def rebuild(self):
+        for key in self.client.scan_iter(f'{self.prefix}:*'):
+            self.client.delete(key)
+        users = User.objects.filter(points__gt=0).values_list('pk', 'points', 'university')
+        pipe = self.client.pipeline(transaction=False)
+        for user_id, points, university in users.iterator(chunk_size=SYNC_BATCH_SIZE):
+            pipe.zadd(self._key('global'), {user_id: points})
+            if university:
+                pipe.zadd(self._key(board_name('university', university)), {user_id: points})
+                pipe.hset(self._key('universities'), user_id, board_name('university', university))
+        weekly = (
+            PointsTransaction.objects.filter(created_at__gte=week_start())
+            .values('user_id').annotate(total=Sum('amount'))
+        )
+        for row in weekly:
+            if row['total'] > 0:
+                pipe.zadd(self._key('weekly'), {row['user_id']: row['total']})
+        pipe.execute()
+
+
+_leaderboard = None
+_leaderboard_lock = threading.Lock()
+
+
+def get_leaderboard():
+    """Process-wide leaderboard backend configured from STAX_LEADERBOARD"""
+    global _leaderboard
+    if _leaderboard is None:
+        with _leaderboard_lock:
+            if _leaderboard is None:
+                config = leaderboard_settings()
+                if config['BACKEND'] == 'redis':
+                    _leaderboard = RedisLeaderboard(config['REDIS_URL'], config['KEY_PREFIX'])
+                else:
+                    _leaderboard = MemoryLeaderboard(config['SYNC_INTERVAL'])
+    return _leaderboard
+
+
+def record_points(changes):
+    """Called by accounts/points.py once a points change has committed"""
+    try:
+        get_leaderboard().record(changes)
+    except Exception:
+        logger.exception('Failed to update the leaderboard')
@@ -0,0 +1,189 @@
+# accounts/login.py
+
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from django.conf import settings
+from django.contrib.auth.hashers import (
+    check_password, get_hasher, identify_hasher, make_password, must_update_salt,
+)
+
+from stax_api.tasks import submit
+from .authentication import invalidate_user_status
+from .models import User
+
+DEFAULTS = {
+    # Password verification pool. hashlib releases the GIL while hashing, so
+    # threads use every core. MAX_PENDING caps running + queued checks across
+    # the request threads of one process (see verify_password)
+    'HASH_WORKERS': 4,
+    'MAX_PENDING': 32,
+    'VERIFY_TIMEOUT': 5,  # seconds a request waits for its check
+    'RETRY_AFTER': 2,     # seconds suggested to clients turned away
+    # Token buckets: BURST attempts at once, refilled at PER_MINUTE
+    'IP_BURST': 20,
+    'IP_PER_MINUTE': 20,
+    'ACCOUNT_BURST': 5,
+    'ACCOUNT_PER_MINUTE': 5,
+    'MAX_TRACKED_KEYS': 100000,
+    # Behind a reverse proxy every request comes from the proxy: name the
+    # META key of the header it sets (e.g. 'HTTP_X_FORWARDED_FOR') and how
+    # many trusted proxies append to it, so IP buckets are per client
+    'PROXY_HEADER': None,
+    'TRUSTED_PROXIES': 1,
+    'PBKDF2_ITERATIONS': None,  # see accounts/hashers.py
+}
+
+
+def login_settings():
+    return {**DEFAULTS, **getattr(settings, 'STAX_LOGIN', {})}
+
+
+class LoginBusy(Exception):
+    """The verification pool is saturated; the client should retry shortly"""
+
+
+class RateLimiter:
+    """
+    In-process token buckets keyed by an arbitrary string.
+
+    Each key starts with `burst` tokens and regains `per_minute` tokens per
+    minute. The least recently used keys are dropped beyond `max_keys`, which
+    at worst gives an evicted key a fresh bucket.
+    """
+
+    def __init__(self, burst, per_minute, max_keys):
+        self.burst = burst
+        self.rate = per_minute / 60.0
+        self.max_keys = max_keys
+        self.buckets = OrderedDict()
+        self.lock = threading.Lock()
+
+    def consume(self, key):
+        """Take one token; returns 0 on success or the seconds until one is available"""
+        now = time.monotonic()
+        with self.lock:
+            tokens, updated = self.buckets.pop(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            if tokens >= 1:
+                self.buckets[key] = (tokens - 1, now)
+                wait = 0
+            else:
+                self.buckets[key] = (tokens, now)
+                wait = (1 - tokens) / self.rate if self.rate else 60
+            while len(self.buckets) > self.max_keys:
+                self.buckets.popitem(last=False)
+        return wait
+
+
+_lock = threading.Lock()
+_executor = None
+_slots = None
+_limiters = None
+
+
+def _get_pool():
+    global _executor, _slots
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                config = login_settings()
+                _slots = threading.BoundedSemaphore(config['MAX_PENDING'])
+                _executor = ThreadPoolExecutor(config['HASH_WORKERS'], thread_name_prefix='stax-login')
+    return _executor
+
+
+def _get_limiters():
+    global _limiters
+    if _limiters is None:
+        with _lock:
+            if _limiters is None:
+                config = login_settings()
+                _limiters = (
+                    RateLimiter(config['IP_BURST'], config['IP_PER_MINUTE'], config['MAX_TRACKED_KEYS']),
+                    RateLimiter(config['ACCOUNT_BURST'], config['ACCOUNT_PER_MINUTE'], config['MAX_TRACKED_KEYS']),
+                )
+    return _limiters
+
+
+def client_ip(request):
+    """The client address for per-IP limits, read from PROXY_HEADER when one is configured"""
+    config = login_settings()
+    if config['PROXY_HEADER']:
+        hops = [hop.strip() for hop in request.META.get(config['PROXY_HEADER'], '').split(',') if hop.strip()]
+        # Each trusted proxy appends the address it was reached from; entries
+        # further left come from the client and could be forged
+        if hops and config['TRUSTED_PROXIES'] > 0:
+            return hops[-min(config['TRUSTED_PROXIES'], len(hops))]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def throttle(ip, email):
+    """Seconds the caller must wait before another attempt, or 0"""
+    by_ip, by_account = _get_limiters()
+    return max(by_ip.consume(ip or ''), by_account.consume(email))
+
+
+def _verify(password, encoded):
+    if encoded is None:
+        # Unknown account: hash anyway so the response time gives nothing away
+        make_password(password)
+        return False, False
+    if not check_password(password, encoded):
+        return False, False
+    try:
+        preferred = get_hasher('default')
+        hasher = identify_hasher(encoded)
+    except ValueError:
+        return True, False
+    return True, hasher.algorithm != preferred.algorithm or preferred.must_update(encoded)
+
+
+def verify_password(password, encoded):
+    """
+    Check a password on the hashing pool.
+
+    Returns (valid, needs_rehash). The calling thread waits for the result,
+    so MAX_PENDING only turns requests away in processes that run more
+    login requests at once than that (e.g. gunicorn --threads). Workers that
+    run one request at a time, as sync views under ASGI do, never fill it;
+    there only VERIFY_TIMEOUT applies. Raises LoginBusy when MAX_PENDING
+    checks are already in flight or this one does not finish within
+    VERIFY_TIMEOUT.
+    """
+    executor = _get_pool()
+    if not _slots.acquire(blocking=False):
+        raise LoginBusy
+    future = executor.submit(_verify, password, encoded)
+    future.add_done_callback(lambda f: _slots.release())
+    try:
+        return future.result(timeout=login_settings()['VERIFY_TIMEOUT'])
+    except TimeoutError:
+        future.cancel()
+        raise LoginBusy
+
+
+def rehash_password(user_id, password, encoded):
+    """
+    Re-encode a verified password with the preferred hasher.
+
+    The salt is kept when the hasher allows it so the password fingerprint in
+    issued tokens stays valid. The update only applies if the stored hash is
+    still the one that was verified.
+    """
+    hasher = get_hasher('default')
+    try:
+        salt = identify_hasher(encoded).decode(encoded)['salt']
+    except (ValueError, KeyError):
+        salt = None
+    if not salt or must_update_salt(salt, hasher.salt_entropy):
+        salt = hasher.salt()
+    rehashed = hasher.encode(password, salt)
+    if User.objects.filter(pk=user_id, password=encoded).update(password=rehashed):
+        invalidate_user_status(user_id)
+
+
+def schedule_rehash(user, password):
+    submit(rehash_password, user.pk, password, user.password)
@@ -0,0 +1,30 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+from stax_api.images import image_settings, process_image, renditions_field
+
+
+class Command(BaseCommand):
+    help = 'Build missing or outdated image renditions (avatars, instructor photos, course thumbnails)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4)
+
+    def handle(self, *args, **options):
+        jobs = []
+        for key in image_settings()['RENDITIONS']:
+            app_label, model_name, field_name = key.split('.')
+            model = apps.get_model(app_label, model_name)
+            rows = (
+                model.objects.exclude(**{field_name: ''}).exclude(**{f'{field_name}__isnull': True})
+                .values_list('pk', field_name, renditions_field(field_name))
+            )
+            for pk, name, renditions in rows.iterator():
+                if (renditions or {}).get('source') != name:
+                    jobs.append((model._meta.label, pk, field_name))
+
+        with ThreadPoolExecutor(options['workers']) as pool:
+            list(pool.map(lambda job: process_image(*job), jobs))
+        self.stdout.write(self.style.SUCCESS(f'Processed {len(jobs)} images'))
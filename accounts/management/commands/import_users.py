@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.importer import UserImporter
+
+
+class Command(BaseCommand):
+    help = 'Create users in bulk from a CSV file; rerun with the same arguments to resume'
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_path')
+        parser.add_argument('--university', default='', help='University for rows that leave it blank')
+        parser.add_argument('--chunk-size', type=int, default=None)
+        parser.add_argument('--workers', type=int, default=None, help='Password hashing processes')
+        parser.add_argument('--state', help='Progress file (default: <csv_path>.state.json)')
+        parser.add_argument('--errors', help='Rejected rows (default: <csv_path>.errors.csv)')
+
+    def handle(self, *args, **options):
+        path = options['csv_path']
+        importer = UserImporter(
+            path,
+            options['state'] or f'{path}.state.json',
+            options['errors'] or f'{path}.errors.csv',
+            university=options['university'],
+            chunk_size=options['chunk_size'],
+            workers=options['workers'],
+        )
+        try:
+            state = importer.run()
+        except FileNotFoundError as e:
+            raise CommandError(str(e))
+        if state.error:
+            raise CommandError(state.error)
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {state.created} users, rejected {state.failed} rows (see {importer.errors_path})'
+        ))
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+
+
+class Command(BaseCommand):
+    help = 'Delete expired outstanding (and with them blacklisted) tokens in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--sleep', type=float, default=0, help='Seconds to pause between batches')
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        deleted = 0
+        while True:
+            # Tokens expire roughly in id order, so the oldest ids are found
+            # first even though expires_at has no index
+            ids = list(
+                OutstandingToken.objects.filter(expires_at__lte=now)
+                .order_by('pk').values_list('pk', flat=True)[:options['batch_size']]
+            )
+            if not ids:
+                break
+            OutstandingToken.objects.filter(pk__in=ids).delete()
+            deleted += len(ids)
+            if options['sleep']:
+                time.sleep(options['sleep'])
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} expired tokens'))
@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from accounts.importer import import_settings, pending_jobs, run_job
+
+
+class Command(BaseCommand):
+    help = 'Run bulk user imports uploaded through the API, resuming any a stopped worker left unfinished'
+
+    def add_arguments(self, parser):
+        config = import_settings()
+        parser.add_argument('--workers', type=int, default=config['WORKERS'], help='Password hashing processes')
+        parser.add_argument('--interval', type=float, default=config['POLL_INTERVAL'],
+                            help='Seconds to wait when no job is waiting')
+        parser.add_argument('--once', action='store_true', help='Exit once no job is waiting')
+
+    def handle(self, *args, **options):
+        total = 0
+        try:
+            while True:
+                ran = 0
+                for job_id in pending_jobs():
+                    try:
+                        started = run_job(job_id, workers=options['workers'])
+                    except Exception as e:
+                        self.stderr.write(f'Import {job_id} failed: {e}')
+                        ran += 1
+                        continue
+                    if started:  # False when another worker has it
+                        ran += 1
+                        self.stdout.write(f'Finished import {job_id}')
+                total += ran
+                if not ran:
+                    if options['once']:
+                        break
+                    time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(f'Ran {total} imports'))
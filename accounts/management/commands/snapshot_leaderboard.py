@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from accounts.leaderboard import board_name, get_leaderboard
+from accounts.models import LeaderboardSnapshot, User
+
+
+class Command(BaseCommand):
+    help = 'Store the top of the global, weekly and per-university leaderboards'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=100, help='Entries kept per board')
+        parser.add_argument('--rebuild', action='store_true', help='Reload the rankings from the database first')
+
+    def handle(self, *args, **options):
+        leaderboard = get_leaderboard()
+        if options['rebuild']:
+            leaderboard.rebuild()
+
+        universities = (
+            User.objects.filter(points__gt=0).exclude(university__isnull=True).exclude(university='')
+            .values_list('university', flat=True).distinct()
+        )
+        boards = ['global', 'weekly'] + sorted({board_name('university', name) for name in universities})
+
+        taken_at = timezone.now()
+        snapshots = []
+        for board in boards:
+            for rank, (user_id, points) in enumerate(leaderboard.top(board, options['top']), start=1):
+                snapshots.append(LeaderboardSnapshot(
+                    board=board, user_id=user_id, rank=rank, points=points, taken_at=taken_at
+                ))
+        LeaderboardSnapshot.objects.bulk_create(snapshots, batch_size=1000)
+        self.stdout.write(self.style.SUCCESS(f'Saved {len(snapshots)} entries across {len(boards)} boards'))
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:28
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_points_transaction'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('board', models.CharField(help_text="'global', 'weekly' or 'university:<NAME>'", max_length=300)),
+                ('rank', models.PositiveIntegerField()),
+                ('points', models.IntegerField()),
+                ('taken_at', models.DateTimeField()),
+            ],
+            options={
+                'ordering': ['-taken_at', 'board', 'rank'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='pointstransaction',
+            index=models.Index(fields=['created_at'], name='points_created_idx'),
+        ),
+        migrations.AddField(
+            model_name='leaderboardsnapshot',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard_snapshots', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='leaderboardsnapshot',
+            index=models.Index(fields=['board', '-taken_at', 'rank'], name='leaderboard_board_taken_idx'),
+        ),
+    ]
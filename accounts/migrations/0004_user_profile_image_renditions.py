@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_leaderboard'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='profile_image_renditions',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
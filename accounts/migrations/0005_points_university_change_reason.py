@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 14:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_user_profile_image_renditions'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='pointstransaction',
+            name='reason',
+            field=models.CharField(choices=[('contribution', 'Approved Contribution'), ('redemption', 'Redemption'), ('adjustment', 'Manual Adjustment'), ('university', 'University Change')], default='adjustment', max_length=20),
+        ),
+    ]
@@ -18,6 +18,8 @@ class User(AbstractUser):
     university = models.CharField(max_length=255, blank=True, null=True)
     course_of_study = models.CharField(max_length=255, blank=True, null=True)
     profile_image = models.ImageField(upload_to='profiles/', blank=True, null=True)
+    # Resized copies built in the background (stax_api/images.py)
+    profile_image_renditions = models.JSONField(default=dict, blank=True, editable=False)
     points = models.IntegerField(default=0, validators=[MinValueValidator(0)])
     is_verified = models.BooleanField(default=False)
     role = models.CharField(max_length=20, choices=ROLE_CHOICES, default='student')
@@ -39,15 +41,61 @@ class User(AbstractUser):
     def __str__(self):
         return self.email
     
-    def add_points(self, points):
-        """Add points to user account"""
-        self.points += points
-        self.save()
+    def add_points(self, points, reason='adjustment', note=''):
+        """Add points to user account (atomic, see accounts/points.py)"""
+        from .points import award_points
+        award_points(self.pk, points, reason=reason, note=note)
+        self.refresh_from_db(fields=['points'])
         
-    def deduct_points(self, points):
-        """Deduct points from user account"""
-        if self.points >= points:
-            self.points -= points
-            self.save()
-            return True
-        return False
+    def deduct_points(self, points, reason='redemption', note=''):
+        """Deduct points from user account if the balance allows it"""
+        from .points import deduct_points
+        deducted = deduct_points(self.pk, points, reason=reason, note=note)
+        self.refresh_from_db(fields=['points'])
+        return deducted
+
+
+class PointsTransaction(models.Model):
+    """Journal of every change made to a user's points balance"""
+    
+    REASON_CHOICES = [
+        ('contribution', 'Approved Contribution'),
+        ('redemption', 'Redemption'),
+        ('adjustment', 'Manual Adjustment'),
+        ('university', 'University Change'),  # amount 0; moves leaderboard scores
+    ]
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='points_transactions')
+    amount = models.IntegerField(help_text="Negative for deductions")
+    reason = models.CharField(max_length=20, choices=REASON_CHOICES, default='adjustment')
+    note = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='points_user_created_idx'),
+            # Weekly leaderboard: this week's transactions
+            models.Index(fields=['created_at'], name='points_created_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user_id}: {self.amount:+d} ({self.reason})"
+
+
+class LeaderboardSnapshot(models.Model):
+    """Periodic copy of the top of each leaderboard"""
+    board = models.CharField(max_length=300, help_text="'global', 'weekly' or 'university:<NAME>'")
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='leaderboard_snapshots')
+    rank = models.PositiveIntegerField()
+    points = models.IntegerField()
+    taken_at = models.DateTimeField()
+    
+    class Meta:
+        ordering = ['-taken_at', 'board', 'rank']
+        indexes = [
+            models.Index(fields=['board', '-taken_at', 'rank'], name='leaderboard_board_taken_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.board} #{self.rank} - {self.user_id} ({self.points})"
@@ -0,0 +1,76 @@
+# accounts/points.py
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+
+from .leaderboard import record_points
+from .models import PointsTransaction, User
+
+BULK_BATCH_SIZE = 500
+
+
+def award_points(user_id, points, reason='adjustment', note=''):
+    """
+    Add points with a single UPDATE ... SET points = points + n and journal it.
+    Returns False if the user does not exist.
+    """
+    with transaction.atomic():
+        updated = User.objects.filter(pk=user_id).update(points=F('points') + points)
+        if updated:
+            PointsTransaction.objects.create(user_id=user_id, amount=points, reason=reason, note=note)
+            transaction.on_commit(lambda: record_points([(user_id, points)]))
+    return bool(updated)
+
+
+def deduct_points(user_id, points, reason='redemption', note=''):
+    """
+    Subtract points only if the balance covers them, in one conditional UPDATE.
+    Returns False (and changes nothing) when the balance is too low.
+    """
+    with transaction.atomic():
+        updated = User.objects.filter(pk=user_id, points__gte=points).update(points=F('points') - points)
+        if updated:
+            PointsTransaction.objects.create(user_id=user_id, amount=-points, reason=reason, note=note)
+            transaction.on_commit(lambda: record_points([(user_id, -points)]))
+    return bool(updated)
+
+
+def journal_university_change(user_id, old, new):
+    """
+    Journal a zero-amount entry for a user who changed university, so every
+    leaderboard (each worker's in-memory boards included) moves their score
+    to the new university's board
+    """
+    PointsTransaction.objects.create(
+        user_id=user_id, amount=0, reason='university', note=f'{old or "-"} -> {new or "-"}'[:255]
+    )
+    transaction.on_commit(lambda: record_points([(user_id, 0)]))
+
+
+def bulk_award(awards, reason='contribution', note='', batch_size=BULK_BATCH_SIZE):
+    """
+    Apply {user_id: points} in one transaction. Every user id must exist.
+
+    Each batch of users costs one UPDATE (a CASE per user) and one
+    bulk INSERT into the journal, however many users are awarded.
+    Returns the number of users updated.
+    """
+    items = [(user_id, points) for user_id, points in awards.items() if points]
+    updated = 0
+    with transaction.atomic():
+        for start in range(0, len(items), batch_size):
+            batch = items[start:start + batch_size]
+            delta = Case(
+                *[When(pk=user_id, then=Value(points)) for user_id, points in batch],
+                default=Value(0),
+                output_field=IntegerField(),
+            )
+            updated += User.objects.filter(pk__in=[user_id for user_id, _ in batch]).update(
+                points=F('points') + delta
+            )
+            PointsTransaction.objects.bulk_create([
+                PointsTransaction(user_id=user_id, amount=points, reason=reason, note=note)
+                for user_id, points in batch
+            ])
+        transaction.on_commit(lambda: record_points(items))
+    return updated
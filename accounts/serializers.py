@@ -1,6 +1,15 @@
 from rest_framework import serializers
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
 from django.contrib.auth.password_validation import validate_password
+from django.utils.timezone import localtime
+from stax_api.db_routers import use_primary
+from stax_api.fieldsets import Field, Representation, column, file_url
+from stax_api.images import rendition_urls
+from stax_api.partial_saves import changed_columns
 from .models import User
+from .tokens import ClaimsRefreshToken, password_fingerprint
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
     """Serializer for user registration"""
@@ -66,13 +75,51 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
 
 class UserSerializer(serializers.ModelSerializer):
     """Serializer for user details"""
+    profile_image_renditions = serializers.SerializerMethodField()
     
     class Meta:
         model = User
         fields = ['id', 'email', 'username', 'full_name', 'university', 
-                  'course_of_study', 'profile_image', 'points', 'role', 
-                  'bio', 'phone_number', 'is_verified', 'created_at']
+                  'course_of_study', 'profile_image', 'profile_image_renditions',
+                  'points', 'role', 'bio', 'phone_number', 'is_verified', 'created_at']
         read_only_fields = ['id', 'email', 'points', 'role', 'is_verified', 'created_at']
+    
+    def get_profile_image_renditions(self, obj):
+        """Resized avatar URLs by size and format; empty until processed"""
+        return rendition_urls(obj.profile_image_renditions)
+
+
+# UserSerializer's output as a compiled read-only representation, for
+# endpoints that list or look up users without writing
+USER_FIELDS = Representation({
+    'id': column('id'),
+    'email': column('email'),
+    'username': column('username'),
+    'full_name': column('full_name'),
+    'university': column('university'),
+    'course_of_study': column('course_of_study'),
+    'profile_image': file_url('profile_image'),
+    'profile_image_renditions': Field(
+        ['profile_image_renditions'], lambda user: rendition_urls(user.profile_image_renditions)
+    ),
+    'points': column('points'),
+    'role': column('role'),
+    'bio': column('bio'),
+    'phone_number': column('phone_number'),
+    'is_verified': column('is_verified'),
+    # Rendered in the current time zone, as DRF's DateTimeField does
+    'created_at': Field(['created_at'], lambda user: localtime(user.created_at)),
+})
+
+# What any client may see of a contributor in rankings and listings
+CONTRIBUTOR_FIELDS = Representation(
+    {
+        name: USER_FIELDS.fields[name]
+        for name in ['id', 'username', 'full_name', 'university', 'course_of_study',
+                     'profile_image', 'profile_image_renditions', 'points', 'role']
+    },
+    default=['id', 'full_name', 'university', 'profile_image', 'profile_image_renditions'],
+)
 
 
 class UserUpdateSerializer(serializers.ModelSerializer):
@@ -88,6 +135,13 @@ class UserUpdateSerializer(serializers.ModelSerializer):
         if value and value.size > 5 * 1024 * 1024:
             raise serializers.ValidationError("Image file size cannot exceed 5MB.")
         return value
+    
+    def update(self, instance, validated_data):
+        """Save only the submitted fields, never points or other columns changed since the read"""
+        for field, value in validated_data.items():
+            setattr(instance, field, value)
+        instance.save(update_fields=changed_columns(instance, validated_data))
+        return instance
 
 
 class ChangePasswordSerializer(serializers.Serializer):
@@ -119,5 +173,37 @@ class ChangePasswordSerializer(serializers.Serializer):
         """Set new password"""
         user = self.context['request'].user
         user.set_password(self.validated_data['new_password'])
-        user.save()
-        return user
\ No newline at end of file
+        user.save(update_fields=['password'])
+        return user
+
+class ClaimsTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    Refresh serializer for ClaimsRefreshToken: rejects tokens issued before
+    a password change and re-stamps the claims from the current user row
+    """
+    token_class = ClaimsRefreshToken
+    
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        
+        with use_primary():
+            user = User.objects.filter(pk=refresh.payload.get(api_settings.USER_ID_CLAIM)).first()
+        if user is None or not api_settings.USER_AUTHENTICATION_RULE(user):
+            raise AuthenticationFailed(self.error_messages['no_active_account'], 'no_active_account')
+        fingerprint = refresh.payload.get(api_settings.REVOKE_TOKEN_CLAIM)
+        if fingerprint is not None and fingerprint != password_fingerprint(user.password):
+            raise AuthenticationFailed("The user's password has been changed.", 'password_changed')
+        refresh.set_user_claims(user)
+        
+        data = {'access': str(refresh.access_token)}
+        
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            if api_settings.BLACKLIST_AFTER_ROTATION:
+                refresh.blacklist()
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            refresh.outstand()
+            data['refresh'] = str(refresh)
+        
+        return data
@@ -0,0 +1,50 @@
+# accounts/signals.py
+
+from django.db import transaction
+from django.db.models import DEFERRED
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+from stax_api.images import schedule_renditions
+
+from .authentication import invalidate_user_status
+from .blacklist import get_blacklist_filter
+from .leaderboard import board_name
+from .models import User
+from .points import journal_university_change
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_status(sender, instance, **kwargs):
+    """Deactivation, password and role changes reach this worker at once"""
+    invalidate_user_status(instance.pk)
+
+
+@receiver(post_save, sender=BlacklistedToken)
+def add_to_blacklist_filter(sender, instance, created, **kwargs):
+    if created:
+        pk, jti = instance.pk, instance.token.jti
+        transaction.on_commit(lambda: get_blacklist_filter().add(pk, jti))
+
+
+@receiver(post_save, sender=User)
+def build_profile_image_renditions(sender, instance, update_fields=None, **kwargs):
+    schedule_renditions(instance, ['profile_image'], update_fields)
+
+
+@receiver(post_init, sender=User)
+def remember_loaded_university(sender, instance, **kwargs):
+    """Keep the university as loaded so post_save can tell it changed"""
+    instance._loaded_university = instance.__dict__.get('university', DEFERRED)
+
+
+@receiver(post_save, sender=User)
+def move_leaderboard_score(sender, instance, created, update_fields=None, **kwargs):
+    old, new = instance._loaded_university, instance.__dict__.get('university', DEFERRED)
+    instance._loaded_university = new
+    if created or new is DEFERRED or (update_fields is not None and 'university' not in update_fields):
+        return
+    # Not loaded: journal anyway, moving a score to the board it is on is a no-op
+    if old is DEFERRED or board_name('university', old) != board_name('university', new):
+        journal_university_change(instance.pk, None if old is DEFERRED else old, new)
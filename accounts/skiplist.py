@@ -0,0 +1,122 @@
+# accounts/skiplist.py
+
+import random
+
+
+class _Node:
+    __slots__ = ('key', 'forward', 'span')
+
+    def __init__(self, key, level):
+        self.key = key
+        self.forward = [None] * level
+        # span[i]: how many positions forward[i] jumps ahead
+        self.span = [0] * level
+
+
+class SkipList:
+    """
+    Indexable skip list of unique, mutually comparable keys.
+
+    The same structure Redis uses for sorted sets: every forward pointer also
+    records how many nodes it skips, so insert, delete, rank() and at() are
+    all O(log n) expected.
+    """
+
+    MAX_LEVEL = 32
+    P = 0.25
+
+    def __init__(self):
+        self.head = _Node(None, self.MAX_LEVEL)
+        self.level = 1
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def _random_level(self):
+        level = 1
+        while level < self.MAX_LEVEL and random.random() < self.P:
+            level += 1
+        return level
+
+    def _predecessors(self, key):
+        """Rightmost node before `key` on every level, and its 0-based position"""
+        update = [self.head] * self.MAX_LEVEL
+        rank = [0] * self.MAX_LEVEL
+        node = self.head
+        for i in reversed(range(self.level)):
+            rank[i] = rank[i + 1] if i + 1 < self.level else 0
+            while node.forward[i] is not None and node.forward[i].key < key:
+                rank[i] += node.span[i]
+                node = node.forward[i]
+            update[i] = node
+        return update, rank
+
+    def insert(self, key):
+        update, rank = self._predecessors(key)
+        level = self._random_level()
+        if level > self.level:
+            for i in range(self.level, level):
+                rank[i] = 0
+                update[i] = self.head
+                self.head.span[i] = self.size
+            self.level = level
+        node = _Node(key, level)
+        for i in range(level):
+            node.forward[i] = update[i].forward[i]
+            update[i].forward[i] = node
+            node.span[i] = update[i].span[i] - (rank[0] - rank[i])
+            update[i].span[i] = rank[0] - rank[i] + 1
+        for i in range(level, self.level):
+            update[i].span[i] += 1
+        self.size += 1
+
+    def delete(self, key):
+        """Remove `key`; returns False if it was not present"""
+        update, _ = self._predecessors(key)
+        node = update[0].forward[0]
+        if node is None or node.key != key:
+            return False
+        for i in range(self.level):
+            if update[i].forward[i] is node:
+                update[i].span[i] += node.span[i] - 1
+                update[i].forward[i] = node.forward[i]
+            else:
+                update[i].span[i] -= 1
+        while self.level > 1 and self.head.forward[self.level - 1] is None:
+            self.level -= 1
+        self.size -= 1
+        return True
+
+    def rank(self, key):
+        """1-based position of `key`, or None"""
+        position = 0
+        node = self.head
+        for i in reversed(range(self.level)):
+            while node.forward[i] is not None and node.forward[i].key <= key:
+                position += node.span[i]
+                node = node.forward[i]
+            if node is not self.head and node.key == key:
+                return position
+        return None
+
+    def at(self, position):
+        """Node at a 1-based position, or None"""
+        traversed = 0
+        node = self.head
+        for i in reversed(range(self.level)):
+            while node.forward[i] is not None and traversed + node.span[i] <= position:
+                traversed += node.span[i]
+                node = node.forward[i]
+            if traversed == position:
+                return node if node is not self.head else None
+        return None
+
+    def slice(self, start, count):
+        """Up to `count` keys from 1-based position `start` on"""
+        node = self.at(start)
+        keys = []
+        while node is not None and len(keys) < count:
+            keys.append(node.key)
+            node = node.forward[0]
+        return keys
@@ -1,3 +1,371 @@
-from django.test import TestCase
+import fcntl
+import json
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.admin.sites import site
+from django.contrib.auth.models import Group, Permission
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db.models import F
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+from . import blacklist, login, serializers, views
+from .admin import PasswordOnlyChangeForm
+from .authentication import ClaimsUser, StatelessJWTAuthentication, materialize
+from .importer import job_paths, job_state, pending_jobs, run_job
+from .leaderboard import MemoryLeaderboard
+from .models import PointsTransaction, User
+from .tokens import ClaimsRefreshToken
+
+
+class BlacklistFilterTests(TestCase):
+    """A token blacklisted by another worker must never be accepted again"""
+
+    def setUp(self):
+        blacklist._filter = None
+        self.addCleanup(setattr, blacklist, '_filter', None)
+        self.user = User.objects.create_user(
+            email='ada@example.com', username='ada', full_name='Ada', password='x-Secret-123'
+        )
+
+    def _token(self, age):
+        token = ClaimsRefreshToken.for_user(self.user)
+        token.set_iat(at_time=timezone.now() - age)
+        return str(token)
+
+    def _blacklist_elsewhere(self, encoded):
+        # bulk_create skips post_save: the row appears without this process
+        # (or the shared stamp) hearing about it, as with another worker
+        jti = ClaimsRefreshToken(encoded).payload['jti']
+        BlacklistedToken.objects.bulk_create([BlacklistedToken(token=OutstandingToken.objects.get(jti=jti))])
+
+    def _warm_filter(self):
+        blacklist.get_blacklist_filter().might_contain('warm-up')
+
+    def test_per_process_cache_always_checks_the_database(self):
+        encoded = self._token(timedelta(hours=1))
+        self._warm_filter()
+        self._blacklist_elsewhere(encoded)
+        self.assertFalse(blacklist.get_blacklist_filter().shared())
+        with self.assertRaises(TokenError):
+            ClaimsRefreshToken(encoded)
+
+    def test_recent_token_checked_with_shared_cache(self):
+        with tempfile.TemporaryDirectory() as location, override_settings(CACHES={
+            'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': location},
+        }):
+            encoded = self._token(timedelta(seconds=1))
+            self._warm_filter()
+            self._blacklist_elsewhere(encoded)
+            self.assertTrue(blacklist.get_blacklist_filter().shared())
+            with self.assertRaises(TokenError):
+                ClaimsRefreshToken(encoded)
+
+    def test_stamp_from_another_worker_is_picked_up(self):
+        with tempfile.TemporaryDirectory() as location, override_settings(CACHES={
+            'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': location},
+        }):
+            encoded = self._token(timedelta(hours=1))
+            self._warm_filter()
+            self._blacklist_elsewhere(encoded)
+            # What the other worker's on_commit hook publishes
+            bloom = blacklist.get_blacklist_filter()
+            bloom._cache().set(bloom._stamp_key(), BlacklistedToken.objects.latest('pk').pk, timeout=None)
+            with self.assertRaises(TokenError):
+                ClaimsRefreshToken(encoded)
+
+    def test_unlisted_token_is_accepted(self):
+        encoded = self._token(timedelta(hours=1))
+        self.assertEqual(ClaimsRefreshToken(encoded)['user_id'], str(self.user.pk))
+
+    def test_rotated_token_cannot_be_replayed(self):
+        refresh = str(ClaimsRefreshToken.for_user(self.user))
+        response = self.client.post('/api/auth/token/refresh/', {'refresh': refresh}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        # Another worker with its own filter receives the replay
+        blacklist._filter = None
+        response = self.client.post('/api/auth/token/refresh/', {'refresh': refresh}, content_type='application/json')
+        self.assertEqual(response.status_code, 401)
+
+
+class MemoryLeaderboardTests(TestCase):
+    """Every journal entry is counted on the in-process boards exactly once"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='ada@example.com', username='ada', full_name='Ada', password='x-Secret-123', university='Unilag'
+        )
+
+    def _journal(self, pk, amount):
+        User.objects.filter(pk=self.user.pk).update(points=F('points') + amount)
+        PointsTransaction.objects.create(pk=pk, user=self.user, amount=amount)
+
+    def test_load_counts_balances_once(self):
+        self._journal(1, 10)
+        self._journal(2, 5)
+        board = MemoryLeaderboard(sync_interval=3600)
+        board.sync(force=True)
+        self.assertEqual(board.rank('global', self.user.pk), (1, 15))
+        self.assertEqual(board.rank('weekly', self.user.pk), (1, 15))
+        board.sync(force=True)
+        self.assertEqual(board.rank('global', self.user.pk), (1, 15))
+
+    def test_late_commit_below_the_last_id_is_applied_once(self):
+        self._journal(1, 10)
+        board = MemoryLeaderboard(sync_interval=3600)
+        board.sync(force=True)
+        self._journal(3, 2)
+        board.sync(force=True)
+        # Id 2 was allocated before 3 but committed after it was read
+        self._journal(2, 7)
+        board.sync(force=True)
+        board.sync(force=True)
+        self.assertEqual(board.rank('global', self.user.pk), (1, 19))
+        self.assertEqual(board.rank('university:UNILAG', self.user.pk), (1, 19))
+
+    def test_university_change_moves_the_whole_score(self):
+        self._journal(1, 10)
+        board = MemoryLeaderboard(sync_interval=3600)
+        board.sync(force=True)
+        user = User.objects.get(pk=self.user.pk)
+        user.university = 'University of Ibadan'
+        with self.captureOnCommitCallbacks(execute=True):
+            user.save(update_fields=['university'])
+        # Another worker's boards catch up from the journal
+        board.sync(force=True)
+        self.assertIsNone(board.rank('university:UNILAG', self.user.pk))
+        self.assertEqual(board.rank('university:UNIVERSITY OF IBADAN', self.user.pk), (1, 10))
+        self._journal(3, 5)
+        board.sync(force=True)
+        self.assertEqual(board.rank('university:UNIVERSITY OF IBADAN', self.user.pk), (1, 15))
+        self.assertEqual(board.rank('global', self.user.pk), (1, 15))
+        self.assertEqual(board.rank('weekly', self.user.pk), (1, 15))
+
+    def test_unchanged_university_is_not_journaled(self):
+        user = User.objects.get(pk=self.user.pk)
+        user.university = ' unilag '
+        user.bio = 'Hello'
+        user.save()
+        self.assertFalse(PointsTransaction.objects.filter(reason='university').exists())
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class UserImportJobTests(TestCase):
+    """API imports are run, and resumed, by the run_user_imports worker"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings = override_settings(STAX_USER_IMPORT={'DIRECTORY': directory.name, 'INLINE': False})
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.admin = User.objects.create_superuser(
+            email='admin@example.com', username='admin', full_name='Admin', password='x-Secret-123'
+        )
+
+    def _upload(self, rows):
+        content = 'email,username,full_name\n' + ''.join(f'{row}\n' for row in rows)
+        access = ClaimsRefreshToken.for_user(self.admin).access_token
+        response = self.client.post('/api/auth/users/import/', {
+            'file': SimpleUploadedFile('users.csv', content.encode()),
+            'university': 'Unilag',
+        }, HTTP_AUTHORIZATION=f'Bearer {access}')
+        self.assertEqual(response.status_code, 202)
+        return response.json()['job']
+
+    def test_worker_runs_uploaded_jobs(self):
+        job_id = self._upload(['ada@example.org,ada,Ada', 'obi@example.org,obi,Obi'])
+        self.assertEqual(pending_jobs(), [job_id])
+        call_command('run_user_imports', '--once', '--workers', '1', stdout=StringIO())
+        state = job_state(job_id)
+        self.assertEqual((state.finished, state.created, state.error), (True, 2, ''))
+        self.assertEqual(User.objects.get(email='obi@example.org').university, 'Unilag')
+        self.assertFalse(os.path.exists(job_paths(job_id)['source']))
+        self.assertEqual(pending_jobs(), [])
+
+    def test_worker_resumes_an_interrupted_job(self):
+        job_id = self._upload(['ada@example.org,ada,Ada', 'obi@example.org,obi,Obi'])
+        # A worker died after committing the first row
+        User.objects.create_user(email='ada@example.org', username='ada', full_name='Ada')
+        with open(job_paths(job_id)['state'], 'w') as handle:
+            json.dump({'rows_done': 1, 'created': 1, 'failed': 0, 'finished': False, 'error': ''}, handle)
+        call_command('run_user_imports', '--once', '--workers', '1', stdout=StringIO())
+        state = job_state(job_id)
+        self.assertEqual((state.finished, state.created, state.failed), (True, 2, 0))
+
+    def test_chunk_committed_before_its_progress_was_saved(self):
+        job_id = self._upload(['ada@example.org,ada,Ada', 'bad-email,obi,Obi', 'eze@example.org,eze,Eze'])
+        # A worker died after committing the chunk and writing its errors,
+        # but before saving its progress
+        User.objects.create_user(email='ada@example.org', username='ada', full_name='Ada')
+        User.objects.create_user(email='eze@example.org', username='eze', full_name='Eze')
+        with open(job_paths(job_id)['errors'], 'w') as handle:
+            handle.write('line,email,username,error\r\n3,bad-email,obi,Enter a valid email address.\r\n')
+        with open(job_paths(job_id)['state'], 'w') as handle:
+            json.dump({'rows_done': 0, 'created': 0, 'failed': 0, 'finished': False, 'error': '',
+                       'started': True, 'errors_size': 0}, handle)
+        call_command('run_user_imports', '--once', '--workers', '1', stdout=StringIO())
+        state = job_state(job_id)
+        self.assertEqual((state.finished, state.created, state.failed), (True, 2, 1))
+        with open(job_paths(job_id)['errors']) as handle:
+            self.assertEqual(len(handle.read().splitlines()), 2)
+
+    def test_existing_users_are_rejected_on_a_first_run(self):
+        job_id = self._upload(['ada@example.org,ada,Ada'])
+        User.objects.create_user(email='ada@example.org', username='ada', full_name='Ada')
+        call_command('run_user_imports', '--once', '--workers', '1', stdout=StringIO())
+        state = job_state(job_id)
+        self.assertEqual((state.created, state.failed), (0, 1))
+
+    def test_job_held_by_another_worker_is_skipped(self):
+        job_id = self._upload(['ada@example.org,ada,Ada'])
+        with open(job_paths(job_id)['lock'], 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            self.assertFalse(run_job(job_id, workers=1))
+        self.assertFalse(job_state(job_id).finished)
+        self.assertTrue(run_job(job_id, workers=1))
+        self.assertTrue(job_state(job_id).finished)
+
+
+class ClaimsUserTests(TestCase):
+    """A request user built from token claims behaves like the User row"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='ada@example.com', username='ada', full_name='Ada', password='x-Secret-123'
+        )
+        self.other = User.objects.create_user(
+            email='obi@example.com', username='obi', full_name='Obi', password='x-Secret-123'
+        )
+
+    def _request_user(self, user):
+        access = ClaimsRefreshToken.for_user(user).access_token
+        request = RequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {access}')
+        request_user, _ = StatelessJWTAuthentication().authenticate(request)
+        self.assertIsInstance(request_user, ClaimsUser)
+        return request_user
+
+    def test_identity(self):
+        request_user = self._request_user(self.user)
+        self.assertEqual((request_user.username, request_user.get_username()), ('ada', 'ada@example.com'))
+        self.assertEqual(str(request_user), str(self.user))
+        self.assertEqual(request_user, self.user)
+        self.assertEqual(self.user, request_user)
+        self.assertEqual(request_user, self._request_user(self.user))
+        self.assertNotEqual(request_user, self.other)
+        self.assertIn(request_user, {self.user})
+
+    def test_permissions(self):
+        permission = Permission.objects.get(codename='change_user')
+        group = Group.objects.create(name='Moderators')
+        group.permissions.add(permission)
+        self.user.groups.add(group)
+        request_user = self._request_user(self.user)
+        self.assertEqual(list(request_user.groups.all()), [group])
+        self.assertTrue(request_user.has_perm('accounts.change_user'))
+        self.assertTrue(request_user.has_perms(['accounts.change_user']))
+        self.assertTrue(request_user.has_module_perms('accounts'))
+        self.assertEqual(request_user.get_all_permissions(), {'accounts.change_user'})
+        self.assertFalse(self._request_user(self.other).has_perm('accounts.change_user'))
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class LoginThrottleTests(TestCase):
+    """Per-IP limits apply to the client, not to the proxy in front of it"""
+
+    def setUp(self):
+        login._limiters = None
+        self.addCleanup(setattr, login, '_limiters', None)
+
+    def _ip(self, forwarded_for, **config):
+        request = RequestFactory().get('/', HTTP_X_FORWARDED_FOR=forwarded_for, REMOTE_ADDR='10.0.0.1')
+        with override_settings(STAX_LOGIN=config):
+            return login.client_ip(request)
+
+    def test_client_ip(self):
+        self.assertEqual(self._ip('203.0.113.7'), '10.0.0.1')
+        self.assertEqual(self._ip('203.0.113.7', PROXY_HEADER='HTTP_X_FORWARDED_FOR'), '203.0.113.7')
+        # A client cannot pick its address by sending its own header
+        self.assertEqual(self._ip('1.2.3.4, 203.0.113.7', PROXY_HEADER='HTTP_X_FORWARDED_FOR'), '203.0.113.7')
+        self.assertEqual(
+            self._ip('1.2.3.4, 203.0.113.7, 10.0.0.2', PROXY_HEADER='HTTP_X_FORWARDED_FOR', TRUSTED_PROXIES=2),
+            '203.0.113.7',
+        )
+        self.assertEqual(self._ip('', PROXY_HEADER='HTTP_X_FORWARDED_FOR'), '10.0.0.1')
+
+    @override_settings(STAX_LOGIN={'PROXY_HEADER': 'HTTP_X_FORWARDED_FOR', 'IP_BURST': 1, 'IP_PER_MINUTE': 1})
+    def test_clients_behind_a_proxy_have_their_own_buckets(self):
+        def attempt(email, ip):
+            return self.client.post(
+                '/api/auth/login/', {'email': email, 'password': 'wrong'},
+                content_type='application/json', HTTP_X_FORWARDED_FOR=ip,
+            ).status_code
+
+        self.assertEqual(attempt('ada@example.com', '203.0.113.7'), 401)
+        self.assertEqual(attempt('obi@example.com', '203.0.113.8'), 401)
+        self.assertEqual(attempt('eze@example.com', '203.0.113.7'), 429)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class PointsPreservationTests(TestCase):
+    """Profile, password and admin edits never write back a stale points balance"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='ada@example.com', username='ada', full_name='Ada', password='x-Secret-123'
+        )
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {ClaimsRefreshToken.for_user(self.user).access_token}'}
+
+    def _award_after_read(self, user):
+        # Points are awarded between the read and the save
+        user = materialize(user)
+        User.objects.filter(pk=user.pk).update(points=F('points') + 25)
+        return user
+
+    def _points(self):
+        self.user.refresh_from_db(fields=['points'])
+        return self.user.points
+
+    def test_profile_update_keeps_points(self):
+        with mock.patch.object(views, 'materialize', side_effect=self._award_after_read):
+            response = self.client.patch(
+                '/api/auth/profile/', {'bio': 'Hello'}, content_type='application/json', **self.auth
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._points(), 25)
+        self.assertEqual(User.objects.get(pk=self.user.pk).bio, 'Hello')
+
+    def test_password_change_keeps_points(self):
+        request = RequestFactory().post('/')
+        request.user = User.objects.get(pk=self.user.pk)
+        self._award_after_read(self.user)
+        serializer = serializers.ChangePasswordSerializer(data={
+            'old_password': 'x-Secret-123', 'new_password': 'y-Secret-456', 'new_password2': 'y-Secret-456',
+        }, context={'request': request})
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        serializer.save()
+        self.assertEqual(self._points(), 25)
+        self.assertTrue(User.objects.get(pk=self.user.pk).check_password('y-Secret-456'))
+
+    def test_admin_edits_keep_points(self):
+        user = User.objects.get(pk=self.user.pk)
+        self._award_after_read(user)
+        user_admin = site._registry[User]
+        request = RequestFactory().post('/')
+        self.assertIn('points', user_admin.get_readonly_fields(request, user))
+        user.full_name = 'Ada L.'
+        user_admin.save_model(request, user, mock.Mock(changed_data=['full_name']), change=True)
+        form = PasswordOnlyChangeForm(user, {
+            'password1': 'y-Secret-456', 'password2': 'y-Secret-456', 'usable_password': 'true',
+        })
+        self.assertTrue(form.is_valid(), form.errors)
+        form.save()
+        self.assertEqual(self._points(), 25)
+        self.assertEqual(User.objects.get(pk=self.user.pk).full_name, 'Ada L.')
@@ -0,0 +1,75 @@
+# accounts/tokens.py
+
+import hashlib
+import json
+import time
+
+from django.contrib.auth.hashers import identify_hasher
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .blacklist import blacklist_settings, get_blacklist_filter
+
+# User fields copied into every token so requests can be authorised
+# without loading the user row (see accounts/authentication.py)
+CLAIM_FIELDS = ('role', 'is_verified', 'university', 'is_staff', 'is_superuser')
+
+
+def user_claims(user):
+    return {field: getattr(user, field) for field in CLAIM_FIELDS}
+
+
+def claims_digest(claims):
+    """Short fingerprint of the claim values, used to spot stale tokens"""
+    payload = json.dumps([claims.get(field) for field in CLAIM_FIELDS])
+    return hashlib.md5(payload.encode()).hexdigest()
+
+
+def password_fingerprint(encoded):
+    """
+    Fingerprint of a stored password that changes with the password but not
+    when the login rehash re-encodes it under the same salt
+    """
+    try:
+        salt = identify_hasher(encoded).decode(encoded)['salt']
+    except (ValueError, KeyError):
+        salt = encoded or ''
+    return hashlib.md5(salt.encode()).hexdigest()
+
+
+class ClaimsRefreshToken(RefreshToken):
+    """
+    Refresh token carrying the user's role, verification status and
+    university. Access tokens derived from it copy the same claims.
+
+    With a shared cache the blacklist is consulted through an in-memory
+    Bloom filter (accounts/blacklist.py), so only likely-blacklisted tokens
+    cost a query. Tokens issued within SYNC_INTERVAL (e.g. the one a
+    rotation just replaced) and every token under a per-process cache are
+    checked against the database, since the filter may not yet know about
+    a blacklisting done by another worker.
+    """
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        token.set_user_claims(user)
+        return token
+
+    def set_user_claims(self, user):
+        for field, value in user_claims(user).items():
+            self[field] = value
+        self[api_settings.REVOKE_TOKEN_CLAIM] = password_fingerprint(user.password)
+
+    def _recently_issued(self):
+        issued_at = self.payload.get('iat')
+        return issued_at is None or time.time() - issued_at < blacklist_settings()['SYNC_INTERVAL']
+
+    def check_blacklist(self):
+        bloom = get_blacklist_filter()
+        if (
+            not bloom.shared()
+            or self._recently_issued()
+            or bloom.might_contain(self.payload[api_settings.JTI_CLAIM])
+        ):
+            super().check_blacklist()
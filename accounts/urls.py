@@ -1,6 +1,6 @@
 # accounts/urls.py
 
-from django.urls import path
+from django.urls import path, re_path
 from rest_framework_simplejwt.views import TokenRefreshView
 from .views import (
     UserRegistrationView,
@@ -8,7 +8,11 @@ from .views import (
     UserLogoutView,
     UserProfileView,
     ChangePasswordView,
-    UserDetailView,
+    user_detail,
+    UserImportView,
+    UserImportStatusView,
+    LeaderboardView,
+    MyRankView,
 )
 
 urlpatterns = [
@@ -23,5 +27,13 @@ urlpatterns = [
     path('change-password/', ChangePasswordView.as_view(), name='change-password'),
     
     # Public user info
-    path('users/<int:pk>/', UserDetailView.as_view(), name='user-detail'),
+    path('users/<int:pk>/', user_detail, name='user-detail'),
+    
+    # Bulk onboarding (admin)
+    path('users/import/', UserImportView.as_view(), name='user-import'),
+    re_path(r'^users/import/(?P<job_id>[0-9a-f]{32})/$', UserImportStatusView.as_view(), name='user-import-status'),
+    
+    # Contributor rankings
+    path('leaderboard/', LeaderboardView.as_view(), name='leaderboard'),
+    path('leaderboard/me/', MyRankView.as_view(), name='leaderboard-me'),
 ]
\ No newline at end of file
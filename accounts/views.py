@@ -1,17 +1,30 @@
 # accounts/views.py
 
+import math
+
 from rest_framework import status, generics, permissions
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.views import TokenObtainPairView
 from django.contrib.auth import authenticate
+from django.urls import reverse
+from stax_api.db_routers import use_primary
+from stax_api.fastjson import JsonResponse
+from stax_api.fieldsets import InvalidFields
+from stax_api.tasks import submit
+from .authentication import materialize
+from .importer import create_job, import_settings, job_state, run_job_inline
+from .leaderboard import board_name, get_leaderboard
+from .login import LoginBusy, client_ip, login_settings, schedule_rehash, throttle, verify_password
 from .models import User
+from .tokens import ClaimsRefreshToken
 from .serializers import (
     UserRegistrationSerializer,
     UserSerializer,
     UserUpdateSerializer,
-    ChangePasswordSerializer
+    ChangePasswordSerializer,
+    CONTRIBUTOR_FIELDS,
+    USER_FIELDS,
 )
 
 
@@ -30,7 +43,7 @@ class UserRegistrationView(generics.CreateAPIView):
         user = serializer.save()
         
         # Generate tokens for the new user
-        refresh = RefreshToken.for_user(user)
+        refresh = ClaimsRefreshToken.for_user(user)
         
         return Response({
             'message': 'Registration successful!',
@@ -59,14 +72,23 @@ class UserLoginView(TokenObtainPairView):
                 'error': 'Please provide both email and password'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        # Authenticate user
+        retry_after = throttle(client_ip(request), email)
+        if retry_after:
+            return Response({
+                'error': 'Too many login attempts. Please try again later.'
+            }, status=status.HTTP_429_TOO_MANY_REQUESTS, headers={'Retry-After': str(math.ceil(retry_after))})
+        
+        # Authenticate user (hashing runs on the bounded pool in accounts/login.py)
+        # From the primary, so a just-registered or just-changed password works
+        with use_primary():
+            user = User.objects.filter(email=email).first()
         try:
-            user = User.objects.get(email=email)
-            if not user.check_password(password):
-                return Response({
-                    'error': 'Invalid credentials'
-                }, status=status.HTTP_401_UNAUTHORIZED)
-        except User.DoesNotExist:
+            valid, needs_rehash = verify_password(password, user.password if user else None)
+        except LoginBusy:
+            return Response({
+                'error': 'Login is busy. Please try again shortly.'
+            }, status=status.HTTP_503_SERVICE_UNAVAILABLE, headers={'Retry-After': str(login_settings()['RETRY_AFTER'])})
+        if not valid:
             return Response({
                 'error': 'Invalid credentials'
             }, status=status.HTTP_401_UNAUTHORIZED)
@@ -75,9 +97,11 @@ class UserLoginView(TokenObtainPairView):
             return Response({
                 'error': 'Account is disabled'
             }, status=status.HTTP_403_FORBIDDEN)
+        if needs_rehash:
+            schedule_rehash(user, password)
         
         # Generate tokens
-        refresh = RefreshToken.for_user(user)
+        refresh = ClaimsRefreshToken.for_user(user)
         
         return Response({
             'message': 'Login successful!',
@@ -105,7 +129,7 @@ class UserLogoutView(APIView):
                     'error': 'Refresh token is required'
                 }, status=status.HTTP_400_BAD_REQUEST)
             
-            token = RefreshToken(refresh_token)
+            token = ClaimsRefreshToken(refresh_token)
             token.blacklist()
             
             return Response({
@@ -127,7 +151,7 @@ class UserProfileView(generics.RetrieveUpdateAPIView):
     permission_classes = [permissions.IsAuthenticated]
     
     def get_object(self):
-        return self.request.user
+        return materialize(self.request.user)
     
     def get_serializer_class(self):
         if self.request.method in ['PUT', 'PATCH']:
@@ -174,11 +198,127 @@ class ChangePasswordView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class UserDetailView(generics.RetrieveAPIView):
+async def user_detail(request, pk):
     """
     API endpoint to get any user's public profile
-    GET /api/auth/users/<id>/
+    GET /api/auth/users/<id>/?fields=id,full_name,points
+    A plain async view on the async ORM, since DRF views are sync only
     """
-    queryset = User.objects.all()
-    serializer_class = UserSerializer
-    permission_classes = [permissions.AllowAny]
\ No newline at end of file
+    if request.method not in ('GET', 'HEAD'):
+        return JsonResponse({'detail': f'Method "{request.method}" not allowed.'}, status=405)
+    try:
+        selection = USER_FIELDS.select(request.GET)
+    except InvalidFields as e:
+        return JsonResponse({'detail': str(e)}, status=400)
+    user = await USER_FIELDS.apply(User.objects.filter(pk=pk), selection).afirst()
+    if user is None:
+        return JsonResponse({'detail': 'No User matches the given query.'}, status=404)
+    data = USER_FIELDS.serializer(selection)(user)
+    if data.get('profile_image'):
+        data['profile_image'] = request.build_absolute_uri(data['profile_image'])
+    return JsonResponse(data)
+
+
+class UserImportView(APIView):
+    """
+    API endpoint for bulk user onboarding (admin only)
+    POST /api/auth/users/import/ - multipart "file" (CSV) and optional "university"
+    Returns 202 with a job id; progress at GET /api/auth/users/import/<job>/
+    The job is run by the run_user_imports worker (or inline with INLINE)
+    """
+    permission_classes = [permissions.IsAdminUser]
+    
+    def post(self, request):
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'error': 'A CSV file is required'}, status=status.HTTP_400_BAD_REQUEST)
+        job_id = create_job(upload, request.data.get('university', ''))
+        if import_settings()['INLINE']:
+            submit(run_job_inline, job_id)
+        return Response({
+            'job': job_id,
+            'status_url': reverse('user-import-status', args=[job_id]),
+        }, status=status.HTTP_202_ACCEPTED)
+
+
+class UserImportStatusView(APIView):
+    """
+    API endpoint for the progress of a bulk user import (admin only)
+    GET /api/auth/users/import/<job>/
+    """
+    permission_classes = [permissions.IsAdminUser]
+    
+    def get(self, request, job_id):
+        state = job_state(job_id)
+        if state is None:
+            return Response({'error': 'Import not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response({
+            'job': job_id,
+            'rows_done': state.rows_done,
+            'created': state.created,
+            'failed': state.failed,
+            'finished': state.finished,
+            'error': state.error,
+        })
+
+
+class LeaderboardView(APIView):
+    """
+    API endpoint for contributor rankings
+    GET /api/auth/leaderboard/?board=global|weekly|university&university=UNILAG&limit=20&offset=0
+    Optional ?fields=id,full_name,... picks the contributor fields under "user"
+    """
+    permission_classes = [permissions.AllowAny]
+    BOARDS = ['global', 'weekly', 'university']
+    MAX_LIMIT = 100
+    
+    def get(self, request):
+        kind = request.query_params.get('board', 'global')
+        university = request.query_params.get('university', '')
+        if kind not in self.BOARDS:
+            return Response({
+                'error': f"board must be one of {', '.join(self.BOARDS)}"
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if kind == 'university' and not university.strip():
+            return Response({
+                'error': 'university is required for the university board'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = min(int(request.query_params.get('limit', 20)), self.MAX_LIMIT)
+            offset = max(int(request.query_params.get('offset', 0)), 0)
+        except ValueError:
+            return Response({'error': 'limit and offset must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            selection = CONTRIBUTOR_FIELDS.select(request.query_params)
+        except InvalidFields as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        entries = get_leaderboard().top(board_name(kind, university), max(limit, 0), offset)
+        users = CONTRIBUTOR_FIELDS.apply(User.objects.all(), selection).in_bulk([user_id for user_id, _ in entries])
+        to_dict = CONTRIBUTOR_FIELDS.serializer(selection)
+        results = []
+        for position, (user_id, points) in enumerate(entries, start=offset + 1):
+            user = users.get(user_id)
+            if user is None:
+                continue
+            results.append({'rank': position, 'points': points, 'user': to_dict(user)})
+        return Response({'board': board_name(kind, university), 'results': results})
+
+
+class MyRankView(APIView):
+    """
+    API endpoint for the current user's leaderboard positions
+    GET /api/auth/leaderboard/me/
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get(self, request):
+        leaderboard = get_leaderboard()
+        boards = {'global': 'global', 'weekly': 'weekly'}
+        if request.user.university:
+            boards['university'] = board_name('university', request.user.university)
+        data = {}
+        for kind, name in boards.items():
+            position = leaderboard.rank(name, request.user.pk)
+            data[kind] = {'rank': position[0], 'points': position[1]} if position else None
+        return Response(data)
@@ -1,4 +1,6 @@
 from django.contrib import admin
+from stax_api.changelists import ChangelistPerformanceMixin
+from stax_api.partial_saves import PartialSaveAdminMixin
 from .models import Category, Course, Lesson, Enrollment, Review, Certificate
 
 @admin.register(Category)
@@ -8,12 +10,14 @@ class CategoryAdmin(admin.ModelAdmin):
     search_fields = ['name']
 
 @admin.register(Course)
-class CourseAdmin(admin.ModelAdmin):
+class CourseAdmin(PartialSaveAdminMixin, admin.ModelAdmin):
     list_display = ['title', 'category', 'instructor_name', 'price', 'level', 'is_published', 'enrolled_count', 'rating', 'created_at']
     list_filter = ['category', 'level', 'is_published']
     search_fields = ['title', 'instructor_name']
     prepopulated_fields = {'slug': ('title',)}
     ordering = ['-created_at']
+    # Maintained from enrollments and reviews, see courses/aggregates.py
+    readonly_fields = ['enrolled_count', 'rating']
 
 @admin.register(Lesson)
 class LessonAdmin(admin.ModelAdmin):
@@ -23,14 +27,14 @@ class LessonAdmin(admin.ModelAdmin):
     ordering = ['course', 'order']
 
 @admin.register(Enrollment)
-class EnrollmentAdmin(admin.ModelAdmin):
+class EnrollmentAdmin(ChangelistPerformanceMixin, admin.ModelAdmin):
     list_display = ['user', 'course', 'progress_percentage', 'enrolled_at', 'completed_at', 'certificate_issued']
     list_filter = ['certificate_issued', 'course']
     search_fields = ['user__email', 'course__title']
     ordering = ['-enrolled_at']
 
 @admin.register(Review)
-class ReviewAdmin(admin.ModelAdmin):
+class ReviewAdmin(ChangelistPerformanceMixin, admin.ModelAdmin):
     list_display = ['user', 'course', 'rating', 'created_at']
     list_filter = ['rating', 'course']
     search_fields = ['user__email', 'course__title', 'comment']
@@ -0,0 +1,75 @@
+# courses/aggregates.py
+
+from django.db.models import Case, Count, F, FloatField, IntegerField, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce, Round
+
+from stax_api import object_cache
+from .models import Course, Enrollment, Review
+
+
+def _rating(sum_expression, count_expression, count_is_positive):
+    """Average rating rounded to 2 places, 0 when there are no reviews"""
+    return Case(
+        When(count_is_positive, then=Round(Cast(sum_expression, FloatField()) / count_expression, 2)),
+        default=Value(0),
+        output_field=Course._meta.get_field('rating'),
+    )
+
+
+def apply_review_delta(course_id, sum_delta, count_delta):
+    """
+    Shift a course's rating sum/count and recompute its average in one
+    UPDATE. Every right-hand side reads the pre-update column values, so
+    concurrent reviews never overwrite each other.
+    """
+    Course.objects.filter(pk=course_id).update(
+        rating_sum=F('rating_sum') + sum_delta,
+        rating_count=F('rating_count') + count_delta,
+        rating=_rating(
+            F('rating_sum') + sum_delta,
+            F('rating_count') + count_delta,
+            Q(rating_count__gt=-count_delta),
+        ),
+    )
+    object_cache.invalidate('courses.course', course_id)
+
+
+def apply_enrollment_delta(course_id, delta):
+    Course.objects.filter(pk=course_id).update(enrolled_count=F('enrolled_count') + delta)
+    object_cache.invalidate('courses.course', course_id)
+
+
+def reconcile(queryset=None, batch_size=1000, models=None):
+    """
+    Rebuild rating_sum/rating_count/rating/enrolled_count from the source
+    tables with set-based UPDATEs over primary-key batches. Returns the
+    number of courses processed. `models` lets migrations pass historical
+    (Course, Review, Enrollment) models.
+    """
+    course_model, review_model, enrollment_model = models or (Course, Review, Enrollment)
+    queryset = queryset if queryset is not None else course_model.objects.all()
+    reviews = review_model.objects.filter(course=OuterRef('pk')).order_by().values('course')
+    enrollments = enrollment_model.objects.filter(course=OuterRef('pk')).order_by().values('course')
+
+    processed = 0
+    last_pk = 0
+    while True:
+        ids = list(
+            queryset.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:batch_size]
+        )
+        if not ids:
+            return processed
+        last_pk = ids[-1]
+        batch = course_model.objects.filter(pk__in=ids)
+        batch.update(
+            rating_sum=Coalesce(Subquery(reviews.annotate(total=Sum('rating')).values('total')), 0),
+            rating_count=Coalesce(Subquery(reviews.annotate(total=Count('pk')).values('total')), 0),
+            enrolled_count=Coalesce(
+                Subquery(enrollments.annotate(total=Count('pk')).values('total'), output_field=IntegerField()), 0
+            ),
+        )
+        batch.update(rating=_rating(F('rating_sum'), F('rating_count'), Q(rating_count__gt=0)))
+        if models is None:
+            for pk in ids:
+                object_cache.invalidate('courses.course', pk)
+        processed += len(ids)
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from courses.aggregates import reconcile
+from courses.models import Course
+
+
+class Command(BaseCommand):
+    help = 'Rebuild Course rating and enrolled_count from reviews and enrollments'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ids', nargs='+', type=int, help='Only these course ids')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        queryset = Course.objects.all()
+        if options['ids']:
+            queryset = queryset.filter(pk__in=options['ids'])
+        processed = reconcile(queryset, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Reconciled {processed} courses'))
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['is_published', '-created_at', '-id'], name='course_catalog_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['category', 'is_published', '-created_at', '-id'], name='course_category_catalog_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['level', 'is_published', '-created_at', '-id'], name='course_level_catalog_idx'),
+        ),
+    ]
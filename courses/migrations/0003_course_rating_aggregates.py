@@ -0,0 +1,34 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:26
+
+from django.db import migrations, models
+
+
+def backfill_aggregates(apps, schema_editor):
+    from courses.aggregates import reconcile
+
+    reconcile(models=(
+        apps.get_model('courses', 'Course'),
+        apps.get_model('courses', 'Review'),
+        apps.get_model('courses', 'Enrollment'),
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0002_course_catalog_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='rating_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='rating_sum',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_aggregates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0003_course_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='instructor_image_renditions',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='thumbnail_image_renditions',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.8 on 2026-10-18 14:06
+
+from django.conf import settings
+from django.db import migrations, models
+
+from stax_api.migration_operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+
+    # Indexes on busy tables are built without blocking writes on PostgreSQL
+    atomic = False
+
+    dependencies = [
+        ('courses', '0004_course_image_renditions'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='enrollment',
+            index=models.Index(fields=['-enrolled_at', '-id'], name='enrollment_recent_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='review',
+            index=models.Index(fields=['-created_at', '-id'], name='review_recent_idx'),
+        ),
+    ]
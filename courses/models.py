@@ -41,15 +41,21 @@ class Course(models.Model):
     category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, related_name='courses')
     instructor_name = models.CharField(max_length=255)
     instructor_image = models.ImageField(upload_to='instructors/', blank=True, null=True)
+    instructor_image_renditions = models.JSONField(default=dict, blank=True, editable=False)
     instructor_bio = models.TextField(blank=True, null=True)
     
     price = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
     duration = models.CharField(max_length=100, help_text="e.g., '4 weeks', '20 hours'")
     level = models.CharField(max_length=20, choices=LEVEL_CHOICES, default='beginner')
     thumbnail_image = models.ImageField(upload_to='courses/', blank=True, null=True)
+    # Resized copies of the two images, built in the background (stax_api/images.py)
+    thumbnail_image_renditions = models.JSONField(default=dict, blank=True, editable=False)
     
     is_published = models.BooleanField(default=False)
+    # Denormalized from Enrollment/Review and kept current by courses/aggregates.py
     enrolled_count = models.IntegerField(default=0)
+    rating_sum = models.IntegerField(default=0, editable=False)
+    rating_count = models.IntegerField(default=0, editable=False)
     rating = models.DecimalField(
         max_digits=3, 
         decimal_places=2, 
@@ -62,6 +68,12 @@ class Course(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Keyset pagination of the public catalog on (created_at, id)
+            models.Index(fields=['is_published', '-created_at', '-id'], name='course_catalog_idx'),
+            models.Index(fields=['category', 'is_published', '-created_at', '-id'], name='course_category_catalog_idx'),
+            models.Index(fields=['level', 'is_published', '-created_at', '-id'], name='course_level_catalog_idx'),
+        ]
     
     def __str__(self):
         return self.title
@@ -107,6 +119,10 @@ class Enrollment(models.Model):
     class Meta:
         unique_together = ('user', 'course')
         ordering = ['-enrolled_at']
+        indexes = [
+            # Admin changelist pages
+            models.Index(fields=['-enrolled_at', '-id'], name='enrollment_recent_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.email} - {self.course.title}"
@@ -126,6 +142,10 @@ class Review(models.Model):
     class Meta:
         unique_together = ('user', 'course')
         ordering = ['-created_at']
+        indexes = [
+            # Admin changelist pages
+            models.Index(fields=['-created_at', '-id'], name='review_recent_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.full_name} - {self.course.title} ({self.rating}★)"
@@ -0,0 +1,72 @@
+# courses/signals.py
+
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from stax_api import object_cache
+from stax_api.images import schedule_renditions
+from . import aggregates
+from .models import Course, Enrollment, Lesson, Review
+
+
+@receiver([post_save, post_delete], sender=Course)
+def invalidate_course(sender, instance, **kwargs):
+    object_cache.invalidate('courses.course', instance.pk)
+
+
+@receiver(post_save, sender=Course)
+def build_course_image_renditions(sender, instance, update_fields=None, **kwargs):
+    schedule_renditions(instance, ['instructor_image', 'thumbnail_image'], update_fields)
+
+
+@receiver([post_save, post_delete], sender=Lesson)
+@receiver([post_save, post_delete], sender=Review)
+def invalidate_parent_course(sender, instance, **kwargs):
+    """Lessons are listed in the course detail and reviews change its rating"""
+    object_cache.invalidate('courses.course', instance.course_id)
+
+
+@receiver(post_init, sender=Review)
+@receiver(post_init, sender=Enrollment)
+def remember_loaded_values(sender, instance, **kwargs):
+    """Keep the values as loaded so post_save can compute deltas without a query"""
+    instance._loaded_course_id = instance.__dict__.get('course_id')
+    instance._loaded_rating = instance.__dict__.get('rating')
+
+
+@receiver(post_save, sender=Review)
+def update_rating_on_save(sender, instance, created, **kwargs):
+    if created:
+        aggregates.apply_review_delta(instance.course_id, instance.rating, 1)
+    else:
+        old_course_id, old_rating = instance._loaded_course_id, instance._loaded_rating
+        if old_course_id is None or old_rating is None:
+            # Saved from a deferred/partial instance: don't guess, re-derive
+            aggregates.reconcile(Course.objects.filter(pk=instance.course_id))
+        elif old_course_id != instance.course_id:
+            aggregates.apply_review_delta(old_course_id, -old_rating, -1)
+            aggregates.apply_review_delta(instance.course_id, instance.rating, 1)
+        elif old_rating != instance.rating:
+            aggregates.apply_review_delta(instance.course_id, instance.rating - old_rating, 0)
+    instance._loaded_course_id = instance.course_id
+    instance._loaded_rating = instance.rating
+
+
+@receiver(post_delete, sender=Review)
+def update_rating_on_delete(sender, instance, **kwargs):
+    aggregates.apply_review_delta(instance.course_id, -instance.rating, -1)
+
+
+@receiver(post_save, sender=Enrollment)
+def update_enrolled_count_on_save(sender, instance, created, **kwargs):
+    if created:
+        aggregates.apply_enrollment_delta(instance.course_id, 1)
+    elif instance._loaded_course_id not in (None, instance.course_id):
+        aggregates.apply_enrollment_delta(instance._loaded_course_id, -1)
+        aggregates.apply_enrollment_delta(instance.course_id, 1)
+    instance._loaded_course_id = instance.course_id
+
+
+@receiver(post_delete, sender=Enrollment)
+def update_enrolled_count_on_delete(sender, instance, **kwargs):
+    aggregates.apply_enrollment_delta(instance.course_id, -1)
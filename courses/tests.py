@@ -1,3 +1,145 @@
-from django.test import TestCase
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.contrib.admin.sites import site
+from django.core.cache import caches
+from django.test import RequestFactory, TestCase
+
+from accounts.models import User
+from accounts.tokens import ClaimsRefreshToken
+
+from . import aggregates, views
+from .models import Category, Course, Enrollment, Review
+
+
+class CourseDetailCacheTests(TestCase):
+    """The object cache never serves a course older than its last committed write"""
+
+    def setUp(self):
+        caches['default'].clear()
+        self.addCleanup(caches['default'].clear)
+        self.course = Course.objects.create(
+            title='Algorithms', description='Sorting and searching', instructor_name='Dr. Bello',
+            duration='6 weeks', is_published=True,
+        )
+        self.url = f'/api/courses/{self.course.pk}/'
+
+    def _rename(self, title):
+        with self.captureOnCommitCallbacks(execute=True):
+            course = Course.objects.get(pk=self.course.pk)
+            course.title = title
+            course.save()
+
+    def test_write_between_read_and_store_is_not_cached(self):
+        render = views.course_detail_to_dict
+
+        async def render_after_write(course):
+            # The row was read; another request commits an edit before this
+            # one stores its response
+            await sync_to_async(self._rename)('Algorithms II')
+            return await render(course)
+
+        with mock.patch.object(views, 'course_detail_to_dict', side_effect=render_after_write):
+            response = self.client.get(self.url)
+        self.assertEqual(response.json()['title'], 'Algorithms')
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.json()['title'], 'Algorithms II')
+
+    def test_edits_invalidate_on_commit(self):
+        self.assertEqual(self.client.get(self.url)['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get(self.url)['X-Cache'], 'HIT')
+        self._rename('Graphs')
+        response = self.client.get(self.url)
+        self.assertEqual((response['X-Cache'], response.json()['title']), ('MISS', 'Graphs'))
+
+
+class CourseAggregateTests(TestCase):
+    """Enrollment and rating columns follow their source rows"""
+
+    def setUp(self):
+        self.users = [
+            User.objects.create_user(
+                email=f'user{n}@example.com', username=f'user{n}', full_name=f'User {n}', password='x-Secret-123'
+            )
+            for n in range(3)
+        ]
+        category = Category.objects.create(name='Computer Science')
+        self.course, self.other = [
+            Course.objects.create(
+                title=title, description='Sorting and searching', instructor_name='Dr. Bello', duration='6 weeks',
+                category=category,
+            )
+            for title in ('Algorithms', 'Graphs')
+        ]
+
+    def _aggregates(self, course):
+        course.refresh_from_db()
+        return course.enrolled_count, course.rating_sum, course.rating_count, course.rating
+
+    def test_reviews_and_enrollments_apply_deltas(self):
+        for user in self.users:
+            Enrollment.objects.create(user=user, course=self.course)
+        reviews = [
+            Review.objects.create(user=user, course=self.course, rating=rating, comment='Good')
+            for user, rating in zip(self.users, (5, 4, 2))
+        ]
+        self.assertEqual(self._aggregates(self.course), (3, 11, 3, Decimal('3.67')))
+
+        reviews[2].rating = 5
+        reviews[2].save()
+        self.assertEqual(self._aggregates(self.course), (3, 14, 3, Decimal('4.67')))
+
+        reviews[1].course = self.other
+        reviews[1].save()
+        self.assertEqual(self._aggregates(self.course), (3, 10, 2, Decimal('5.00')))
+        self.assertEqual(self._aggregates(self.other), (0, 4, 1, Decimal('4.00')))
+
+        reviews[0].delete()
+        reviews[2].delete()
+        Enrollment.objects.filter(user=self.users[0]).delete()
+        self.assertEqual(self._aggregates(self.course), (2, 0, 0, Decimal('0.00')))
+
+    def test_reconcile_rebuilds_from_source_rows(self):
+        Enrollment.objects.create(user=self.users[0], course=self.course)
+        Review.objects.create(user=self.users[0], course=self.course, rating=4, comment='Good')
+        Review.objects.create(user=self.users[1], course=self.course, rating=3, comment='Fine')
+        Course.objects.update(enrolled_count=9, rating_sum=1, rating_count=7, rating=1)
+        self.assertEqual(aggregates.reconcile(batch_size=1), 2)
+        self.assertEqual(self._aggregates(self.course), (1, 7, 2, Decimal('3.50')))
+        self.assertEqual(self._aggregates(self.other), (0, 0, 0, Decimal('0.00')))
+
+    def _bump_aggregates(self):
+        Course.objects.filter(pk=self.course.pk).update(enrolled_count=4, rating_sum=9, rating_count=2, rating=4.5)
+
+    def test_put_keeps_aggregates_changed_since_the_read(self):
+        admin = User.objects.create_superuser(
+            email='admin@example.com', username='admin', full_name='Admin', password='x-Secret-123'
+        )
+        apply_body = views._apply_body
+
+        def apply_after_enrollment(course, body):
+            # Someone enrolls and reviews between the read and the save
+            self._bump_aggregates()
+            return apply_body(course, body)
+
+        access = ClaimsRefreshToken.for_user(admin).access_token
+        with mock.patch.object(views, '_apply_body', side_effect=apply_after_enrollment):
+            response = self.client.put(
+                f'/api/courses/{self.course.pk}/', {'title': 'Algorithms I'},
+                content_type='application/json', HTTP_AUTHORIZATION=f'Bearer {access}',
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._aggregates(self.course), (4, 9, 2, Decimal('4.50')))
+        self.assertEqual(self.course.title, 'Algorithms I')
+
+    def test_admin_saves_only_changed_fields(self):
+        request = RequestFactory().post('/')
+        request.user = self.users[0]
+        course = Course.objects.get(pk=self.course.pk)
+        self._bump_aggregates()
+        course.title = 'Algorithms I'
+        site._registry[Course].save_model(request, course, mock.Mock(changed_data=['title']), change=True)
+        self.assertEqual(self._aggregates(self.course), (4, 9, 2, Decimal('4.50')))
+        self.assertEqual(self.course.title, 'Algorithms I')
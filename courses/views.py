@@ -1,47 +1,256 @@
+from decimal import Decimal, InvalidOperation
+from operator import attrgetter
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError
+from django.utils.text import slugify
 from django.views.decorators.csrf import csrf_exempt
-from django.http import JsonResponse
-import json
 
-# Sample in-memory storage for testing
-courses = [
-    {"id": 1, "title": "Python Basics", "description": "Intro course"},
-    {"id": 2, "title": "Django for Beginners", "description": "Web dev"}
+from accounts.authentication import get_request_user
+from stax_api import object_cache
+from stax_api.fastjson import JsonResponse, loads
+from stax_api.fieldsets import Expansion, Field, Representation, column, file_url
+from stax_api.images import rendition_urls
+from stax_api.pagination import InvalidCursor, apaginate_keyset
+from stax_api.partial_saves import changed_columns
+from .models import Category, Course, Lesson
+
+# Fields clients may set through POST/PUT
+WRITABLE_FIELDS = [
+    'title', 'slug', 'description', 'instructor_name', 'instructor_bio',
+    'price', 'duration', 'level', 'is_published',
 ]
 
+CATALOG_ORDERING = ['-created_at', '-id']
+
+TRUE_VALUES = {'1', 'true', 'yes'}
+FALSE_VALUES = {'0', 'false', 'no'}
+
+
+CATEGORY_FIELDS = Representation({
+    'id': column('id'),
+    'name': column('name'),
+    'slug': column('slug'),
+})
+
+COURSE_FIELDS = Representation(
+    {
+        'id': column('id'),
+        'title': column('title'),
+        'slug': column('slug'),
+        'description': column('description'),
+        'category': Field(['category'], attrgetter('category_id')),
+        'instructor_name': column('instructor_name'),
+        'instructor_image': file_url('instructor_image'),
+        'instructor_image_renditions': Field(
+            ['instructor_image_renditions'], lambda course: rendition_urls(course.instructor_image_renditions)
+        ),
+        'price': column('price'),
+        'duration': column('duration'),
+        'level': column('level'),
+        'thumbnail_image': file_url('thumbnail_image'),
+        'thumbnail_image_renditions': Field(
+            ['thumbnail_image_renditions'], lambda course: rendition_urls(course.thumbnail_image_renditions)
+        ),
+        'is_published': column('is_published'),
+        'enrolled_count': column('enrolled_count'),
+        'rating': column('rating'),
+        'created_at': column('created_at'),
+        'updated_at': column('updated_at'),
+    },
+    expansions={'category': Expansion('category', CATEGORY_FIELDS)},
+    default_expand=['category'],
+)
+
+
+def course_to_dict(course):
+    """Serialize a Course (with its category already joined) to a dict"""
+    return COURSE_FIELDS.serializer()(course)
+
+
+async def course_detail_to_dict(course):
+    """course_to_dict plus the public lesson outline"""
+    lessons = Lesson.objects.filter(course=course).order_by('order', 'id').values(
+        'id', 'title', 'duration', 'order', 'is_free_preview'
+    )
+    return {**course_to_dict(course), "lessons": [lesson async for lesson in lessons]}
+
+
+def _parse_bool(value):
+    value = value.lower()
+    if value in TRUE_VALUES:
+        return True
+    if value in FALSE_VALUES:
+        return False
+    raise ValueError(f"Invalid boolean '{value}'")
+
+
+def _parse_decimal(value):
+    try:
+        return Decimal(value)
+    except InvalidOperation:
+        raise ValueError(f"Invalid number '{value}'")
+
+
+def filter_catalog(queryset, params, include_unpublished=False):
+    """Apply the catalog query-string filters to a Course queryset"""
+    is_published = params.get('is_published')
+    if is_published and include_unpublished:
+        queryset = queryset.filter(is_published=_parse_bool(is_published))
+    else:
+        queryset = queryset.filter(is_published=True)
+
+    category = params.get('category')
+    if category:
+        if category.isdigit():
+            queryset = queryset.filter(category_id=int(category))
+        else:
+            queryset = queryset.filter(category__slug=category)
+
+    level = params.get('level')
+    if level:
+        if level not in dict(Course.LEVEL_CHOICES):
+            raise ValueError(f"Invalid level '{level}'")
+        queryset = queryset.filter(level=level)
+
+    if params.get('min_price'):
+        queryset = queryset.filter(price__gte=_parse_decimal(params['min_price']))
+    if params.get('max_price'):
+        queryset = queryset.filter(price__lte=_parse_decimal(params['max_price']))
+    return queryset
+
+
+def _apply_body(course, body):
+    """Copy writable fields from a JSON body onto a course and validate it"""
+    for field in WRITABLE_FIELDS:
+        if field in body:
+            setattr(course, field, body[field])
+    if 'category' in body:
+        category = body['category']
+        if category is None:
+            course.category = None
+        else:
+            lookup = {'pk': category} if str(category).isdigit() else {'slug': category}
+            course.category = Category.objects.filter(**lookup).first()
+            if course.category is None:
+                raise ValidationError({'category': ['Category not found.']})
+    if not course.slug:
+        course.slug = slugify(course.title)
+    course.full_clean()
+
+
+def _errors(error):
+    """Flatten a ValidationError into something JSON serializable"""
+    return error.message_dict if hasattr(error, 'error_dict') else error.messages
+
+
+def _is_staff(request):
+    user = get_request_user(request)
+    return user is not None and user.is_staff
+
+
+def _load_body(request):
+    """Parse a JSON object body, raising ValidationError on bad input"""
+    try:
+        body = loads(request.body)
+    except ValueError:
+        raise ValidationError('Request body must be valid JSON.')
+    if not isinstance(body, dict):
+        raise ValidationError('Request body must be a JSON object.')
+    return body
+
+
+def _forbidden(request):
+    """Return an error response unless the caller is a staff user"""
+    user = get_request_user(request)
+    if user is None:
+        return JsonResponse({"error": "Authentication required"}, status=401)
+    if not user.is_staff:
+        return JsonResponse({"error": "Only staff can modify courses"}, status=403)
+    return None
+
+
 @csrf_exempt
-def course_list(request):
+async def course_list(request):
     """
     GET /api/courses/
-    Returns a list of all courses.
+    Returns a page of published courses, newest first.
+    Query params:
+        category      - category slug or id
+        level         - beginner | intermediate | advanced
+        min_price, max_price
+        is_published  - staff only, defaults to true
+        page_size     - up to 100
+        cursor        - opaque value taken from the previous page's "next"
+        fields        - comma-separated course fields to return, e.g.
+                        id,title,price; only those columns are read
+        expand        - category: render it as an object rather than its id
+                        (the default when fields is not given)
+    Response JSON:
+        {
+            "next": "<url of the next page or null>",
+            "results": [{course object}, ...]
+        }
 
-    POST /api/courses/
+    POST /api/courses/ (staff only)
     Creates a new course.
     Request body JSON format:
         {
             "title": "Course Title",
-            "description": "Course Description"
+            "description": "Course Description",
+            "instructor_name": "Instructor",
+            "duration": "4 weeks",
+            "category": "category-slug"
         }
     Response JSON:
         {
             "message": "Course created",
             "data": {course object}
         }
+
+    GET is served on the async ORM; POST runs synchronously.
     """
     if request.method == 'GET':
-        return JsonResponse(courses, safe=False)
-    elif request.method == 'POST':
-        body = json.loads(request.body)
-        new_course = {"id": len(courses)+1, **body}
-        courses.append(new_course)
-        return JsonResponse({"message": "Course created", "data": new_course}, status=201)
+        try:
+            selection = COURSE_FIELDS.select(request.GET)
+            include_unpublished = 'is_published' in request.GET and await sync_to_async(_is_staff)(request)
+            queryset = filter_catalog(
+                COURSE_FIELDS.apply(Course.objects.all(), selection, keep=CATALOG_ORDERING),
+                request.GET,
+                include_unpublished=include_unpublished,
+            )
+            rows, next_url = await apaginate_keyset(request, queryset, CATALOG_ORDERING)
+        except (ValueError, ValidationError, InvalidCursor) as e:
+            return JsonResponse({"error": str(e)}, status=400)
+        to_dict = COURSE_FIELDS.serializer(selection)
+        return JsonResponse({
+            "next": next_url,
+            "results": [to_dict(course) for course in rows],
+        })
+    return await sync_to_async(_course_list_write)(request)
+
+
+def _course_list_write(request):
+    if request.method == 'POST':
+        error = _forbidden(request)
+        if error:
+            return error
+        course = Course()
+        try:
+            _apply_body(course, _load_body(request))
+        except ValidationError as e:
+            return JsonResponse({"error": _errors(e)}, status=400)
+        course.save()
+        return JsonResponse({"message": "Course created", "data": course_to_dict(course)}, status=201)
+    return JsonResponse({"error": "Method not allowed"}, status=405)
 
 @csrf_exempt
-def course_detail(request, id):
+async def course_detail(request, id):
     """
     GET /api/courses/<id>/
-    Retrieves details of a single course by ID.
+    Retrieves details of a single course by ID, with its lesson outline.
 
-    PUT /api/courses/<id>/
+    PUT /api/courses/<id>/ (staff only)
     Updates the course with the given ID.
     Request body JSON can include any of the course fields:
         {
@@ -49,21 +258,53 @@ def course_detail(request, id):
             "description": "New Description"
         }
 
-    DELETE /api/courses/<id>/
+    DELETE /api/courses/<id>/ (staff only)
     Deletes the course with the given ID.
+
+    GET is served on the async ORM; PUT and DELETE run synchronously.
     """
-    course = next((c for c in courses if c["id"] == id), None)
+    if request.method != 'GET':
+        return await sync_to_async(_course_detail_write)(request, id)
+
+    # Published courses are served from the object cache when possible
+    version = await object_cache.aversion('courses.course', id)
+    cached = await object_cache.aget_response('courses.course', id, version)
+    if cached is not None:
+        return cached
+
+    course = await Course.objects.select_related('category').filter(pk=id).afirst()
     if not course:
         return JsonResponse({"error": "Course not found"}, status=404)
-    
-    if request.method == 'GET':
-        return JsonResponse(course)
-    
-    elif request.method == 'PUT':
-        body = json.loads(request.body)
-        course.update(body)
-        return JsonResponse({"message": "Course updated", "data": course})
-    
+    if not course.is_published:
+        if not await sync_to_async(_is_staff)(request):
+            return JsonResponse({"error": "Course not found"}, status=404)
+        return JsonResponse(await course_detail_to_dict(course))
+    response = JsonResponse(await course_detail_to_dict(course))
+    return await object_cache.aset_response('courses.course', course.pk, response, version)
+
+
+def _course_detail_write(request, id):
+    course = Course.objects.select_related('category').filter(pk=id).first()
+    if not course:
+        return JsonResponse({"error": "Course not found"}, status=404)
+
+    error = _forbidden(request)
+    if error:
+        return error
+
+    if request.method == 'PUT':
+        try:
+            body = _load_body(request)
+            _apply_body(course, body)
+        except ValidationError as e:
+            return JsonResponse({"error": _errors(e)}, status=400)
+        # Only the edited columns: enrolled_count and the rating columns are
+        # maintained by courses/aggregates.py and may have moved since the read
+        edited = [field for field in [*WRITABLE_FIELDS, 'category'] if field in body]
+        course.save(update_fields=changed_columns(course, [*edited, 'slug']))
+        return JsonResponse({"message": "Course updated", "data": course_to_dict(course)})
+
     elif request.method == 'DELETE':
-        courses.remove(course)
+        course.delete()
         return JsonResponse({"message": "Course deleted"})
+    return JsonResponse({"error": "Method not allowed"}, status=405)
@@ -1,40 +1,60 @@
 from django.contrib import admin
-from .models import PastQuestion, Contribution, QuestionDownload
+from stax_api.changelists import ChangelistPerformanceMixin
+from stax_api.partial_saves import PartialSaveAdminMixin
+from . import moderation
+from .models import PastQuestion, Contribution, QuestionDownload, UploadSession
 
 @admin.register(PastQuestion)
-class PastQuestionAdmin(admin.ModelAdmin):
-    list_display = ['course_code', 'course_name', 'university', 'year', 'semester', 'uploaded_by', 'status', 'views_count', 'downloads_count', 'created_at']
-    list_filter = ['status', 'university', 'year', 'semester', 'category']
+class PastQuestionAdmin(PartialSaveAdminMixin, ChangelistPerformanceMixin, admin.ModelAdmin):
+    list_display = ['course_code', 'course_name', 'university', 'year', 'semester', 'uploaded_by', 'status', 'processing_status', 'page_count', 'duplicate_of', 'views_count', 'downloads_count', 'created_at']
+    list_filter = ['status', 'processing_status', ('duplicate_of', admin.EmptyFieldListFilter), 'university', 'year', 'semester', 'category']
+    raw_id_fields = ['duplicate_of']
     search_fields = ['course_code', 'course_name', 'university', 'uploaded_by__email']
     ordering = ['-created_at']
+    # Maintained by the counter buffer, see questions/counters.py
+    readonly_fields = ['views_count', 'downloads_count']
     
-    actions = ['approve_questions', 'reject_questions']
+    actions = ['approve_questions', 'reject_questions', 'reprocess_questions']
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).defer('extracted_text')
     
     def approve_questions(self, request, queryset):
-        for question in queryset:
-            if question.status == 'pending':
-                question.status = 'approved'
-                question.reviewed_by = request.user
-                question.save()
-                # Award points to contributor
-                question.uploaded_by.add_points(question.points_earned)
-        self.message_user(request, f'{queryset.count()} questions approved')
+        result = moderation.approve_questions(queryset, reviewer=request.user)
+        self.message_user(
+            request,
+            f'{result.processed} questions approved, {result.points_awarded} points '
+            f'awarded to {result.contributors} contributors'
+        )
     approve_questions.short_description = 'Approve selected questions'
     
     def reject_questions(self, request, queryset):
-        queryset.update(status='rejected', reviewed_by=request.user)
-        self.message_user(request, f'{queryset.count()} questions rejected')
+        result = moderation.reject_questions(queryset, reviewer=request.user)
+        self.message_user(request, f'{result.processed} questions rejected')
     reject_questions.short_description = 'Reject selected questions'
+    
+    def reprocess_questions(self, request, queryset):
+        count = queryset.update(processing_status='pending')
+        self.message_user(request, f'{count} questions queued for processing')
+    reprocess_questions.short_description = 'Re-run text extraction and previews'
 
 @admin.register(Contribution)
-class ContributionAdmin(admin.ModelAdmin):
+class ContributionAdmin(ChangelistPerformanceMixin, admin.ModelAdmin):
     list_display = ['user', 'past_question', 'points_awarded', 'status', 'created_at']
     list_filter = ['status']
     search_fields = ['user__email', 'past_question__course_code']
     ordering = ['-created_at']
 
 @admin.register(QuestionDownload)
-class QuestionDownloadAdmin(admin.ModelAdmin):
+class QuestionDownloadAdmin(ChangelistPerformanceMixin, admin.ModelAdmin):
     list_display = ['user', 'past_question', 'downloaded_at']
     search_fields = ['user__email', 'past_question__course_code']
     ordering = ['-downloaded_at']
+
+@admin.register(UploadSession)
+class UploadSessionAdmin(admin.ModelAdmin):
+    list_display = ['filename', 'user', 'size', 'status', 'past_question', 'created_at', 'expires_at']
+    list_filter = ['status']
+    search_fields = ['filename', 'user__email']
+    ordering = ['-created_at']
+    raw_id_fields = ['user', 'past_question']
@@ -0,0 +1,303 @@
+# questions/counters.py
+
+import atexit
+import logging
+import threading
+import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Case, F, IntegerField, Value, When
+
+logger = logging.getLogger(__name__)
+
+COUNTER_FIELDS = ('views_count', 'downloads_count')
+
+DEFAULTS = {
+    'BACKEND': 'memory',      # 'memory' (per process) or 'cache' (shared, e.g. Redis)
+    'CACHE_ALIAS': 'default',
+    'FLUSH_INTERVAL': 5,      # seconds; 0 writes every increment straight through
+    'FLUSH_THRESHOLD': 1000,  # flush early once this many increments are pending
+    'SWEEP_INTERVAL': 300,    # seconds between sweeps of every cached counter ('cache' only)
+}
+
+
+def counter_settings():
+    return {**DEFAULTS, **getattr(settings, 'STAX_COUNTERS', {})}
+
+
+class CounterBuffer:
+    """
+    Write-behind buffer for PastQuestion engagement counters.
+
+    Increments are accumulated per (pk, field) and written by a background
+    thread as one atomic UPDATE ... SET views_count = views_count + CASE ...
+    per flush, so hot rows take one short lock per interval instead of one
+    read-modify-write per hit. Counts read through pending() are approximate
+    until the next flush.
+    """
+
+    def __init__(self, flush_interval, flush_threshold):
+        self.flush_interval = flush_interval
+        self.flush_threshold = flush_threshold
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pending_total = 0
+
+    # Storage hooks implemented by subclasses
+
+    def _add(self, key, amount):
+        raise NotImplementedError
+
+    def _get(self, key):
+        raise NotImplementedError
+
+    def _drain(self):
+        """Take every pending increment, returning {(pk, field): amount}"""
+        raise NotImplementedError
+
+    # Public API
+
+    def incr(self, pk, field, amount=1):
+        if field not in COUNTER_FIELDS:
+            raise ValueError(f'{field} is not a buffered counter')
+        if not self.flush_interval:
+            self.write({(pk, field): amount})
+            return
+        with self._lock:
+            self._add((pk, field), amount)
+            self._pending_total += amount
+            if self._thread is None:
+                # Started lazily so each (forked) worker process gets its own
+                self._thread = threading.Thread(target=self._run, name='counter-flush', daemon=True)
+                self._thread.start()
+            if self._pending_total >= self.flush_threshold:
+                self._wakeup.set()
+
+    async def aincr(self, pk, field, amount=1):
+        """incr() for async code: the cache round trips or the write run off the event loop"""
+        await sync_to_async(self.incr)(pk, field, amount)
+
+    def pending(self, pk, field):
+        """Increments for a row that have not reached the database yet"""
+        return self._get((pk, field)) if self.flush_interval else 0
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                increments = self._drain()
+                self._pending_total = 0
+            if not increments:
+                return
+            try:
+                self.write(increments)
+            except Exception:
+                # Keep them for the next flush rather than losing them
+                with self._lock:
+                    for key, amount in increments.items():
+                        self._add(key, amount)
+                        self._pending_total += amount
+                raise
+
+    def write(self, increments):
+        """Apply {(pk, field): amount} as a single atomic UPDATE"""
+        model = apps.get_model('questions', 'PastQuestion')
+        per_field = defaultdict(dict)
+        for (pk, field), amount in increments.items():
+            per_field[field][pk] = amount
+        updates = {
+            field: F(field) + Case(
+                *[When(pk=pk, then=Value(amount)) for pk, amount in amounts.items()],
+                default=Value(0),
+                output_field=IntegerField(),
+            )
+            for field, amounts in per_field.items()
+        }
+        model.objects.filter(pk__in={pk for pk, _ in increments}).update(**updates)
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Failed to flush question counters')
+
+
+class MemoryCounterBuffer(CounterBuffer):
+    """Increments held in this process only"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._counts = defaultdict(int)
+
+    async def aincr(self, pk, field, amount=1):
+        if not self.flush_interval:
+            return await super().aincr(pk, field, amount)
+        # A dict update under a lock held for microseconds: fine on the loop
+        self.incr(pk, field, amount)
+
+    def _add(self, key, amount):
+        self._counts[key] += amount
+
+    def _get(self, key):
+        return self._counts.get(key, 0)
+
+    def _drain(self):
+        counts, self._counts = self._counts, defaultdict(int)
+        return dict(counts)
+
+
+class CacheCounterBuffer(CounterBuffer):
+    """
+    Increments held in a Django cache (Redis or memcached) so every worker
+    sees the same approximate counts.
+
+    Workers drain one at a time under a lock held in the cache, and each
+    key is decremented by the amount read, so increments that land between
+    the read and the write are kept for the next flush. A worker that finds
+    the lock taken keeps its keys for its next flush.
+
+    Each worker only remembers the keys it incremented itself, so keys left
+    by a worker that died before flushing are picked up by sweep(), which
+    checks the counter keys of every question. Every worker sweeps on its
+    first flush and then every sweep_interval seconds.
+    """
+
+    LOCK_KEY = 'questions:counter:flush-lock'
+    # Seconds before a lock left by a crashed worker is ignored
+    LOCK_TIMEOUT = 60
+    SWEEP_BATCH = 500
+
+    def __init__(self, cache_alias, *args, sweep_interval=DEFAULTS['SWEEP_INTERVAL'], **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cache = caches[cache_alias]
+        self.sweep_interval = sweep_interval
+        self._dirty = set()
+        self._next_sweep = 0
+
+    @staticmethod
+    def _cache_key(key):
+        pk, field = key
+        return f'questions:counter:{field}:{pk}'
+
+    def _add(self, key, amount):
+        cache_key = self._cache_key(key)
+        self.cache.add(cache_key, 0, timeout=None)
+        self.cache.incr(cache_key, amount)
+        self._dirty.add(key)
+
+    def _get(self, key):
+        return max(self.cache.get(self._cache_key(key)) or 0, 0)
+
+    @contextmanager
+    def _drain_lock(self):
+        token = uuid.uuid4().hex
+        acquired = self.cache.add(self.LOCK_KEY, token, timeout=self.LOCK_TIMEOUT)
+        try:
+            yield acquired
+        finally:
+            if acquired and self.cache.get(self.LOCK_KEY) == token:
+                self.cache.delete(self.LOCK_KEY)
+
+    def _drain(self):
+        with self._drain_lock() as acquired:
+            if not acquired:
+                return {}
+            dirty, self._dirty = self._dirty, set()
+            return self._claim_all(dirty)
+
+    def _claim_all(self, keys):
+        increments = {}
+        for key in keys:
+            amount = self._claim(self._cache_key(key))
+            if amount:
+                increments[key] = amount
+        return increments
+
+    def flush(self):
+        super().flush()
+        if time.monotonic() >= self._next_sweep:
+            self.sweep()
+
+    def sweep(self):
+        """Write the pending increments of every question, whichever worker made them"""
+        self._next_sweep = time.monotonic() + self.sweep_interval
+        model = apps.get_model('questions', 'PastQuestion')
+        pks = model.objects.order_by('pk').values_list('pk', flat=True).iterator(chunk_size=self.SWEEP_BATCH)
+        with self._flush_lock:
+            while batch := list(islice(pks, self.SWEEP_BATCH)):
+                keys = {self._cache_key((pk, field)): (pk, field) for pk in batch for field in COUNTER_FIELDS}
+                # One round trip per batch to find the few keys worth claiming
+                found = [keys[cache_key] for cache_key, value in self.cache.get_many(keys).items() if value]
+                if not found:
+                    continue
+                with self._drain_lock() as acquired:
+                    if not acquired:
+                        # Another worker is draining; the next sweep catches up
+                        return
+                    increments = self._claim_all(found)
+                if not increments:
+                    continue
+                try:
+                    self.write(increments)
+                except Exception:
+                    with self._lock:
+                        for key, amount in increments.items():
+                            self._add(key, amount)
+                    raise
+
+    def _claim(self, cache_key):
+        """Atomically take up to the current value of a counter key"""
+        amount = self.cache.get(cache_key) or 0
+        if amount <= 0:
+            return 0
+        try:
+            remaining = self.cache.decr(cache_key, amount)
+        except ValueError:
+            # Evicted since the read: nothing left to take
+            return 0
+        if remaining < 0:
+            # Someone else took part of it (a lock that expired mid-drain):
+            # give back what was not there
+            self.cache.incr(cache_key, -remaining)
+            amount += remaining
+        return max(amount, 0)
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_counter_buffer():
+    """Process-wide CounterBuffer configured from STAX_COUNTERS"""
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                config = counter_settings()
+                args = (config['FLUSH_INTERVAL'], config['FLUSH_THRESHOLD'])
+                if config['BACKEND'] == 'cache':
+                    _buffer = CacheCounterBuffer(
+                        config['CACHE_ALIAS'], *args, sweep_interval=config['SWEEP_INTERVAL']
+                    )
+                else:
+                    _buffer = MemoryCounterBuffer(*args)
+                atexit.register(_flush_at_exit)
+    return _buffer
+
+
+def _flush_at_exit():
+    try:
+        _buffer.flush()
+    except Exception:
+        logger.exception('Failed to flush question counters at exit')
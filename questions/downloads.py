@@ -0,0 +1,128 @@
+# questions/downloads.py
+
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.http import content_disposition_header, http_date, parse_http_date_safe, quote_etag
+
+from .models import PastQuestion, QuestionDownload
+
+DEFAULTS = {
+    # None streams from Django; 'nginx' sends X-Accel-Redirect and
+    # 'apache'/'lighttpd' send X-Sendfile so the front-end server does the I/O
+    'SENDFILE_BACKEND': None,
+    'SENDFILE_URL_PREFIX': '/protected/',  # nginx internal location mapped to MEDIA_ROOT
+    'CHUNK_SIZE': 64 * 1024,
+}
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def download_settings():
+    return {**DEFAULTS, **getattr(settings, 'STAX_DOWNLOADS', {})}
+
+
+def record_download(question_id, user_id):
+    """Remember who downloaded a question and bump its download counter"""
+    QuestionDownload.objects.bulk_create(
+        [QuestionDownload(user_id=user_id, past_question_id=question_id)],
+        ignore_conflicts=True,
+    )
+    PastQuestion(pk=question_id).increment_downloads()
+
+
+def parse_range(header, size):
+    """
+    Parse a single-range Range header into an inclusive (start, end).
+
+    Returns None when the header should be ignored (absent, malformed or
+    multi-range, in which case the whole file is sent) and raises ValueError
+    when the range cannot be satisfied.
+    """
+    match = RANGE_RE.match(header or '')
+    if not match or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+        if start >= size or (last and int(last) < start):
+            raise ValueError
+    else:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            raise ValueError
+        start, end = max(size - length, 0), size - 1
+    return start, end
+
+
+def _file_chunks(path, start, length, chunk_size):
+    with open(path, 'rb') as handle:
+        handle.seek(start)
+        while length > 0:
+            data = handle.read(min(chunk_size, length))
+            if not data:
+                break
+            length -= len(data)
+            yield data
+
+
+def file_response(request, field_file, etag, last_modified):
+    """
+    Serve a FieldFile without loading it into memory.
+
+    Honours single-range requests (206/416) and If-Range, or hands the
+    transfer to the front-end server when a sendfile backend is configured.
+    """
+    config = download_settings()
+    path = field_file.path
+    size = os.path.getsize(path)
+    filename = os.path.basename(field_file.name)
+    content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+
+    backend = config['SENDFILE_BACKEND']
+    if backend:
+        response = HttpResponse(content_type=content_type)
+        if backend == 'nginx':
+            response['X-Accel-Redirect'] = config['SENDFILE_URL_PREFIX'].rstrip('/') + '/' + field_file.name
+        else:
+            response['X-Sendfile'] = path
+    else:
+        byte_range = None
+        if_range = request.headers.get('If-Range')
+        if not if_range or if_range == etag or parse_http_date_safe(if_range) == last_modified:
+            try:
+                byte_range = parse_range(request.headers.get('Range'), size)
+            except ValueError:
+                response = HttpResponse(status=416)
+                response['Content-Range'] = f'bytes */{size}'
+                return response
+
+        if byte_range is None:
+            response = FileResponse(open(path, 'rb'), content_type=content_type)
+        else:
+            start, end = byte_range
+            length = end - start + 1
+            response = StreamingHttpResponse(
+                _file_chunks(path, start, length, config['CHUNK_SIZE']),
+                status=206,
+                content_type=content_type,
+            )
+            response['Content-Length'] = str(length)
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Content-Disposition'] = content_disposition_header(True, filename)
+    return response
+
+
+def file_validators(field_file):
+    """ETag and Last-Modified (epoch seconds) for a stored file"""
+    stat = os.stat(field_file.path)
+    return quote_etag(f'{stat.st_size:x}-{int(stat.st_mtime):x}'), int(stat.st_mtime)
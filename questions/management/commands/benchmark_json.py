@@ -0,0 +1,75 @@
+import timeit
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.http import JsonResponse as DjangoJsonResponse
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from accounts.models import User
+from courses.models import Category, Course
+from courses.views import course_to_dict
+from questions.models import PastQuestion
+from questions.views import question_to_dict
+from stax_api import fastjson
+
+
+def _payloads(size):
+    """Unsaved rows shaped like a full page of each listing, serialized to dicts"""
+    now = timezone.now()
+    user = User(pk=1, full_name='Ada Obi')
+    category = Category(pk=1, name='Computer Science', slug='computer-science')
+    questions = [
+        PastQuestion(
+            pk=i, title=f'CSC 201 Data Structures {i}', university='University of Lagos', course_code='CSC 201',
+            course_name='Data Structures', year=2020 + i % 4, semester='first', category_id=1, uploaded_by=user,
+            status='approved', file=f'past_questions/csc201_{i}.pdf', file_type='pdf', views_count=i * 7,
+            downloads_count=i * 3, page_count=4, created_at=now,
+        )
+        for i in range(1, size + 1)
+    ]
+    courses = [
+        Course(
+            pk=i, title=f'Introduction to Algorithms {i}', slug=f'intro-algorithms-{i}',
+            description='Sorting, searching and graph algorithms. ' * 5, category=category,
+            instructor_name='Dr. Bello', price=Decimal('4999.99'), duration='6 weeks', level='beginner',
+            is_published=True, enrolled_count=i * 11, rating=Decimal('4.50'), created_at=now, updated_at=now,
+        )
+        for i in range(1, size + 1)
+    ]
+    return {
+        'questions': {"next": None, "results": [question_to_dict(question) for question in questions]},
+        'courses': {"next": None, "results": [course_to_dict(course) for course in courses]},
+    }
+
+
+class Command(BaseCommand):
+    help = 'Compare JSON encoding/decoding of a listing page across the available backends'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=100, help='Rows per page')
+        parser.add_argument('--iterations', type=int, default=200)
+
+    def _time(self, fn, iterations):
+        # Best of five runs, in microseconds per call
+        return min(timeit.repeat(fn, number=iterations, repeat=5)) / iterations * 1e6
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        drf = JSONRenderer()
+        self.stdout.write(f"Backends available: {', '.join(fastjson.available_backends())}")
+        for name, payload in _payloads(options['size']).items():
+            self.stdout.write(f"\n{name}: {options['size']} rows")
+            baseline = self._time(lambda: DjangoJsonResponse(payload), iterations)
+            rows = [
+                ('django JsonResponse (current)', baseline),
+                ('DRF JSONRenderer (current)', self._time(lambda: drf.render(payload), iterations)),
+            ]
+            body = DjangoJsonResponse(payload).content
+            for backend in fastjson.encode_backends():
+                rows.append((f'encode: {backend}', self._time(lambda: fastjson.dumps(payload, backend), iterations)))
+            rows.append(('decode: json (current)', self._time(lambda: fastjson.loads(body, 'json'), iterations)))
+            for backend in fastjson.available_backends()[1:]:
+                rows.append((f'decode: {backend}', self._time(lambda: fastjson.loads(body, backend), iterations)))
+            for label, micros in rows:
+                self.stdout.write(f'  {label:<32} {micros:>10.1f} us   x{baseline / micros:.1f}')
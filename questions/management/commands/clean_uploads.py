@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from questions.models import UploadSession
+from questions.uploads import discard_session
+
+
+class Command(BaseCommand):
+    help = 'Delete expired, unfinished chunked uploads and their chunks'
+
+    def handle(self, *args, **options):
+        # 'assembling' past expiry means the worker completing it died
+        expired = UploadSession.objects.filter(status__in=['open', 'assembling'], expires_at__lte=timezone.now())
+        count = 0
+        for session in expired.iterator():
+            discard_session(session)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f'Removed {count} expired uploads'))
@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.models import User
+from questions import moderation
+from questions.models import PastQuestion, normalize_course_code, normalize_university
+
+
+class Command(BaseCommand):
+    help = 'Approve or reject pending past questions in chunked transactions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=['approve', 'reject'])
+        parser.add_argument('--ids', nargs='+', type=int, help='Only these question ids')
+        parser.add_argument('--university')
+        parser.add_argument('--course-code')
+        parser.add_argument('--uploaded-by', help='Contributor email')
+        parser.add_argument('--reviewer', help='Email of the staff user recorded as reviewer')
+        parser.add_argument('--notes', default='', help='Review notes stored on every question')
+        parser.add_argument('--chunk-size', type=int, default=moderation.DEFAULT_CHUNK_SIZE)
+        parser.add_argument('--dry-run', action='store_true', help='Only count the matching questions')
+
+    def handle(self, *args, **options):
+        queryset = PastQuestion.objects.filter(status='pending')
+        if options['ids']:
+            queryset = queryset.filter(pk__in=options['ids'])
+        if options['university']:
+            queryset = queryset.filter(university_normalized=normalize_university(options['university']))
+        if options['course_code']:
+            queryset = queryset.filter(course_code_normalized=normalize_course_code(options['course_code']))
+        if options['uploaded_by']:
+            queryset = queryset.filter(uploaded_by__email=options['uploaded_by'].lower())
+
+        reviewer = None
+        if options['reviewer']:
+            reviewer = User.objects.filter(email=options['reviewer'].lower(), is_staff=True).first()
+            if reviewer is None:
+                raise CommandError(f"No staff user with email {options['reviewer']}")
+
+        if options['dry_run']:
+            self.stdout.write(f'{queryset.count()} pending questions match')
+            return
+
+        def progress(done, total):
+            self.stdout.write(f'{done}/{total} questions processed')
+
+        moderate = moderation.approve_questions if options['action'] == 'approve' else moderation.reject_questions
+        result = moderate(
+            queryset,
+            reviewer=reviewer,
+            notes=options['notes'],
+            chunk_size=options['chunk_size'],
+            progress=progress,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"{result.processed} questions {options['action']}d, {result.points_awarded} points "
+            f"awarded to {result.contributors} contributors"
+        ))
@@ -0,0 +1,59 @@
+import time
+from concurrent.futures.process import BrokenProcessPool
+
+from django.core.management.base import BaseCommand
+
+from questions import processing
+
+
+class Command(BaseCommand):
+    help = 'Extract page counts, text and previews of past-question files on worker processes'
+
+    def add_arguments(self, parser):
+        config = processing.processing_settings()
+        parser.add_argument('--workers', type=int, default=config['WORKERS'])
+        parser.add_argument('--batch-size', type=int, default=config['BATCH_SIZE'])
+        parser.add_argument('--interval', type=float, default=config['POLL_INTERVAL'],
+                            help='Seconds to wait when the queue is empty')
+        parser.add_argument('--once', action='store_true', help='Exit once the queue is empty')
+        parser.add_argument('--requeue-stuck', action='store_true',
+                            help="Put questions left in 'processing' by a killed worker back in the queue first")
+        parser.add_argument('--retry-failed', action='store_true', help='Put failed questions back in the queue first')
+
+    def handle(self, *args, **options):
+        statuses = []
+        if options['requeue_stuck']:
+            statuses.append('processing')
+        if options['retry_failed']:
+            statuses.append('failed')
+        if statuses:
+            self.stdout.write(f'Requeued {processing.requeue(statuses)} questions')
+
+        total = 0
+        # Questions requeued by a crash are retried one per batch, so the
+        # file that kills a worker is failed on its own
+        one_by_one = 0
+        pool = processing.process_pool(options['workers'])
+        try:
+            while True:
+                try:
+                    count = processing.process_batch(pool, 1 if one_by_one else options['batch_size'])
+                except BrokenProcessPool as e:
+                    self.stderr.write('A worker process died; starting a new pool')
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    pool = processing.process_pool(options['workers'])
+                    one_by_one = max(one_by_one - 1, getattr(e, 'requeued', 0))
+                    continue
+                one_by_one = max(one_by_one - count, 0)
+                total += count
+                if count:
+                    self.stdout.write(f'Processed {total} questions')
+                elif options['once']:
+                    break
+                else:
+                    time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            pool.shutdown()
+        self.stdout.write(self.style.SUCCESS(f'Processed {total} questions'))
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:17
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_search_keys(apps, schema_editor):
+    from questions.models import normalize_course_code, normalize_university
+
+    PastQuestion = apps.get_model('questions', 'PastQuestion')
+    batch = []
+    for question in PastQuestion.objects.only('id', 'university', 'course_code').iterator(chunk_size=2000):
+        question.university_normalized = normalize_university(question.university)
+        question.course_code_normalized = normalize_course_code(question.course_code)
+        batch.append(question)
+        if len(batch) >= 2000:
+            PastQuestion.objects.bulk_update(batch, ['university_normalized', 'course_code_normalized'])
+            batch = []
+    if batch:
+        PastQuestion.objects.bulk_update(batch, ['university_normalized', 'course_code_normalized'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0002_course_catalog_indexes'),
+        ('questions', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pastquestion',
+            name='course_code_normalized',
+            field=models.CharField(default='', editable=False, max_length=50),
+        ),
+        migrations.AddField(
+            model_name='pastquestion',
+            name='university_normalized',
+            field=models.CharField(default='', editable=False, max_length=255),
+        ),
+        migrations.RunPython(backfill_search_keys, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='pastquestion',
+            index=models.Index(fields=['status', 'university_normalized', 'course_code_normalized', '-year'], name='pq_search_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pastquestion',
+            index=models.Index(fields=['status', 'course_code_normalized', '-year'], name='pq_code_year_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pastquestion',
+            index=models.Index(fields=['status', '-created_at', '-id'], name='pq_status_created_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.8 on 2026-10-18 14:06
+
+from django.conf import settings
+from django.db import migrations, models
+
+from stax_api.migration_operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+
+    # Indexes on busy tables are built without blocking writes on PostgreSQL
+    atomic = False
+
+    dependencies = [
+        ('courses', '0005_admin_changelist_indexes'),
+        ('questions', '0004_past_question_processing'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='contribution',
+            index=models.Index(fields=['-created_at', '-id'], name='contribution_created_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='pastquestion',
+            index=models.Index(fields=['-created_at', '-id'], name='pq_created_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='questiondownload',
+            index=models.Index(fields=['-downloaded_at', '-id'], name='download_recent_idx'),
+        ),
+    ]
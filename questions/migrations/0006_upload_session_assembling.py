@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 14:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('questions', '0005_admin_changelist_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='uploadsession',
+            name='status',
+            field=models.CharField(choices=[('open', 'Open'), ('assembling', 'Assembling'), ('complete', 'Complete')], default='open', max_length=20),
+        ),
+    ]
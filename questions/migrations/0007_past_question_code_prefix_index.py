@@ -0,0 +1,26 @@
+# Generated by Django 5.2.8 on 2026-10-18 15:01
+
+from django.db import migrations, models
+
+from stax_api.migration_operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+
+    # Indexes on busy tables are built without blocking writes on PostgreSQL
+    atomic = False
+
+    dependencies = [
+        ('questions', '0006_upload_session_assembling'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='pastquestion',
+            index=models.Index(
+                fields=['status', 'course_code_normalized'],
+                name='pq_code_prefix_idx',
+                opclasses=['varchar_pattern_ops', 'varchar_pattern_ops'],
+            ),
+        ),
+    ]
@@ -1,9 +1,24 @@
 # questions/models.py
 
+import re
+import uuid
+
 from django.db import models
+from django.db.models import DEFERRED
 from django.core.validators import MinValueValidator
 from accounts.models import User
 from courses.models import Category
+from .counters import get_counter_buffer
+
+def normalize_course_code(value):
+    """'csc 201', 'CSC-201' and 'CSC201' all become 'CSC201'"""
+    return re.sub(r'[^A-Z0-9]', '', (value or '').upper())
+
+
+def normalize_university(value):
+    """Case- and whitespace-insensitive form of a university name"""
+    return ' '.join((value or '').split()).upper()
+
 
 class PastQuestion(models.Model):
     """Past examination questions uploaded by contributors"""
@@ -24,6 +39,9 @@ class PastQuestion(models.Model):
     university = models.CharField(max_length=255)
     course_code = models.CharField(max_length=50)
     course_name = models.CharField(max_length=255)
+    # Normalized search keys, maintained in save()
+    university_normalized = models.CharField(max_length=255, editable=False, default='')
+    course_code_normalized = models.CharField(max_length=50, editable=False, default='')
     year = models.IntegerField(validators=[MinValueValidator(2000)])
     semester = models.CharField(max_length=20, choices=SEMESTER_CHOICES)
     category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, related_name='past_questions')
@@ -31,6 +49,28 @@ class PastQuestion(models.Model):
     # File upload
     file = models.FileField(upload_to='past_questions/')
     file_type = models.CharField(max_length=10, blank=True)  # pdf, jpg, png
+    # SHA-256 of the file; identical uploads share one stored file
+    content_hash = models.CharField(max_length=64, blank=True, default='', db_index=True, editable=False)
+    duplicate_of = models.ForeignKey(
+        'self',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='duplicates',
+        help_text="Earlier question with the same file, set on upload"
+    )
+    
+    # Filled in by the processing worker (questions/processing.py)
+    PROCESSING_CHOICES = [
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+    processing_status = models.CharField(max_length=20, choices=PROCESSING_CHOICES, default='pending')
+    page_count = models.PositiveIntegerField(null=True, blank=True)
+    extracted_text = models.TextField(blank=True, default='', editable=False)
+    preview_renditions = models.JSONField(default=dict, blank=True, editable=False)
     
     # Contributor info
     uploaded_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='uploaded_questions')
@@ -58,6 +98,28 @@ class PastQuestion(models.Model):
         ordering = ['-created_at']
         verbose_name = 'Past Question'
         verbose_name_plural = 'Past Questions'
+        indexes = [
+            # "approved CSC201 papers from UNILAG, 2015-2023"
+            models.Index(
+                fields=['status', 'university_normalized', 'course_code_normalized', '-year'],
+                name='pq_search_idx',
+            ),
+            # Same query without a university
+            models.Index(fields=['status', 'course_code_normalized', '-year'], name='pq_code_year_idx'),
+            # Department prefix ("CSC") searches: LIKE 'CSC%' can only use a
+            # PostgreSQL btree under a non-C collation with the pattern opclass
+            models.Index(
+                fields=['status', 'course_code_normalized'],
+                name='pq_code_prefix_idx',
+                opclasses=['varchar_pattern_ops', 'varchar_pattern_ops'],
+            ),
+            # Newest-first listing of approved questions
+            models.Index(fields=['status', '-created_at', '-id'], name='pq_status_created_idx'),
+            # Processing queue
+            models.Index(fields=['processing_status', 'id'], name='pq_processing_idx'),
+            # Admin changelist pages, newest first across every status
+            models.Index(fields=['-created_at', '-id'], name='pq_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.course_code} - {self.university} ({self.year})"
@@ -67,17 +129,56 @@ class PastQuestion(models.Model):
         if self.file:
             extension = self.file.name.split('.')[-1].lower()
             self.file_type = extension
+        self.university_normalized = normalize_university(self.university)
+        self.course_code_normalized = normalize_course_code(self.course_code)
+        update_fields = kwargs.get('update_fields')
+        # A replaced file has to be extracted again
+        self._file_replaced = not self._state.adding and self._file_changed(update_fields)
+        if self._file_replaced:
+            self.processing_status = 'pending'
+        if update_fields is not None:
+            update_fields = set(update_fields)
+            if 'university' in update_fields:
+                update_fields.add('university_normalized')
+            if 'course_code' in update_fields:
+                update_fields.add('course_code_normalized')
+            if 'file' in update_fields:
+                update_fields.add('file_type')
+            if self._file_replaced:
+                update_fields.add('processing_status')
+            kwargs['update_fields'] = update_fields
         super().save(*args, **kwargs)
+        if 'file' in self.__dict__:
+            self._loaded_file = self.file.name
+
+    def _file_changed(self, update_fields):
+        """Whether this save points the question at another file than the one loaded"""
+        if 'file' not in self.__dict__ or (update_fields is not None and 'file' not in update_fields):
+            return False
+        # Deferred when loaded and assigned since: assume it changed
+        return self._loaded_file is DEFERRED or self.file.name != self._loaded_file
     
     def increment_views(self):
-        """Increment view count"""
-        self.views_count += 1
-        self.save(update_fields=['views_count'])
+        """Increment view count (buffered, see questions/counters.py)"""
+        get_counter_buffer().incr(self.pk, 'views_count')
+    
+    async def aincrement_views(self):
+        """increment_views() for async views"""
+        await get_counter_buffer().aincr(self.pk, 'views_count')
     
     def increment_downloads(self):
-        """Increment download count"""
-        self.downloads_count += 1
-        self.save(update_fields=['downloads_count'])
+        """Increment download count (buffered, see questions/counters.py)"""
+        get_counter_buffer().incr(self.pk, 'downloads_count')
+    
+    @property
+    def live_views_count(self):
+        """Stored view count plus increments not yet flushed"""
+        return self.views_count + get_counter_buffer().pending(self.pk, 'views_count')
+    
+    @property
+    def live_downloads_count(self):
+        """Stored download count plus increments not yet flushed"""
+        return self.downloads_count + get_counter_buffer().pending(self.pk, 'downloads_count')
 
 
 class Contribution(models.Model):
@@ -98,6 +199,10 @@ class Contribution(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Admin changelist pages
+            models.Index(fields=['-created_at', '-id'], name='contribution_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.full_name} - {self.points_awarded} points"
@@ -116,6 +221,47 @@ class QuestionDownload(models.Model):
     class Meta:
         ordering = ['-downloaded_at']
         unique_together = ('user', 'past_question')
+        indexes = [
+            # Admin changelist pages
+            models.Index(fields=['-downloaded_at', '-id'], name='download_recent_idx'),
+        ]
     
     def __str__(self):
-        return f"{self.user.email} - {self.past_question.course_code}"
\ No newline at end of file
+        return f"{self.user.email} - {self.past_question.course_code}"
+
+
+class UploadSession(models.Model):
+    """A resumable, chunked file upload (see questions/uploads.py)"""
+    
+    STATUS_CHOICES = [
+        ('open', 'Open'),
+        ('assembling', 'Assembling'),
+        ('complete', 'Complete'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='upload_sessions')
+    filename = models.CharField(max_length=255)
+    size = models.BigIntegerField()
+    chunk_size = models.IntegerField()
+    sha256 = models.CharField(max_length=64, blank=True, help_text="Whole-file hash declared by the client")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='open')
+    past_question = models.ForeignKey(PastQuestion, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"{self.filename} ({self.status})"
+    
+    @property
+    def chunk_count(self):
+        return -(-self.size // self.chunk_size)
+    
+    def chunk_length(self, index):
+        """Expected byte length of chunk `index`"""
+        if index == self.chunk_count - 1:
+            return self.size - index * self.chunk_size
+        return self.chunk_size
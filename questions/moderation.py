@@ -0,0 +1,84 @@
+# questions/moderation.py
+
+from collections import defaultdict
+from dataclasses import dataclass
+
+from django.db import transaction
+
+from accounts.points import bulk_award
+from search.engine import reindex_objects
+from .models import Contribution, PastQuestion
+
+DEFAULT_CHUNK_SIZE = 1000
+
+
+@dataclass
+class ModerationResult:
+    processed: int = 0
+    points_awarded: int = 0
+    contributors: int = 0
+
+
+def _moderate(queryset, status, reviewer, notes, chunk_size, progress):
+    """
+    Move the pending questions in `queryset` to `status`, chunk by chunk.
+
+    Each chunk is its own transaction: lock up to `chunk_size` pending rows
+    (walking the primary key so no chunk is re-read), flip their status with
+    one UPDATE, award points per contributor in bulk and bulk_create the
+    Contribution rows. A failure only rolls back the current chunk, and rows
+    another moderator handles concurrently are skipped rather than paid twice.
+    """
+    # Re-select by pk so admin querysets with joins or DISTINCT can be locked
+    pending = PastQuestion.objects.filter(pk__in=queryset.values('pk'), status='pending').order_by('pk')
+    total = pending.count()
+    result = ModerationResult()
+    contributors = set()
+    last_pk = 0
+    while True:
+        with transaction.atomic():
+            chunk = list(
+                pending.filter(pk__gt=last_pk).select_for_update()
+                .values_list('pk', 'uploaded_by_id', 'points_earned')[:chunk_size]
+            )
+            if not chunk:
+                break
+            last_pk = chunk[-1][0]
+            ids = [pk for pk, _, _ in chunk]
+            PastQuestion.objects.filter(pk__in=ids).update(
+                status=status, reviewed_by=reviewer, review_notes=notes or None
+            )
+
+            awards = defaultdict(int)
+            if status == 'approved':
+                for _, user_id, points in chunk:
+                    awards[user_id] += points
+                bulk_award(awards, reason='contribution', note='Past question approved')
+            Contribution.objects.bulk_create([
+                Contribution(
+                    user_id=user_id,
+                    past_question_id=pk,
+                    points_awarded=points if status == 'approved' else 0,
+                    status=status,
+                )
+                for pk, user_id, points in chunk
+            ])
+            reindex_objects(PastQuestion, ids)
+
+        result.processed += len(chunk)
+        result.points_awarded += sum(awards.values())
+        contributors.update(user_id for _, user_id, _ in chunk)
+        if progress:
+            progress(result.processed, total)
+    result.contributors = len(contributors)
+    return result
+
+
+def approve_questions(queryset, reviewer=None, notes='', chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+    """Approve pending questions and pay their contributors"""
+    return _moderate(queryset, 'approved', reviewer, notes, chunk_size, progress)
+
+
+def reject_questions(queryset, reviewer=None, notes='', chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+    """Reject pending questions; contributors are recorded with 0 points"""
+    return _moderate(queryset, 'rejected', reviewer, notes, chunk_size, progress)
@@ -0,0 +1,218 @@
+# questions/processing.py
+
+import logging
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import connections
+from PIL import Image, ImageOps
+
+from search.engine import reindex_objects
+from stax_api import object_cache
+from stax_api.images import image_settings, renditions_from_image
+from .models import PastQuestion
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'WORKERS': os.cpu_count() or 2,
+    'BATCH_SIZE': 20,
+    'POLL_INTERVAL': 5,          # seconds the worker sleeps when the queue is empty
+    'MAX_TEXT_CHARS': 200_000,   # extracted text kept per question
+    'PREVIEW_SIZES': {'small': (240, 320), 'medium': (480, 640)},  # fitted, not cropped
+    'PREVIEW_DPI': 72,
+    # Also process new uploads on the web process's background threads, for
+    # development setups that do not run the process_questions worker
+    'INLINE': False,
+}
+
+PAGE_RE = re.compile(rb'/Type\s*/Page\b')
+WHITESPACE_RE = re.compile(r'\s+')
+
+
+def processing_settings():
+    return {**DEFAULTS, **getattr(settings, 'STAX_PROCESSING', {})}
+
+
+def _clean_text(parts, limit):
+    # Collapse layout whitespace; NUL bytes are rejected by Postgres text columns
+    text = WHITESPACE_RE.sub(' ', ' '.join(parts).replace('\x00', '')).strip()
+    return text[:limit]
+
+
+def _pdf_contents(name, config):
+    """(page count, text, first page as a PIL image or None) of a stored PDF"""
+    try:
+        import fitz
+    except ImportError:
+        fitz = None
+    if fitz is not None:
+        with default_storage.open(name, 'rb') as handle:
+            document = fitz.open(stream=handle.read(), filetype='pdf')
+        with document:
+            parts, length = [], 0
+            for page in document:
+                if length >= config['MAX_TEXT_CHARS']:
+                    break
+                parts.append(page.get_text())
+                length += len(parts[-1])
+            preview = None
+            if document.page_count:
+                pixmap = document[0].get_pixmap(dpi=config['PREVIEW_DPI'])
+                preview = Image.frombytes('RGB', (pixmap.width, pixmap.height), pixmap.samples)
+            return document.page_count, _clean_text(parts, config['MAX_TEXT_CHARS']), preview
+
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        PdfReader = None
+    if PdfReader is not None:
+        with default_storage.open(name, 'rb') as handle:
+            reader = PdfReader(handle)
+            parts, length = [], 0
+            for page in reader.pages:
+                if length >= config['MAX_TEXT_CHARS']:
+                    break
+                parts.append(page.extract_text() or '')
+                length += len(parts[-1])
+            return len(reader.pages), _clean_text(parts, config['MAX_TEXT_CHARS']), None
+
+    # No PDF library installed: count page objects, which is right for
+    # unencrypted files without compressed object streams
+    with default_storage.open(name, 'rb') as handle:
+        return len(PAGE_RE.findall(handle.read())) or None, '', None
+
+
+def _image_contents(name):
+    """(frame count, '', upright first frame) of a stored image"""
+    with default_storage.open(name, 'rb') as handle:
+        with Image.open(handle) as original:
+            if original.width * original.height > image_settings()['MAX_PIXELS']:
+                raise ValueError(f'{name} is {original.width}x{original.height}, above MAX_PIXELS')
+            pages = getattr(original, 'n_frames', 1)
+            image = ImageOps.exif_transpose(original)
+            image = image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+    return pages, '', image
+
+
+def extract(name):
+    """
+    Runs in a worker process: page count, text and preview renditions of one
+    stored file. Only touches storage, never the database.
+    """
+    config = processing_settings()
+    if name.lower().endswith('.pdf'):
+        pages, text, first_page = _pdf_contents(name, config)
+    else:
+        pages, text, first_page = _image_contents(name)
+    previews = {}
+    if first_page is not None:
+        previews = renditions_from_image(first_page, config['PREVIEW_SIZES'], name, crop=False)
+    return {'page_count': pages, 'extracted_text': text, 'preview_renditions': previews}
+
+
+def claim(batch_size):
+    """
+    Move up to `batch_size` pending questions to 'processing' and return
+    [(pk, file name)]. Each row is claimed with its own conditional update,
+    so concurrent workers never process the same question.
+    """
+    candidates = (
+        PastQuestion.objects.filter(processing_status='pending')
+        .order_by('pk').values_list('pk', 'file')[:batch_size * 2]
+    )
+    claimed = []
+    for pk, name in candidates:
+        if PastQuestion.objects.filter(pk=pk, processing_status='pending').update(processing_status='processing'):
+            claimed.append((pk, name))
+            if len(claimed) == batch_size:
+                break
+    return claimed
+
+
+def _finish(pk, name, fields):
+    # Only if the file was not replaced while it was being processed;
+    # update() skips post_save, so the search index is refreshed here
+    updated = PastQuestion.objects.filter(pk=pk, file=name).update(**fields)
+    if updated:
+        object_cache.invalidate('questions.pastquestion', pk)
+        if 'extracted_text' in fields:
+            reindex_objects(PastQuestion, [pk])
+
+
+def process_question(pk):
+    """Background task for INLINE mode: claim and extract one question in this process"""
+    name = PastQuestion.objects.filter(pk=pk).values_list('file', flat=True).first()
+    if not name or not PastQuestion.objects.filter(pk=pk, processing_status='pending').update(
+        processing_status='processing'
+    ):
+        return
+    try:
+        fields = {'processing_status': 'done', **extract(name)}
+    except Exception as e:
+        logger.warning('Could not process past question %s (%s): %s', pk, name, e)
+        fields = {'processing_status': 'failed'}
+    _finish(pk, name, fields)
+
+
+class WorkerCrashed(BrokenProcessPool):
+    """A worker process died during a batch; `requeued` questions went back to the queue"""
+
+    def __init__(self, requeued):
+        super().__init__('A worker process died while extracting')
+        self.requeued = requeued
+
+
+def process_batch(pool, batch_size):
+    """
+    Claim a batch and extract it on `pool`; returns how many were claimed.
+
+    If a worker process died (e.g. a file crashed the PDF library) every
+    unfinished extraction fails with it, so those questions are sent back to
+    the queue and WorkerCrashed is raised: the caller retries them one at a
+    time on a new pool. A question that crashes a batch of one is failed.
+    """
+    claimed = claim(batch_size)
+    futures = [(pk, name, pool.submit(extract, name)) for pk, name in claimed if name]
+    for pk, name in claimed:
+        if not name:
+            _finish(pk, name, {'processing_status': 'failed'})
+    crashed = []
+    for pk, name, future in futures:
+        try:
+            fields = {'processing_status': 'done', **future.result()}
+        except BrokenProcessPool:
+            crashed.append(pk)
+            continue
+        except Exception as e:
+            logger.warning('Could not process past question %s (%s): %s', pk, name, e)
+            fields = {'processing_status': 'failed'}
+        _finish(pk, name, fields)
+    if not crashed:
+        return len(claimed)
+    if len(futures) == 1:
+        pk, name, _ = futures[0]
+        logger.warning('Past question %s (%s) crashed a worker process', pk, name)
+        _finish(pk, name, {'processing_status': 'failed'})
+        raise WorkerCrashed(0)
+    raise WorkerCrashed(requeue_claimed(crashed))
+
+
+def process_pool(workers=None):
+    """Worker processes for extract(); open connections are closed before forking"""
+    connections.close_all()
+    return ProcessPoolExecutor(workers or processing_settings()['WORKERS'])
+
+
+def requeue_claimed(pks):
+    """Send claimed questions back to the queue without extracting them"""
+    return PastQuestion.objects.filter(pk__in=pks, processing_status='processing').update(processing_status='pending')
+
+
+def requeue(statuses=('processing',)):
+    """Send questions back to the queue, e.g. after a worker was killed mid-batch"""
+    return PastQuestion.objects.filter(processing_status__in=statuses).update(processing_status='pending')
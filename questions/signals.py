@@ -0,0 +1,30 @@
+# questions/signals.py
+
+from django.db import transaction
+from django.db.models import DEFERRED
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from stax_api import object_cache
+from stax_api.tasks import submit
+from .models import PastQuestion
+
+
+@receiver([post_save, post_delete], sender=PastQuestion)
+def invalidate_question(sender, instance, **kwargs):
+    object_cache.invalidate('questions.pastquestion', instance.pk)
+
+
+@receiver(post_init, sender=PastQuestion)
+def remember_loaded_file(sender, instance, **kwargs):
+    """Keep the file name as loaded so save() can tell the file was replaced"""
+    value = instance.__dict__.get('file', DEFERRED)
+    instance._loaded_file = getattr(value, 'name', value)
+
+
+@receiver(post_save, sender=PastQuestion)
+def queue_processing(sender, instance, created, **kwargs):
+    from .processing import process_question, processing_settings
+
+    if (created or instance._file_replaced) and instance.file and processing_settings()['INLINE']:
+        transaction.on_commit(lambda: submit(process_question, instance.pk))
@@ -1,3 +1,566 @@
-from django.test import TestCase
+import asyncio
+import hashlib
+import io
+import os
+import tempfile
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.contrib.admin.sites import site
+from django.core.cache import caches
+from django.core.management import CommandError, call_command
+from django.db.models import F
+from django.test import RequestFactory, TestCase, override_settings
+
+from accounts.models import User
+from accounts.tokens import ClaimsRefreshToken
+from stax_api.pagination import encode_cursor
+
+from search.engine import search
+
+from . import downloads, moderation, processing, uploads, views
+from .counters import CacheCounterBuffer, MemoryCounterBuffer
+from .models import Contribution, PastQuestion, UploadSession
+from .uploads import UploadError, complete_session, start_session, store_chunk
+
+
+class CounterBufferTests(TestCase):
+    """Buffered view/download counters must reach the database exactly once"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='ada@example.com', username='ada', full_name='Ada', password='x-Secret-123'
+        )
+        self.question = PastQuestion.objects.create(
+            title='Algorithms', university='Unilag', course_code='CSC 201', course_name='Algorithms',
+            year=2020, semester='first', file='past_questions/csc201.pdf', uploaded_by=self.user,
+        )
+        caches['default'].clear()
+        self.addCleanup(caches['default'].clear)
+
+    def _views(self):
+        self.question.refresh_from_db(fields=['views_count'])
+        return self.question.views_count
+
+    def _buffers(self):
+        # A long interval: flushes only happen when the test asks for them
+        return [MemoryCounterBuffer(3600, 10**9), CacheCounterBuffer('default', 3600, 10**9)]
+
+    def test_failed_write_keeps_increments(self):
+        for buffer in self._buffers():
+            with self.subTest(buffer=type(buffer).__name__):
+                start = self._views()
+                buffer.incr(self.question.pk, 'views_count', 3)
+                with mock.patch.object(buffer, 'write', side_effect=RuntimeError('database is down')):
+                    with self.assertRaises(RuntimeError):
+                        buffer.flush()
+                self.assertEqual(buffer.pending(self.question.pk, 'views_count'), 3)
+                buffer.flush()
+                self.assertEqual(self._views(), start + 3)
+                self.assertEqual(buffer.pending(self.question.pk, 'views_count'), 0)
+
+    def test_cache_workers_do_not_drain_the_same_increments(self):
+        first = CacheCounterBuffer('default', 3600, 10**9)
+        second = CacheCounterBuffer('default', 3600, 10**9)
+        first.incr(self.question.pk, 'views_count', 4)
+        second.incr(self.question.pk, 'views_count', 1)
+        key = first._cache_key((self.question.pk, 'views_count'))
+        cache_get = first.cache.get
+        interleaved = []
+
+        def get(cache_key, *args, **kwargs):
+            value = cache_get(cache_key, *args, **kwargs)
+            if cache_key == key and not interleaved:
+                # The other worker flushes between this read and the decrement
+                interleaved.append(True)
+                second.flush()
+            return value
+
+        with mock.patch.object(first.cache, 'get', side_effect=get):
+            first.flush()
+        second.flush()
+        self.assertEqual(self._views(), 5)
+        self.assertEqual(cache_get(key), 0)
+
+    def test_cache_claim_never_goes_negative(self):
+        buffer = CacheCounterBuffer('default', 3600, 10**9)
+        buffer.incr(self.question.pk, 'views_count', 2)
+        key = buffer._cache_key((self.question.pk, 'views_count'))
+        cache_get = buffer.cache.get
+        # Another drainer took 1 after the read: only what is left is claimed
+        with mock.patch.object(buffer.cache, 'get', side_effect=lambda *args, **kwargs: 2):
+            buffer.cache.decr(key, 1)
+            self.assertEqual(buffer._claim(key), 1)
+        self.assertEqual(cache_get(key), 0)
+
+    def test_increments_of_a_worker_that_exited_are_swept(self):
+        dead = CacheCounterBuffer('default', 3600, 10**9)
+        dead.incr(self.question.pk, 'views_count', 3)
+        dead.incr(self.question.pk, 'downloads_count', 2)
+        # A fresh worker knows nothing of those keys
+        CacheCounterBuffer('default', 3600, 10**9).flush()
+        self.question.refresh_from_db(fields=['views_count', 'downloads_count'])
+        self.assertEqual((self.question.views_count, self.question.downloads_count), (3, 2))
+        self.assertEqual(dead.pending(self.question.pk, 'views_count'), 0)
+
+    def test_sweep_only_runs_every_interval(self):
+        CacheCounterBuffer('default', 3600, 10**9).incr(self.question.pk, 'views_count', 3)
+        buffer = CacheCounterBuffer('default', 3600, 10**9, sweep_interval=3600)
+        buffer._next_sweep = float('inf')
+        buffer.flush()
+        self.assertEqual(self._views(), 0)
+        buffer.sweep()
+        self.assertEqual(self._views(), 3)
+
+    async def test_async_cache_increments_leave_the_event_loop(self):
+        buffer = CacheCounterBuffer('default', 3600, 10**9)
+        question = await PastQuestion.objects.aget(pk=self.question.pk)
+        incr = buffer.incr
+        loops = []
+
+        def incr_outside_loop(*args, **kwargs):
+            try:
+                loops.append(asyncio.get_running_loop())
+            except RuntimeError:
+                loops.append(None)
+            return incr(*args, **kwargs)
+
+        with mock.patch('questions.models.get_counter_buffer', return_value=buffer), \
+                mock.patch.object(buffer, 'incr', side_effect=incr_outside_loop):
+            await question.aincrement_views()
+        self.assertEqual(loops, [None])
+        self.assertEqual(await sync_to_async(buffer.pending)(self.question.pk, 'views_count'), 1)
+
+
+class QuestionEditTests(TestCase):
+    """Edits save only the columns they change"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='ada@example.com', username='ada', full_name='Ada', password='x-Secret-123'
+        )
+        self.question = PastQuestion.objects.create(
+            title='Algorithms', university='Unilag', course_code='CSC 201', course_name='Algorithms',
+            year=2020, semester='first', file='past_questions/csc201.pdf', uploaded_by=self.user,
+        )
+
+    def _bump_counters(self):
+        PastQuestion.objects.filter(pk=self.question.pk).update(
+            views_count=F('views_count') + 7, downloads_count=F('downloads_count') + 2,
+            processing_status='done', extracted_text='Question 1',
+        )
+
+    def _assert_counters_kept(self):
+        question = PastQuestion.objects.get(pk=self.question.pk)
+        self.assertEqual(
+            (question.views_count, question.downloads_count, question.processing_status, question.extracted_text),
+            (7, 2, 'done', 'Question 1'),
+        )
+        return question
+
+    def test_put_keeps_counters_changed_since_the_read(self):
+        apply_fields = views._apply_fields
+
+        def apply_after_counters_change(question, *args, **kwargs):
+            # The row was read; counters are flushed before the edit is saved
+            self._bump_counters()
+            return apply_fields(question, *args, **kwargs)
+
+        access = ClaimsRefreshToken.for_user(self.user).access_token
+        with mock.patch.object(views, '_apply_fields', side_effect=apply_after_counters_change):
+            response = self.client.put(
+                f'/api/questions/{self.question.pk}/', {'course_code': 'csc 202'},
+                content_type='application/json', HTTP_AUTHORIZATION=f'Bearer {access}',
+            )
+        self.assertEqual(response.status_code, 200)
+        question = self._assert_counters_kept()
+        self.assertEqual((question.course_code, question.course_code_normalized), ('csc 202', 'CSC202'))
+
+    def test_admin_saves_only_changed_fields(self):
+        request = RequestFactory().post('/')
+        request.user = self.user
+        question = PastQuestion.objects.get(pk=self.question.pk)
+        self._bump_counters()
+        question.title = 'Algorithms I'
+        site._registry[PastQuestion].save_model(request, question, mock.Mock(changed_data=['title']), change=True)
+        self.assertEqual(self._assert_counters_kept().title, 'Algorithms I')
+
+
+class QuestionSearchTests(TestCase):
+    """Search pages must not skip or repeat papers whose counters change"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='ada@example.com', username='ada', full_name='Ada', password='x-Secret-123'
+        )
+        self.questions = [
+            PastQuestion.objects.create(
+                title=f'Algorithms {n}', university='Unilag', course_code='CSC 201', course_name='Algorithms',
+                year=2020, semester='first', file='past_questions/csc201.pdf', uploaded_by=self.user,
+                status='approved',
+            )
+            for n in range(5)
+        ]
+
+    def test_cursor_is_stable_while_downloads_change(self):
+        response = self.client.get('/api/questions/search/', {'page_size': 2, 'facets': 'false'})
+        self.assertEqual(response.status_code, 200)
+        seen = [row['id'] for row in response.json()['results']]
+        # A paper on a later page becomes the most downloaded
+        PastQuestion.objects.filter(pk=self.questions[0].pk).update(downloads_count=100)
+        next_url = response.json()['next']
+        while next_url:
+            response = self.client.get(next_url)
+            self.assertEqual(response.status_code, 200)
+            seen += [row['id'] for row in response.json()['results']]
+            next_url = response.json()['next']
+        self.assertEqual(sorted(seen), sorted(question.pk for question in self.questions))
+
+    def test_cursor_from_an_older_ordering_is_rejected(self):
+        response = self.client.get('/api/questions/search/', {'cursor': encode_cursor([2020, 0, 4])})
+        self.assertEqual(response.status_code, 400)
+
+
+class UploadCompletionTests(TestCase):
+    """A chunked upload becomes exactly one question"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings = override_settings(
+            STAX_UPLOADS={'DIRECTORY': f'{directory.name}/chunks', 'CHUNK_SIZE': 4}, MEDIA_ROOT=f'{directory.name}/media',
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.user = User.objects.create_user(
+            email='ada@example.com', username='ada', full_name='Ada', password='x-Secret-123'
+        )
+        content = b'%PDF-1.4 past question'
+        self.session = start_session(self.user, 'csc201.pdf', len(content))
+        for index in range(self.session.chunk_count):
+            chunk = content[index * 4:(index + 1) * 4]
+            store_chunk(self.session, index, io.BytesIO(chunk), hashlib.sha256(chunk).hexdigest())
+
+    def _question(self):
+        return PastQuestion(
+            title='Algorithms', university='Unilag', course_code='CSC 201', course_name='Algorithms',
+            year=2020, semester='first', uploaded_by=self.user,
+        )
+
+    def test_concurrent_completion_creates_one_question(self):
+        # Both requests loaded the session while it was still open
+        other = UploadSession.objects.get(pk=self.session.pk)
+        attach_content = uploads.attach_content
+        rejected = []
+
+        def attach_while_other_completes(*args, **kwargs):
+            try:
+                complete_session(other, self._question())
+            except UploadError as e:
+                rejected.append(e.status)
+            return attach_content(*args, **kwargs)
+
+        with mock.patch.object(uploads, 'attach_content', side_effect=attach_while_other_completes):
+            question = complete_session(self.session, self._question())
+        self.assertEqual(rejected, [409])
+        self.assertEqual(list(PastQuestion.objects.values_list('pk', flat=True)), [question.pk])
+        self.session.refresh_from_db()
+        self.assertEqual((self.session.status, self.session.past_question_id), ('complete', question.pk))
+
+    def test_failed_assembly_reopens_the_session(self):
+        with mock.patch.object(uploads, 'attach_content', side_effect=OSError('disk full')):
+            with self.assertRaises(OSError):
+                complete_session(self.session, self._question())
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.status, 'open')
+        complete_session(self.session, self._question())
+        self.assertEqual(PastQuestion.objects.count(), 1)
+
+
+class ProcessingTests(TestCase):
+    """A crashed worker only fails the file that crashed it"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='ada@example.com', username='ada', full_name='Ada', password='x-Secret-123'
+        )
+        self.questions = [
+            PastQuestion.objects.create(
+                title='Algorithms', university='Unilag', course_code='CSC 201', course_name='Algorithms',
+                year=2020, semester='first', file=f'past_questions/csc20{n}.pdf', uploaded_by=self.user,
+            )
+            for n in range(3)
+        ]
+
+    def _pool(self, crashing):
+        def submit(extract, name):
+            future = Future()
+            if name in crashing:
+                future.set_exception(BrokenProcessPool('A worker died'))
+            else:
+                future.set_result({'page_count': 2, 'extracted_text': 'Question 1', 'preview_renditions': {}})
+            return future
+
+        return mock.Mock(submit=mock.Mock(side_effect=submit))
+
+    def _statuses(self):
+        return list(PastQuestion.objects.order_by('pk').values_list('processing_status', flat=True))
+
+    def test_crash_requeues_the_rest_of_the_batch(self):
+        crashing = {'past_questions/csc201.pdf', 'past_questions/csc202.pdf'}
+        with self.assertRaises(processing.WorkerCrashed) as raised:
+            processing.process_batch(self._pool(crashing), 20)
+        self.assertEqual(raised.exception.requeued, 2)
+        self.assertEqual(self._statuses(), ['done', 'pending', 'pending'])
+        # Retried one at a time, only the file that crashes is failed
+        with self.assertRaises(processing.WorkerCrashed):
+            processing.process_batch(self._pool({'past_questions/csc201.pdf'}), 1)
+        self.assertEqual(processing.process_batch(self._pool(set()), 1), 1)
+        self.assertEqual(self._statuses(), ['done', 'failed', 'done'])
+
+    def test_command_retries_requeued_questions_one_by_one(self):
+        results = [processing.WorkerCrashed(2), processing.WorkerCrashed(0), 1, 0]
+        with mock.patch.object(processing, 'process_pool'), \
+                mock.patch.object(processing, 'process_batch', side_effect=results) as process_batch:
+            call_command('process_questions', '--once', '--batch-size', '20', stdout=io.StringIO(), stderr=io.StringIO())
+        self.assertEqual([call.args[1] for call in process_batch.call_args_list], [20, 1, 1, 20])
+
+    def test_replacing_the_file_requeues_the_question(self):
+        PastQuestion.objects.update(processing_status='done')
+        question = PastQuestion.objects.get(pk=self.questions[0].pk)
+        question.title = 'Algorithms I'
+        question.save()
+        self.assertEqual(self._statuses()[0], 'done')
+        question.file = 'past_questions/csc201-v2.pdf'
+        question.save(update_fields=['file'])
+        self.assertEqual(self._statuses()[0], 'pending')
+
+        # Through the admin, and while a worker still holds the old file
+        PastQuestion.objects.filter(pk=self.questions[1].pk).update(processing_status='processing')
+        question = PastQuestion.objects.get(pk=self.questions[1].pk)
+        question.file = 'past_questions/csc201-v2.pdf'
+        request = RequestFactory().post('/')
+        request.user = self.user
+        site._registry[PastQuestion].save_model(request, question, mock.Mock(changed_data=['file']), change=True)
+        processing._finish(question.pk, 'past_questions/csc201.pdf', {'processing_status': 'done'})
+        self.assertEqual(self._statuses()[1], 'pending')
+
+
+class ModerationTests(TestCase):
+    """Approving and rejecting in chunks pays every contributor exactly once"""
+
+    def setUp(self):
+        self.ada, self.obi = [
+            User.objects.create_user(
+                email=f'{name}@example.com', username=name, full_name=name.title(), password='x-Secret-123'
+            )
+            for name in ('ada', 'obi')
+        ]
+        self.staff = User.objects.create_user(
+            email='staff@example.com', username='staff', full_name='Staff', password='x-Secret-123', is_staff=True
+        )
+        self.questions = [
+            PastQuestion.objects.create(
+                title='Algorithms', university=university, course_code='CSC 201', course_name='Algorithms',
+                year=2020, semester='first', file='past_questions/csc201.pdf', uploaded_by=user,
+                points_earned=points,
+            )
+            for user, university, points in (
+                (self.ada, 'Unilag', 10), (self.ada, 'Unilag', 5), (self.obi, 'Unilag', 10),
+                (self.obi, 'UI', 10), (self.ada, 'UI', 10),
+            )
+        ]
+        PastQuestion.objects.filter(pk=self.questions[4].pk).update(status='approved')
+
+    def _points(self):
+        users = User.objects.filter(pk__in=[self.ada.pk, self.obi.pk]).order_by('pk')
+        return list(users.values_list('points', flat=True))
+
+    def _statuses(self):
+        return list(PastQuestion.objects.order_by('pk').values_list('status', flat=True))
+
+    def test_approve_in_chunks(self):
+        progress = []
+        result = moderation.approve_questions(
+            PastQuestion.objects.all(), reviewer=self.staff, notes='Clear scan', chunk_size=2,
+            progress=lambda done, total: progress.append((done, total)),
+        )
+        self.assertEqual((result.processed, result.points_awarded, result.contributors), (4, 35, 2))
+        self.assertEqual(progress, [(2, 4), (4, 4)])
+        self.assertEqual(self._points(), [15, 20])
+        self.assertEqual(self._statuses(), ['approved'] * 5)
+        self.assertEqual(
+            set(PastQuestion.objects.values_list('reviewed_by', 'review_notes').exclude(pk=self.questions[4].pk)),
+            {(self.staff.pk, 'Clear scan')},
+        )
+        self.assertEqual(Contribution.objects.filter(status='approved').count(), 4)
+        # update() skipped the index; moderation re-syncs what it approves
+        self.assertEqual(sorted(pk for pk, _ in search(PastQuestion, 'algorithms')), [q.pk for q in self.questions[:4]])
+        # Nothing is left to pay twice
+        self.assertEqual(moderation.approve_questions(PastQuestion.objects.all()).processed, 0)
+        self.assertEqual(self._points(), [15, 20])
+
+    def test_reject_pays_nothing(self):
+        result = moderation.reject_questions(PastQuestion.objects.filter(university='Unilag'))
+        self.assertEqual((result.processed, result.points_awarded, result.contributors), (3, 0, 2))
+        self.assertEqual(self._points(), [0, 0])
+        self.assertEqual(self._statuses(), ['rejected', 'rejected', 'rejected', 'pending', 'approved'])
+        self.assertEqual(set(Contribution.objects.values_list('status', 'points_awarded')), {('rejected', 0)})
+
+    def test_failed_chunk_rolls_back_alone(self):
+        bulk_award = moderation.bulk_award
+        calls = []
+
+        def fail_second_chunk(*args, **kwargs):
+            calls.append(True)
+            if len(calls) == 2:
+                raise RuntimeError('database is down')
+            return bulk_award(*args, **kwargs)
+
+        with mock.patch.object(moderation, 'bulk_award', side_effect=fail_second_chunk):
+            with self.assertRaises(RuntimeError):
+                moderation.approve_questions(PastQuestion.objects.all(), chunk_size=2)
+        self.assertEqual(self._statuses(), ['approved', 'approved', 'pending', 'pending', 'approved'])
+        self.assertEqual(self._points(), [15, 0])
+        self.assertEqual(Contribution.objects.count(), 2)
+
+    def test_command(self):
+        out = io.StringIO()
+        call_command('moderate_questions', 'approve', '--university', 'unilag', '--dry-run', stdout=out)
+        self.assertEqual(out.getvalue(), '3 pending questions match\n')
+        self.assertEqual(self._statuses()[:3], ['pending'] * 3)
+
+        out = io.StringIO()
+        call_command(
+            'moderate_questions', 'approve', '--uploaded-by', 'OBI@example.com', '--reviewer', 'staff@example.com',
+            '--chunk-size', '1', stdout=out,
+        )
+        self.assertIn('2 questions approved, 20 points awarded to 1 contributors', out.getvalue())
+        self.assertEqual(self._points(), [0, 20])
+        with self.assertRaisesMessage(CommandError, 'No staff user with email ada@example.com'):
+            call_command('moderate_questions', 'reject', '--reviewer', 'ada@example.com', stdout=io.StringIO())
+
+    def test_admin_actions(self):
+        question_admin = site._registry[PastQuestion]
+        request = RequestFactory().post('/')
+        request.user = self.staff
+        with mock.patch.object(question_admin, 'message_user') as message_user:
+            question_admin.approve_questions(request, PastQuestion.objects.filter(pk=self.questions[0].pk))
+            question_admin.reject_questions(request, PastQuestion.objects.filter(pk__in=[q.pk for q in self.questions]))
+        self.assertEqual([call.args[1] for call in message_user.call_args_list], [
+            '1 questions approved, 10 points awarded to 1 contributors', '3 questions rejected',
+        ])
+        self.assertEqual(self._statuses(), ['approved', 'rejected', 'rejected', 'rejected', 'approved'])
+
+
+class DownloadTests(TestCase):
+    """Downloads resume with Range requests and revalidate with 304s"""
+
+    content = b'%PDF-1.4 past question'
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings = override_settings(MEDIA_ROOT=directory.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        os.makedirs(f'{directory.name}/past_questions')
+        with open(f'{directory.name}/past_questions/csc201.pdf', 'wb') as handle:
+            handle.write(self.content)
+        self.user = User.objects.create_user(
+            email='ada@example.com', username='ada', full_name='Ada', password='x-Secret-123'
+        )
+        self.question = PastQuestion.objects.create(
+            title='Algorithms', university='Unilag', course_code='CSC 201', course_name='Algorithms',
+            year=2020, semester='first', file='past_questions/csc201.pdf', uploaded_by=self.user,
+            status='approved',
+        )
+        self.url = f'/api/questions/{self.question.pk}/download/'
+        self.auth = f'Bearer {ClaimsRefreshToken.for_user(self.user).access_token}'
+        submit = mock.patch.object(views, 'submit')
+        self.submit = submit.start()
+        self.addCleanup(submit.stop)
+
+    def _get(self, method='get', **headers):
+        return getattr(self.client, method)(self.url, HTTP_AUTHORIZATION=self.auth, **headers)
+
+    def _recorded(self):
+        return [call.args for call in self.submit.call_args_list]
+
+    def test_full_download(self):
+        response = self._get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="csc201.pdf"')
+        self.assertTrue(response['ETag'] and response['Last-Modified'])
+        self.assertEqual(self._recorded(), [(downloads.record_download, self.question.pk, self.user.pk)])
+
+    def test_ranges(self):
+        size = len(self.content)
+        for header, status, body, content_range in (
+            ('bytes=0-3', 206, self.content[:4], f'bytes 0-3/{size}'),
+            ('bytes=9-', 206, self.content[9:], f'bytes 9-{size - 1}/{size}'),
+            ('bytes=-8', 206, self.content[-8:], f'bytes {size - 8}-{size - 1}/{size}'),
+            ('bytes=20-1000', 206, self.content[20:], f'bytes 20-{size - 1}/{size}'),
+            ('bytes=0-1,4-5', 200, self.content, None),
+        ):
+            with self.subTest(range=header):
+                response = self._get(HTTP_RANGE=header)
+                self.assertEqual(response.status_code, status)
+                self.assertEqual(b''.join(response.streaming_content), body)
+                self.assertEqual(response.get('Content-Range'), content_range)
+        # Only responses starting at the first byte count as a download
+        self.assertEqual(len(self._recorded()), 2)
+
+    def test_unsatisfiable_range(self):
+        for header in (f'bytes={len(self.content)}-', 'bytes=5-2', 'bytes=-0'):
+            with self.subTest(range=header):
+                response = self._get(HTTP_RANGE=header)
+                self.assertEqual(response.status_code, 416)
+                self.assertEqual(response['Content-Range'], f'bytes */{len(self.content)}')
+        self.assertEqual(self._recorded(), [])
+
+    def test_if_range(self):
+        etag, last_modified = self._get()['ETag'], self._get()['Last-Modified']
+        for if_range in (etag, last_modified):
+            with self.subTest(if_range=if_range):
+                self.assertEqual(self._get(HTTP_RANGE='bytes=4-', HTTP_IF_RANGE=if_range).status_code, 206)
+        # The file changed since the client's partial copy: send all of it
+        for if_range in ('"stale"', 'Sat, 01 Jan 2000 00:00:00 GMT'):
+            with self.subTest(if_range=if_range):
+                self.assertEqual(self._get(HTTP_RANGE='bytes=4-', HTTP_IF_RANGE=if_range).status_code, 200)
+
+    def test_conditional_requests(self):
+        first = self._get()
+        self.assertEqual(self._get(HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+        self.assertEqual(self._get(HTTP_IF_MODIFIED_SINCE=first['Last-Modified']).status_code, 304)
+        self.assertEqual(self._get(HTTP_IF_NONE_MATCH='"stale"').status_code, 200)
+        self.assertEqual(self._get('head').status_code, 200)
+        # Only the two full GETs were recorded
+        self.assertEqual(len(self._recorded()), 2)
+
+    @override_settings(STAX_DOWNLOADS={'SENDFILE_BACKEND': 'nginx'})
+    def test_sendfile(self):
+        response = self._get()
+        self.assertEqual(response['X-Accel-Redirect'], '/protected/past_questions/csc201.pdf')
+        self.assertEqual(response.content, b'')
+
+    def test_access(self):
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+        other = User.objects.create_user(
+            email='obi@example.com', username='obi', full_name='Obi', password='x-Secret-123'
+        )
+        PastQuestion.objects.filter(pk=self.question.pk).update(status='pending')
+        self.auth = f'Bearer {ClaimsRefreshToken.for_user(other).access_token}'
+        self.assertEqual(self._get().status_code, 404)
+        PastQuestion.objects.filter(pk=self.question.pk).update(status='approved', file='past_questions/gone.pdf')
+        self.assertEqual(self._get().status_code, 404)
+        self.assertEqual(self._recorded(), [])
+
+    def test_record_download(self):
+        downloads.record_download(self.question.pk, self.user.pk)
+        downloads.record_download(self.question.pk, self.user.pk)
+        self.assertEqual(self.question.download_records.count(), 1)
@@ -0,0 +1,199 @@
+# questions/uploads.py
+
+import hashlib
+import os
+import re
+import shutil
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.utils import timezone
+
+from .models import PastQuestion, UploadSession
+
+DEFAULTS = {
+    # Chunks are kept outside MEDIA_ROOT until the upload is complete
+    'DIRECTORY': '/var/tmp/stax_uploads',
+    'CHUNK_SIZE': 5 * 1024 * 1024,
+    'EXPIRY': timedelta(hours=24),
+    'BUFFER_SIZE': 1024 * 1024,
+}
+
+SHA256_RE = re.compile(r'^[0-9a-f]{64}$')
+
+
+class UploadError(Exception):
+    """A chunk or completion request that cannot be accepted"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def upload_settings():
+    return {**DEFAULTS, **getattr(settings, 'STAX_UPLOADS', {})}
+
+
+def session_directory(session):
+    return os.path.join(upload_settings()['DIRECTORY'], session.pk.hex)
+
+
+def _chunk_path(session, index):
+    return os.path.join(session_directory(session), f'{index:06d}.part')
+
+
+def hash_file(file):
+    """SHA-256 of a Django File/UploadedFile, read in chunks"""
+    digest = hashlib.sha256()
+    for chunk in file.chunks():
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+def find_original(content_hash, approved_only=False):
+    """Earliest non-rejected question stored with this content, if any"""
+    queryset = PastQuestion.objects.filter(content_hash=content_hash, duplicate_of__isnull=True)
+    queryset = queryset.filter(status='approved') if approved_only else queryset.exclude(status='rejected')
+    return queryset.order_by('pk').only('pk', 'file').first()
+
+
+def attach_content(question, content_hash, file=None, filename=None):
+    """
+    Point a new question at its file: an identical earlier upload's stored
+    file when there is one (flagging the question as its duplicate),
+    otherwise `file` saved under `filename`
+    """
+    question.content_hash = content_hash
+    original = find_original(content_hash)
+    if original is not None:
+        question.file.name = original.file.name
+        question.duplicate_of_id = original.pk
+    else:
+        question.file.save(filename, file, save=False)
+
+
+def start_session(user, filename, size, sha256=''):
+    config = upload_settings()
+    session = UploadSession.objects.create(
+        user=user,
+        filename=os.path.basename(filename),
+        size=size,
+        chunk_size=config['CHUNK_SIZE'],
+        sha256=sha256,
+        expires_at=timezone.now() + config['EXPIRY'],
+    )
+    os.makedirs(session_directory(session), mode=0o700, exist_ok=True)
+    return session
+
+
+def received_chunks(session):
+    """Indices of the chunks stored so far"""
+    try:
+        names = os.listdir(session_directory(session))
+    except FileNotFoundError:
+        return []
+    return sorted(int(name[:-5]) for name in names if name.endswith('.part'))
+
+
+def store_chunk(session, index, stream, checksum):
+    """
+    Stream one chunk to disk, checking its length and SHA-256.
+
+    The chunk is written to a temporary name and renamed into place, so a
+    dropped connection never leaves a partial chunk behind and resending a
+    chunk simply replaces it.
+    """
+    if not 0 <= index < session.chunk_count:
+        raise UploadError(f'Chunk index must be between 0 and {session.chunk_count - 1}')
+    if not SHA256_RE.match(checksum or ''):
+        raise UploadError('X-Chunk-SHA256 header with the hex SHA-256 of the chunk is required')
+    expected = session.chunk_length(index)
+    path = _chunk_path(session, index)
+    tmp = f'{path}.{uuid.uuid4().hex}.tmp'
+    digest = hashlib.sha256()
+    length = 0
+    try:
+        with open(tmp, 'wb') as handle:
+            while True:
+                data = stream.read(min(upload_settings()['BUFFER_SIZE'], expected + 1 - length))
+                if not data:
+                    break
+                length += len(data)
+                if length > expected:
+                    raise UploadError(f'Chunk {index} must be {expected} bytes')
+                digest.update(data)
+                handle.write(data)
+        if length != expected:
+            raise UploadError(f'Chunk {index} must be {expected} bytes, got {length}')
+        if digest.hexdigest() != checksum:
+            raise UploadError(f'Checksum mismatch for chunk {index}', status=422)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+class _AssembledFile(File):
+    """Lets FileSystemStorage move the assembled file instead of copying it"""
+
+    def temporary_file_path(self):
+        return self.file.name
+
+
+def complete_session(session, question):
+    """
+    Join the chunks, hash the result and attach it to the unsaved
+    `question`, then save it. Raises UploadError if chunks are missing, the
+    file does not match the hash declared at the start, or another request
+    is already completing the session.
+    """
+    missing = sorted(set(range(session.chunk_count)) - set(received_chunks(session)))
+    if missing:
+        raise UploadError(f'Missing chunks: {missing[:20]}', status=409)
+
+    # Claim the session first: of two concurrent completions, only the one
+    # whose UPDATE matched assembles the file and creates the question
+    if not UploadSession.objects.filter(pk=session.pk, status='open').update(status='assembling'):
+        raise UploadError('Upload already completed', status=409)
+    session.status = 'assembling'
+    try:
+        question = _assemble(session, question)
+    except Exception:
+        # Let the client retry (a rejected hash has deleted the session)
+        UploadSession.objects.filter(pk=session.pk, status='assembling').update(status='open')
+        session.status = 'open'
+        raise
+    shutil.rmtree(session_directory(session), ignore_errors=True)
+    session.status = 'complete'
+    session.past_question = question
+    session.save(update_fields=['status', 'past_question'])
+    return question
+
+
+def _assemble(session, question):
+    config = upload_settings()
+    assembled = os.path.join(session_directory(session), 'assembled')
+    digest = hashlib.sha256()
+    with open(assembled, 'wb') as out:
+        for index in range(session.chunk_count):
+            with open(_chunk_path(session, index), 'rb') as part:
+                while data := part.read(config['BUFFER_SIZE']):
+                    digest.update(data)
+                    out.write(data)
+    content_hash = digest.hexdigest()
+    if session.sha256 and session.sha256 != content_hash:
+        discard_session(session)
+        raise UploadError('The assembled file does not match the declared sha256; start a new upload', status=422)
+
+    with open(assembled, 'rb') as handle:
+        attach_content(question, content_hash, _AssembledFile(handle), session.filename)
+    question.save()
+    return question
+
+
+def discard_session(session):
+    shutil.rmtree(session_directory(session), ignore_errors=True)
+    session.delete()
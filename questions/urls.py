@@ -3,5 +3,11 @@ from . import views
 
 urlpatterns = [
     path('', views.question_list, name='question-list'),        # GET & POST
+    path('search/', views.question_search, name='question-search'),  # GET
     path('<int:id>/', views.question_detail, name='question-detail'),  # GET, PUT, DELETE
+    path('<int:id>/download/', views.question_download, name='question-download'),  # GET
+    path('uploads/', views.upload_list, name='upload-list'),  # POST
+    path('uploads/<uuid:session_id>/', views.upload_detail, name='upload-detail'),  # GET, DELETE
+    path('uploads/<uuid:session_id>/chunks/<int:index>/', views.upload_chunk, name='upload-chunk'),  # PUT
+    path('uploads/<uuid:session_id>/complete/', views.upload_complete, name='upload-complete'),  # POST
 ]
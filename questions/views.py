@@ -1,35 +1,506 @@
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError
+from django.core.validators import FileExtensionValidator
+from django.db.models import Count
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
 from django.views.decorators.csrf import csrf_exempt
-from django.http import JsonResponse
-import json
+from django.http import HttpResponseRedirect
+import os
+from operator import attrgetter
+
+from accounts.authentication import get_request_user, materialize
+from accounts.serializers import USER_FIELDS
+from stax_api import object_cache
+from stax_api.fastjson import JsonResponse, loads
+from stax_api.fieldsets import Expansion, Field, Representation, column, file_url
+from stax_api.images import rendition_urls
+from stax_api.pagination import InvalidCursor, apaginate_keyset
+from stax_api.partial_saves import changed_columns
+from stax_api.tasks import submit
+from .downloads import file_response, file_validators, record_download
+from .models import PastQuestion, UploadSession, normalize_course_code, normalize_university
+from .uploads import (
+    SHA256_RE, UploadError, attach_content, complete_session, discard_session, find_original,
+    hash_file, received_chunks, start_session, store_chunk,
+)
+
+ALLOWED_EXTENSIONS = ['pdf', 'jpg', 'jpeg', 'png']
+MAX_UPLOAD_SIZE = 50 * 1024 * 1024
+
+# Fields contributors may set on upload and edit
+WRITABLE_FIELDS = ['title', 'university', 'course_code', 'course_name', 'year', 'semester', 'category_id']
+
+LIST_ORDERING = ['-created_at', '-id']
+# Search ranking: most recent papers first, then the newest uploads. Only
+# columns that do not change once a paper is listed, or a cursor would skip
+# or repeat rows whose position moved between pages
+SEARCH_ORDERING = ['-year', '-created_at', '-id']
+
+
+QUESTION_FIELDS = Representation(
+    {
+        'id': column('id'),
+        'title': column('title'),
+        'university': column('university'),
+        'course_code': column('course_code'),
+        'course_name': column('course_name'),
+        'year': column('year'),
+        'semester': column('semester'),
+        'category_id': column('category_id'),
+        'file': file_url('file'),
+        'file_type': column('file_type'),
+        'duplicate_of': Field(['duplicate_of'], attrgetter('duplicate_of_id')),
+        'page_count': column('page_count'),
+        'preview': Field(['preview_renditions'], lambda question: rendition_urls(question.preview_renditions)),
+        'uploaded_by': Field(['uploaded_by'], attrgetter('uploaded_by_id')),
+        'status': column('status'),
+        'views_count': Field(['views_count'], attrgetter('live_views_count')),
+        'downloads_count': Field(['downloads_count'], attrgetter('live_downloads_count')),
+        'created_at': column('created_at'),
+    },
+    expansions={'uploaded_by': Expansion('uploaded_by', USER_FIELDS, ['id', 'full_name'])},
+    default_expand=['uploaded_by'],
+)
+
+
+def question_to_dict(question):
+    """Serialize a PastQuestion (with uploaded_by already joined) to a dict"""
+    return QUESTION_FIELDS.serializer()(question)
+
+
+def _parse_year(value):
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"Invalid year '{value}'")
+
+
+def filter_questions(queryset, params, skip=()):
+    """
+    Apply the search filters to a PastQuestion queryset.
+
+    Filters are applied as equality/range predicates on the normalized keys so
+    they line up with the (status, university, course_code, year) indexes.
+    Names listed in `skip` are left out, which is how facets exclude their own
+    filter.
+    """
+    if params.get('university'):
+        queryset = queryset.filter(university_normalized=normalize_university(params['university']))
+
+    code = normalize_course_code(params.get('course_code'))
+    if code:
+        if code.isalpha():
+            # A bare department prefix such as "CSC"
+            queryset = queryset.filter(course_code_normalized__startswith=code)
+        else:
+            queryset = queryset.filter(course_code_normalized=code)
+
+    if 'year' not in skip:
+        if params.get('year'):
+            queryset = queryset.filter(year=_parse_year(params['year']))
+        if params.get('year_from'):
+            queryset = queryset.filter(year__gte=_parse_year(params['year_from']))
+        if params.get('year_to'):
+            queryset = queryset.filter(year__lte=_parse_year(params['year_to']))
+
+    semester = params.get('semester')
+    if semester and 'semester' not in skip:
+        if semester not in dict(PastQuestion.SEMESTER_CHOICES):
+            raise ValueError(f"Invalid semester '{semester}'")
+        queryset = queryset.filter(semester=semester)
+
+    category = params.get('category')
+    if category:
+        if category.isdigit():
+            queryset = queryset.filter(category_id=int(category))
+        else:
+            queryset = queryset.filter(category__slug=category)
+    return queryset
+
+
+async def search_facets(params):
+    """Counts per year and per semester for a search, each ignoring its own filter"""
+    approved = PastQuestion.objects.filter(status='approved')
+    years = (
+        filter_questions(approved, params, skip=('year',))
+        .values('year').annotate(count=Count('id')).order_by('-year')
+    )
+    semesters = (
+        filter_questions(approved, params, skip=('semester',))
+        .values('semester').annotate(count=Count('id')).order_by('semester')
+    )
+    return {"year": [row async for row in years], "semester": [row async for row in semesters]}
+
+
+def _errors(error):
+    """Flatten a ValidationError into something JSON serializable"""
+    return error.message_dict if hasattr(error, 'error_dict') else error.messages
+
+
+def _apply_fields(question, data, exclude=()):
+    """Copy writable fields from request data onto a question and validate it"""
+    for field in WRITABLE_FIELDS:
+        if field in data:
+            setattr(question, field, data[field])
+    exclude = ['uploaded_by', *exclude]
+    if not question.category_id:
+        # category is optional on upload even though the field isn't blank=True
+        question.category_id = None
+        exclude.append('category')
+    question.full_clean(exclude=exclude)
+
+
+def _can_modify(user, question):
+    return user is not None and (user.is_staff or question.uploaded_by_id == user.pk)
 
-# Sample in-memory storage
-questions = [
-    {"id": 1, "course_id": 1, "question": "What is Python?"},
-    {"id": 2, "course_id": 1, "question": "What is Django?"}
-]
 
 @csrf_exempt
-def question_list(request):
+async def question_list(request):
+    """
+    GET /api/questions/
+    Returns a page of approved questions, newest first. Accepts the same
+    filters as /api/questions/search/ plus page_size and cursor, and the
+    same fields/expand parameters.
+
+    POST /api/questions/ (authenticated, multipart/form-data)
+    Uploads a question for review. Fields: title, university, course_code,
+    course_name, year, semester, category_id (optional) and file.
+
+    GET is served on the async ORM; POST runs synchronously.
+    """
     if request.method == 'GET':
-        return JsonResponse(questions, safe=False)
-    elif request.method == 'POST':
-        body = json.loads(request.body)
-        new_question = {"id": len(questions)+1, **body}
-        questions.append(new_question)
-        return JsonResponse({"message": "Question created", "data": new_question}, status=201)
+        try:
+            selection = QUESTION_FIELDS.select(request.GET)
+            queryset = QUESTION_FIELDS.apply(PastQuestion.objects.filter(status='approved'), selection, keep=LIST_ORDERING)
+            rows, next_url = await apaginate_keyset(request, filter_questions(queryset, request.GET), LIST_ORDERING)
+        except (ValueError, ValidationError, InvalidCursor) as e:
+            return JsonResponse({"error": str(e)}, status=400)
+        to_dict = QUESTION_FIELDS.serializer(selection)
+        return JsonResponse({
+            "next": next_url,
+            "results": [to_dict(question) for question in rows],
+        })
+    return await sync_to_async(_question_upload)(request)
+
+
+def _question_upload(request):
+    if request.method == 'POST':
+        user = get_request_user(request)
+        if user is None:
+            return JsonResponse({"error": "Authentication required"}, status=401)
+        upload = request.FILES.get('file')
+        if upload is None:
+            return JsonResponse({"error": {"file": ["This field is required."]}}, status=400)
+        if upload.size > MAX_UPLOAD_SIZE:
+            return JsonResponse({"error": {"file": ["File size cannot exceed 50MB."]}}, status=400)
+        question = PastQuestion(uploaded_by=materialize(user))
+        try:
+            FileExtensionValidator(ALLOWED_EXTENSIONS)(upload)
+            _apply_fields(question, request.POST, exclude=['file'])
+        except ValidationError as e:
+            return JsonResponse({"error": _errors(e)}, status=400)
+        attach_content(question, hash_file(upload), upload, upload.name)
+        question.save()
+        return JsonResponse({"message": "Question uploaded for review", "data": question_to_dict(question)}, status=201)
+    return JsonResponse({"error": "Method not allowed"}, status=405)
+
+
+async def question_search(request):
+    """
+    GET /api/questions/search/
+    Ranked, faceted search over approved questions.
+    Query params:
+        university    - case/space insensitive, e.g. "unilag"
+        course_code   - "CSC 201", "csc201" or a department prefix like "CSC"
+        year, year_from, year_to
+        semester      - first | second | both
+        category      - category slug or id
+        facets        - set to "false" to skip the facet counts
+        page_size, cursor
+        fields        - comma-separated question fields to return; only those
+                        columns are read
+        expand        - uploaded_by: render it as {id, full_name} rather than
+                        its id (the default when fields is not given)
+    Response JSON:
+        {
+            "next": "<url or null>",
+            "results": [{question object}, ...],
+            "facets": {
+                "year": [{"year": 2023, "count": 4}, ...],
+                "semester": [{"semester": "first", "count": 7}, ...]
+            }
+        }
+    Facets are only computed for the first page.
+    """
+    if request.method != 'GET':
+        return JsonResponse({"error": "Method not allowed"}, status=405)
+    try:
+        selection = QUESTION_FIELDS.select(request.GET)
+        queryset = QUESTION_FIELDS.apply(PastQuestion.objects.filter(status='approved'), selection, keep=SEARCH_ORDERING)
+        rows, next_url = await apaginate_keyset(request, filter_questions(queryset, request.GET), SEARCH_ORDERING)
+        facets = None
+        if 'cursor' not in request.GET and request.GET.get('facets', 'true').lower() != 'false':
+            facets = await search_facets(request.GET)
+    except (ValueError, ValidationError, InvalidCursor) as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    to_dict = QUESTION_FIELDS.serializer(selection)
+    return JsonResponse({
+        "next": next_url,
+        "results": [to_dict(question) for question in rows],
+        "facets": facets,
+    })
+
 
 @csrf_exempt
-def question_detail(request, id):
-    question = next((q for q in questions if q["id"] == id), None)
+async def question_detail(request, id):
+    """
+    GET /api/questions/<id>/
+    Approved questions are public; pending/rejected ones are only visible to
+    their uploader and staff.
+
+    PUT /api/questions/<id>/ (uploader or staff)
+    Updates metadata from a JSON body. Uploaders can only edit pending questions.
+
+    DELETE /api/questions/<id>/ (uploader or staff)
+
+    GET is served on the async ORM; PUT and DELETE run synchronously.
+    """
+    if request.method != 'GET':
+        return await sync_to_async(_question_detail_write)(request, id)
+
+    # Approved questions are served from the object cache when possible
+    version = await object_cache.aversion('questions.pastquestion', id)
+    cached = await object_cache.aget_response('questions.pastquestion', id, version)
+    if cached is not None:
+        await PastQuestion(pk=id).aincrement_views()
+        return cached
+
+    question = await QUESTION_FIELDS.apply(PastQuestion.objects.filter(pk=id)).afirst()
     if not question:
         return JsonResponse({"error": "Question not found"}, status=404)
+    if question.status != 'approved':
+        user = await sync_to_async(get_request_user)(request)
+        if not _can_modify(user, question):
+            return JsonResponse({"error": "Question not found"}, status=404)
 
-    if request.method == 'GET':
-        return JsonResponse(question)
-    elif request.method == 'PUT':
-        body = json.loads(request.body)
-        question.update(body)
-        return JsonResponse({"message": "Question updated", "data": question})
+    await question.aincrement_views()
+    response = JsonResponse(question_to_dict(question))
+    if question.status == 'approved':
+        await object_cache.aset_response('questions.pastquestion', question.pk, response, version)
+    return response
+
+
+def _question_detail_write(request, id):
+    question = PastQuestion.objects.select_related('uploaded_by').defer('extracted_text').filter(pk=id).first()
+    if not question:
+        return JsonResponse({"error": "Question not found"}, status=404)
+
+    user = get_request_user(request)
+    if question.status != 'approved' and not _can_modify(user, question):
+        return JsonResponse({"error": "Question not found"}, status=404)
+
+    if not _can_modify(user, question):
+        return JsonResponse({"error": "You do not have permission to modify this question"}, status=403)
+
+    if request.method == 'PUT':
+        if question.status != 'pending' and not user.is_staff:
+            return JsonResponse({"error": "Only pending questions can be edited"}, status=403)
+        try:
+            body = loads(request.body)
+            if not isinstance(body, dict):
+                raise ValueError
+        except ValueError:
+            return JsonResponse({"error": "Request body must be a JSON object"}, status=400)
+        try:
+            _apply_fields(question, body)
+        except ValidationError as e:
+            return JsonResponse({"error": _errors(e)}, status=400)
+        # Only the edited columns: a full save would write back the counters
+        # and processing results as they were when the row was read
+        question.save(update_fields=changed_columns(question, [field for field in WRITABLE_FIELDS if field in body]))
+        return JsonResponse({"message": "Question updated", "data": question_to_dict(question)})
     elif request.method == 'DELETE':
-        questions.remove(question)
+        question.delete()
         return JsonResponse({"message": "Question deleted"})
+    return JsonResponse({"error": "Method not allowed"}, status=405)
+
+
+def question_download(request, id):
+    """
+    GET /api/questions/<id>/download/ (authenticated)
+    Streams the question file. Supports Range/If-Range, If-None-Match and
+    If-Modified-Since, and X-Accel-Redirect/X-Sendfile when STAX_DOWNLOADS
+    names a front-end server. The download is recorded in the background.
+    """
+    if request.method not in ('GET', 'HEAD'):
+        return JsonResponse({"error": "Method not allowed"}, status=405)
+    user = get_request_user(request)
+    if user is None:
+        return JsonResponse({"error": "Authentication required"}, status=401)
+    question = PastQuestion.objects.filter(pk=id).only('id', 'file', 'status', 'uploaded_by_id').first()
+    if not question or (question.status != 'approved' and not _can_modify(user, question)):
+        return JsonResponse({"error": "Question not found"}, status=404)
+
+    try:
+        etag, last_modified = file_validators(question.file)
+    except NotImplementedError:
+        # Remote storage (S3, Cloudinary): let the client fetch it directly
+        submit(record_download, question.pk, user.pk)
+        return HttpResponseRedirect(question.file.url)
+    except FileNotFoundError:
+        return JsonResponse({"error": "File not found"}, status=404)
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        return response
+
+    response = file_response(request, question.file, etag, last_modified)
+    # Count a download once, not once per resumed range request
+    first_bytes = response.status_code == 200 or response.get('Content-Range', '').startswith('bytes 0-')
+    if request.method == 'GET' and first_bytes:
+        submit(record_download, question.pk, user.pk)
+    return response
+
+
+def _session_to_dict(session):
+    return {
+        "id": str(session.pk),
+        "filename": session.filename,
+        "size": session.size,
+        "sha256": session.sha256,
+        "chunk_size": session.chunk_size,
+        "chunk_count": session.chunk_count,
+        "received": received_chunks(session),
+        "status": session.status,
+        "expires_at": session.expires_at,
+    }
+
+
+def _get_session(request, session_id):
+    """(user, session, error response) for an upload owned by the caller"""
+    user = get_request_user(request)
+    if user is None:
+        return None, None, JsonResponse({"error": "Authentication required"}, status=401)
+    session = UploadSession.objects.filter(pk=session_id, user_id=user.pk).first()
+    if session is None:
+        return user, None, JsonResponse({"error": "Upload not found"}, status=404)
+    if session.status == 'open' and session.expires_at <= timezone.now():
+        discard_session(session)
+        return user, None, JsonResponse({"error": "Upload expired"}, status=410)
+    return user, session, None
+
+
+@csrf_exempt
+def upload_list(request):
+    """
+    POST /api/questions/uploads/ (authenticated)
+    Starts a resumable upload. Body: {"filename": "csc201.pdf",
+    "size": 31457280, "sha256": "<optional hex digest of the whole file>"}
+    Returns the session with its chunk_size and chunk_count; 409 with
+    "duplicate_of" if an approved question already has this sha256.
+
+    Then PUT each chunk to /api/questions/uploads/<id>/chunks/<index>/
+    with an X-Chunk-SHA256 header, and POST the question fields to
+    /api/questions/uploads/<id>/complete/.
+    """
+    if request.method != 'POST':
+        return JsonResponse({"error": "Method not allowed"}, status=405)
+    user = get_request_user(request)
+    if user is None:
+        return JsonResponse({"error": "Authentication required"}, status=401)
+    try:
+        body = loads(request.body)
+        filename = str(body['filename'])
+        size = int(body['size'])
+        sha256 = str(body.get('sha256') or '').lower()
+    except (ValueError, TypeError, KeyError):
+        return JsonResponse({"error": "filename and size are required"}, status=400)
+    extension = os.path.splitext(filename)[1].lstrip('.').lower()
+    if extension not in ALLOWED_EXTENSIONS:
+        message = f"Allowed extensions are: {', '.join(ALLOWED_EXTENSIONS)}."
+        return JsonResponse({"error": {"file": [message]}}, status=400)
+    if not 0 < size <= MAX_UPLOAD_SIZE:
+        return JsonResponse({"error": {"file": ["File size cannot exceed 50MB."]}}, status=400)
+    if sha256 and not SHA256_RE.match(sha256):
+        return JsonResponse({"error": "sha256 must be a hex SHA-256 digest"}, status=400)
+    if sha256:
+        original = find_original(sha256, approved_only=True)
+        if original is not None:
+            return JsonResponse(
+                {"error": "This file has already been published", "duplicate_of": original.pk}, status=409
+            )
+    session = start_session(materialize(user), filename, size, sha256)
+    return JsonResponse(_session_to_dict(session), status=201)
+
+
+@csrf_exempt
+def upload_detail(request, session_id):
+    """
+    GET /api/questions/uploads/<id>/ - progress, including received chunk indices
+    DELETE /api/questions/uploads/<id>/ - abandon the upload
+    """
+    user, session, error = _get_session(request, session_id)
+    if error:
+        return error
+    if request.method == 'GET':
+        return JsonResponse(_session_to_dict(session))
+    elif request.method == 'DELETE':
+        discard_session(session)
+        return JsonResponse({"message": "Upload discarded"})
+    return JsonResponse({"error": "Method not allowed"}, status=405)
+
+
+@csrf_exempt
+def upload_chunk(request, session_id, index):
+    """
+    PUT /api/questions/uploads/<id>/chunks/<index>/
+    Raw chunk bytes as the body, with header X-Chunk-SHA256: <hex digest>.
+    Chunks may arrive in any order and may be resent.
+    """
+    if request.method != 'PUT':
+        return JsonResponse({"error": "Method not allowed"}, status=405)
+    user, session, error = _get_session(request, session_id)
+    if error:
+        return error
+    if session.status != 'open':
+        return JsonResponse({"error": "Upload already completed"}, status=409)
+    try:
+        store_chunk(session, index, request, request.headers.get('X-Chunk-SHA256', '').lower())
+    except UploadError as e:
+        return JsonResponse({"error": str(e)}, status=e.status)
+    return JsonResponse({"index": index, "received": received_chunks(session)})
+
+
+@csrf_exempt
+def upload_complete(request, session_id):
+    """
+    POST /api/questions/uploads/<id>/complete/
+    Body: the question fields (title, university, course_code, course_name,
+    year, semester, category_id). Assembles the chunks and creates the
+    question for review; "duplicate_of" is set if the same file was already
+    uploaded, in which case the stored file is shared.
+    """
+    if request.method != 'POST':
+        return JsonResponse({"error": "Method not allowed"}, status=405)
+    user, session, error = _get_session(request, session_id)
+    if error:
+        return error
+    if session.status != 'open':
+        return JsonResponse({"error": "Upload already completed", "question": session.past_question_id}, status=409)
+    try:
+        body = loads(request.body)
+        if not isinstance(body, dict):
+            raise ValueError
+    except ValueError:
+        return JsonResponse({"error": "Request body must be a JSON object"}, status=400)
+    question = PastQuestion(uploaded_by=materialize(user))
+    try:
+        _apply_fields(question, body, exclude=['file'])
+    except ValidationError as e:
+        return JsonResponse({"error": _errors(e)}, status=400)
+    try:
+        question = complete_session(session, question)
+    except UploadError as e:
+        return JsonResponse({"error": str(e)}, status=e.status)
+    return JsonResponse({"message": "Question uploaded for review", "data": question_to_dict(question)}, status=201)
@@ -0,0 +1,25 @@
+# search/backends/__init__.py
+
+from django.conf import settings
+from django.db import connections
+from django.utils.module_loading import import_string
+
+VENDOR_BACKENDS = {
+    'sqlite': 'search.backends.sqlite.SQLiteFTS5Backend',
+    'postgresql': 'search.backends.postgres.PostgresBackend',
+}
+FALLBACK_BACKEND = 'search.backends.base.LikeSearchBackend'
+
+
+def get_backend(using='default'):
+    """
+    Return the search backend for a database alias.
+
+    STAX_SEARCH['BACKEND'] forces a backend class; otherwise it is picked from
+    the database vendor, falling back to plain LIKE queries.
+    """
+    connection = connections[using]
+    path = getattr(settings, 'STAX_SEARCH', {}).get('BACKEND')
+    if not path:
+        path = VENDOR_BACKENDS.get(connection.vendor, FALLBACK_BACKEND)
+    return import_string(path)(connection)
@@ -0,0 +1,71 @@
+# search/backends/base.py
+
+import re
+from functools import reduce
+from operator import or_
+
+from django.db.models import Q
+
+MAX_TERMS = 8
+
+
+def query_terms(query):
+    """Split user input into lowercase word tokens safe to embed in a query"""
+    return re.findall(r'\w+', (query or '').lower())[:MAX_TERMS]
+
+
+class BaseSearchBackend:
+    """Interface every search backend implements"""
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def create_table(self, index):
+        raise NotImplementedError
+
+    def drop_table(self, index):
+        raise NotImplementedError
+
+    def upsert(self, index, rows):
+        """Insert or replace (pk, [field values]) rows"""
+        raise NotImplementedError
+
+    def remove(self, index, pks):
+        raise NotImplementedError
+
+    def search(self, index, query, limit, offset=0):
+        """Return [(pk, rank)] best match first"""
+        raise NotImplementedError
+
+
+class LikeSearchBackend(BaseSearchBackend):
+    """
+    Fallback for databases without a native backend.
+
+    Keeps no index at all and answers with icontains scans, i.e. the
+    behaviour of rest_framework's SearchFilter.
+    """
+
+    def create_table(self, index):
+        pass
+
+    def drop_table(self, index):
+        pass
+
+    def upsert(self, index, rows):
+        pass
+
+    def remove(self, index, pks):
+        pass
+
+    def search(self, index, query, limit, offset=0):
+        terms = query_terms(query)
+        if not terms:
+            return []
+        queryset = index.searchable_queryset().using(self.connection.alias)
+        for term in terms:
+            queryset = queryset.filter(
+                reduce(or_, [Q(**{f'{field}__icontains': term}) for field in index.fields])
+            )
+        pks = queryset.order_by('-pk').values_list('pk', flat=True)[offset:offset + limit]
+        return [(pk, 0) for pk in pks]
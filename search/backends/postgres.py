@@ -0,0 +1,72 @@
+# search/backends/postgres.py
+
+from django.conf import settings
+
+from .base import BaseSearchBackend, query_terms
+
+
+class PostgresBackend(BaseSearchBackend):
+    """
+    One (object_id, tsvector) side table per model with a GIN index.
+
+    Kept out of the model tables so the same migrations run on SQLite, and so
+    that rewriting a document never touches the hot model row.
+    """
+
+    @property
+    def config(self):
+        return getattr(settings, 'STAX_SEARCH', {}).get('POSTGRES_CONFIG', 'english')
+
+    def create_table(self, index):
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE TABLE IF NOT EXISTS {index.table} ("
+                f"object_id bigint PRIMARY KEY, document tsvector NOT NULL)"
+            )
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {index.table}_document_gin "
+                f"ON {index.table} USING GIN (document)"
+            )
+
+    def drop_table(self, index):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {index.table}")
+
+    def upsert(self, index, rows):
+        if not rows:
+            return
+        document = ' || '.join(
+            f"setweight(to_tsvector(%s::regconfig, %s), '{weight}')" for weight in index.weights
+        )
+        params = []
+        for pk, values in rows:
+            row = [pk]
+            for value in values:
+                row += [self.config, value]
+            params.append(row)
+        with self.connection.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT INTO {index.table} (object_id, document) VALUES (%s, {document}) "
+                f"ON CONFLICT (object_id) DO UPDATE SET document = EXCLUDED.document",
+                params,
+            )
+
+    def remove(self, index, pks):
+        if not pks:
+            return
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {index.table} WHERE object_id = ANY(%s)", [list(pks)])
+
+    def search(self, index, query, limit, offset=0):
+        terms = query_terms(query)
+        if not terms:
+            return []
+        tsquery = ' & '.join(f'{term}:*' for term in terms)
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT object_id, ts_rank_cd(document, query) AS rank "
+                f"FROM {index.table}, to_tsquery(%s::regconfig, %s) query "
+                f"WHERE document @@ query ORDER BY rank DESC, object_id DESC LIMIT %s OFFSET %s",
+                [self.config, tsquery, limit, offset],
+            )
+            return cursor.fetchall()
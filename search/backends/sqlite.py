@@ -0,0 +1,60 @@
+# search/backends/sqlite.py
+
+from .base import BaseSearchBackend, query_terms
+
+# bm25() column weights for each Postgres-style weight class
+BM25_WEIGHTS = {'A': 10.0, 'B': 4.0, 'C': 1.0, 'D': 0.5}
+
+
+class SQLiteFTS5Backend(BaseSearchBackend):
+    """
+    One FTS5 virtual table per model, keyed by rowid = primary key.
+
+    Using the rowid as the key makes updates and deletes rowid lookups
+    instead of scans over an UNINDEXED column.
+    """
+
+    def create_table(self, index):
+        columns = ', '.join(index.fields)
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {index.table} "
+                f"USING fts5({columns}, tokenize='unicode61 remove_diacritics 2')"
+            )
+
+    def drop_table(self, index):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {index.table}")
+
+    def upsert(self, index, rows):
+        if not rows:
+            return
+        self.remove(index, [pk for pk, _ in rows])
+        columns = ', '.join(['rowid'] + index.fields)
+        placeholders = ', '.join(['%s'] * (len(index.fields) + 1))
+        with self.connection.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT INTO {index.table} ({columns}) VALUES ({placeholders})",
+                [[pk, *values] for pk, values in rows],
+            )
+
+    def remove(self, index, pks):
+        if not pks:
+            return
+        with self.connection.cursor() as cursor:
+            cursor.executemany(f"DELETE FROM {index.table} WHERE rowid = %s", [[pk] for pk in pks])
+
+    def search(self, index, query, limit, offset=0):
+        terms = query_terms(query)
+        if not terms:
+            return []
+        match = ' '.join(f'"{term}"*' for term in terms)
+        weights = ', '.join(str(BM25_WEIGHTS[weight]) for weight in index.weights)
+        with self.connection.cursor() as cursor:
+            # bm25() is negative, more negative is a better match
+            cursor.execute(
+                f"SELECT rowid, bm25({index.table}, {weights}) AS rank FROM {index.table} "
+                f"WHERE {index.table} MATCH %s ORDER BY rank LIMIT %s OFFSET %s",
+                [match, limit, offset],
+            )
+            return [(pk, -rank) for pk, rank in cursor.fetchall()]
@@ -0,0 +1,82 @@
+# search/engine.py
+
+from django.conf import settings
+from django.db.models import Case, IntegerField, When
+
+from .backends import get_backend
+from .indexes import INDEXES, get_index
+
+REINDEX_BATCH_SIZE = 1000
+
+
+def max_results():
+    return getattr(settings, 'STAX_SEARCH', {}).get('MAX_RESULTS', 1000)
+
+
+def update_object(instance, using='default'):
+    """Add, refresh or drop one instance depending on whether it is searchable"""
+    index = get_index(type(instance))
+    backend = get_backend(using)
+    if index.is_searchable(instance):
+        backend.upsert(index, [(instance.pk, index.document(instance))])
+    else:
+        backend.remove(index, [instance.pk])
+
+
+def remove_object(instance, using='default'):
+    get_backend(using).remove(get_index(type(instance)), [instance.pk])
+
+
+def reindex_objects(model, pks, using='default'):
+    """
+    Re-sync specific rows, for code paths that bypass signals such as
+    QuerySet.update() or bulk_create().
+    """
+    index = get_index(model)
+    backend = get_backend(using)
+    pks = list(pks)
+    for start in range(0, len(pks), REINDEX_BATCH_SIZE):
+        batch = pks[start:start + REINDEX_BATCH_SIZE]
+        rows = model._default_manager.using(using).filter(pk__in=batch)
+        searchable = [row for row in rows if index.is_searchable(row)]
+        found = {row.pk for row in searchable}
+        backend.remove(index, [pk for pk in batch if pk not in found])
+        backend.upsert(index, [(row.pk, index.document(row)) for row in searchable])
+
+
+def rebuild(index, using='default', model=None, batch_size=REINDEX_BATCH_SIZE):
+    """Drop and repopulate one index; `model` lets migrations pass a historical model"""
+    backend = get_backend(using)
+    backend.drop_table(index)
+    backend.create_table(index)
+    model = model or index.model
+    fields = [field.name for field in model._meta.concrete_fields if field.name in index.fields]
+    queryset = index.searchable_queryset(model).using(using).only('pk', *fields)
+    batch = []
+    for instance in queryset.iterator(chunk_size=batch_size):
+        batch.append((instance.pk, index.document(instance)))
+        if len(batch) >= batch_size:
+            backend.upsert(index, batch)
+            batch = []
+    backend.upsert(index, batch)
+
+
+def rebuild_all(using='default'):
+    for index in INDEXES:
+        rebuild(index, using)
+
+
+def search(model, query, limit=20, offset=0, using='default'):
+    """Return [(pk, rank)] for `query`, best match first"""
+    index = get_index(model)
+    limit = max(0, min(limit, max_results() - offset))
+    if limit == 0:
+        return []
+    return get_backend(using).search(index, query, limit, offset)
+
+
+def search_queryset(queryset, query, limit=None, offset=0):
+    """Restrict `queryset` to full-text matches, ordered by rank"""
+    pks = [pk for pk, _ in search(queryset.model, query, limit or max_results(), offset, queryset.db)]
+    rank = Case(*[When(pk=pk, then=position) for position, pk in enumerate(pks)], output_field=IntegerField())
+    return queryset.filter(pk__in=pks).order_by(rank) if pks else queryset.none()
@@ -0,0 +1,25 @@
+# search/filters.py
+
+from rest_framework.filters import SearchFilter
+
+from .engine import search_queryset
+from .indexes import get_index
+
+
+class FullTextSearchFilter(SearchFilter):
+    """
+    Drop-in replacement for rest_framework's SearchFilter.
+
+    For models with a registered SearchIndex the ?search= term is answered by
+    the full-text index (ranked, no LIKE scan). Other models fall back to the
+    stock icontains behaviour. Only searchable rows (e.g. approved questions)
+    are in the index.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        terms = request.query_params.get(self.search_param, '')
+        if not getattr(view, 'search_fields', None) or not terms.strip():
+            return queryset
+        if get_index(queryset.model) is None:
+            return super().filter_queryset(request, queryset, view)
+        return search_queryset(queryset, terms)
@@ -0,0 +1,63 @@
+# search/indexes.py
+
+from django.apps import apps
+
+
+class SearchIndex:
+    """
+    Declares which fields of a model are full-text indexed.
+
+    `weights` gives each field a Postgres weight class ('A' highest to 'D'
+    lowest); the SQLite backend maps them onto bm25 column weights.
+    Only rows matching `searchable` (field -> value) are kept in the index.
+    """
+
+    def __init__(self, model_label, fields, weights, searchable):
+        self.model_label = model_label
+        self.fields = fields
+        self.weights = weights
+        self.searchable = searchable
+
+    @property
+    def model(self):
+        return apps.get_model(self.model_label)
+
+    @property
+    def table(self):
+        return 'search_' + self.model_label.lower().replace('.', '_')
+
+    def is_searchable(self, instance):
+        return all(getattr(instance, field) == value for field, value in self.searchable.items())
+
+    def document(self, instance):
+        """Text of each indexed field, in `fields` order"""
+        # Historical models in older migrations may lack newer fields
+        return [getattr(instance, field, '') or '' for field in self.fields]
+
+    def searchable_queryset(self, model=None):
+        return (model or self.model)._default_manager.filter(**self.searchable)
+
+
+INDEXES = [
+    SearchIndex(
+        'courses.Course',
+        fields=['title', 'instructor_name', 'description'],
+        weights=['A', 'B', 'C'],
+        searchable={'is_published': True},
+    ),
+    SearchIndex(
+        'questions.PastQuestion',
+        fields=['course_code', 'course_code_normalized', 'title', 'course_name', 'extracted_text'],
+        weights=['A', 'A', 'B', 'B', 'D'],
+        searchable={'status': 'approved'},
+    ),
+]
+
+
+def get_index(model):
+    """Return the SearchIndex registered for a model class, or None"""
+    label = model._meta.label_lower
+    for index in INDEXES:
+        if index.model_label.lower() == label:
+            return index
+    return None
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from search.engine import rebuild
+from search.indexes import INDEXES
+
+
+class Command(BaseCommand):
+    help = 'Drop and rebuild the full-text search index tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+        parser.add_argument(
+            '--model', action='append', dest='models',
+            help='Only rebuild this model, e.g. courses.Course (repeatable)',
+        )
+
+    def handle(self, *args, **options):
+        wanted = {label.lower() for label in options['models'] or []}
+        for index in INDEXES:
+            if wanted and index.model_label.lower() not in wanted:
+                continue
+            rebuild(index, options['database'])
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt {index.table}'))
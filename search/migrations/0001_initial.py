@@ -0,0 +1,33 @@
+from django.db import migrations
+
+
+def create_indexes(apps, schema_editor):
+    from search.engine import rebuild
+    from search.indexes import INDEXES
+
+    for index in INDEXES:
+        model = apps.get_model(index.model_label)
+        rebuild(index, schema_editor.connection.alias, model=model)
+
+
+def drop_indexes(apps, schema_editor):
+    from search.backends import get_backend
+    from search.indexes import INDEXES
+
+    backend = get_backend(schema_editor.connection.alias)
+    for index in INDEXES:
+        backend.drop_table(index)
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('courses', '0002_course_catalog_indexes'),
+        ('questions', '0002_past_question_search_keys'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
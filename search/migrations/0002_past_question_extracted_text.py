@@ -0,0 +1,23 @@
+from django.db import migrations
+
+
+def rebuild_past_questions(apps, schema_editor):
+    from search.engine import rebuild
+    from search.indexes import INDEXES
+
+    for index in INDEXES:
+        if index.model_label == 'questions.PastQuestion':
+            rebuild(index, schema_editor.connection.alias, model=apps.get_model(index.model_label))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search', '0001_initial'),
+        ('questions', '0004_past_question_processing'),
+    ]
+
+    operations = [
+        # The index gains an extracted_text column
+        migrations.RunPython(rebuild_past_questions, migrations.RunPython.noop),
+    ]
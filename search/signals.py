@@ -0,0 +1,31 @@
+# search/signals.py
+
+from django.db.models.signals import post_delete, post_save
+
+from .engine import remove_object, update_object
+from .indexes import INDEXES
+
+
+def index_on_save(sender, instance, using, update_fields=None, **kwargs):
+    """Keep the index in step with the row, inside the same transaction"""
+    if update_fields is not None:
+        index = INDEXES_BY_MODEL[sender]
+        if not set(update_fields) & (set(index.fields) | set(index.searchable)):
+            # Nothing the index cares about changed
+            return
+    update_object(instance, using)
+
+
+def remove_on_delete(sender, instance, using, **kwargs):
+    remove_object(instance, using)
+
+
+INDEXES_BY_MODEL = {}
+
+
+def connect_indexes():
+    for index in INDEXES:
+        model = index.model
+        INDEXES_BY_MODEL[model] = index
+        post_save.connect(index_on_save, sender=model, dispatch_uid=f'search-save-{index.table}')
+        post_delete.connect(remove_on_delete, sender=model, dispatch_uid=f'search-delete-{index.table}')
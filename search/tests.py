@@ -0,0 +1,163 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+
+from accounts.models import User
+from courses.models import Course
+from questions.models import PastQuestion
+
+from .backends import get_backend
+from .backends.base import LikeSearchBackend, query_terms
+from .backends.postgres import PostgresBackend
+from .backends.sqlite import SQLiteFTS5Backend
+from .engine import reindex_objects, search, search_queryset
+from .indexes import get_index
+
+
+class SearchFixtures:
+    """Two published courses, a draft and an approved question"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='ada@example.com', username='ada', full_name='Ada', password='x-Secret-123'
+        )
+        self.algorithms = self._course('Algorithms', 'Sorting and searching, graphs')
+        self.graphs = self._course('Graph Theory', 'Paths, trees and algorithms')
+        self.draft = self._course('Algorithms II', 'Not published yet', is_published=False)
+        self.question = PastQuestion.objects.create(
+            title='Data Structures', university='Unilag', course_code='CSC 201', course_name='Data Structures',
+            year=2020, semester='first', file='past_questions/csc201.pdf', uploaded_by=self.user,
+            status='approved',
+        )
+
+    def _course(self, title, description, is_published=True):
+        return Course.objects.create(
+            title=title, description=description, instructor_name='Dr. Bello', duration='6 weeks',
+            is_published=is_published,
+        )
+
+    def _pks(self, model, query):
+        return [pk for pk, _ in search(model, query)]
+
+
+class FullTextSearchTests(SearchFixtures, TestCase):
+    """The FTS5 index follows the rows and ranks title matches first"""
+
+    def test_sqlite_backend_is_picked(self):
+        self.assertIsInstance(get_backend(), SQLiteFTS5Backend)
+
+    def test_ranked_prefix_matches(self):
+        # A title match outranks a description match; terms match as prefixes
+        self.assertEqual(self._pks(Course, 'algorithm'), [self.algorithms.pk, self.graphs.pk])
+        self.assertEqual(self._pks(Course, 'graph'), [self.graphs.pk, self.algorithms.pk])
+        self.assertEqual(self._pks(Course, 'sorting graph'), [self.algorithms.pk])
+        self.assertEqual(self._pks(PastQuestion, 'csc201'), [self.question.pk])
+        self.assertEqual(self._pks(Course, '"); DROP TABLE --'), [])
+
+    def test_index_follows_saves_and_deletes(self):
+        self.draft.is_published = True
+        self.draft.save()
+        self.assertIn(self.draft.pk, self._pks(Course, 'algorithms'))
+        self.algorithms.title = 'Complexity'
+        self.algorithms.save(update_fields=['title'])
+        self.assertEqual(self._pks(Course, 'complexity'), [self.algorithms.pk])
+        self.graphs.delete()
+        self.assertEqual(self._pks(Course, 'trees'), [])
+        self.question.status = 'rejected'
+        self.question.save()
+        self.assertEqual(self._pks(PastQuestion, 'structures'), [])
+
+    def test_bulk_updates_are_reindexed_on_request(self):
+        Course.objects.filter(pk=self.graphs.pk).update(title='Networks')
+        self.assertEqual(self._pks(Course, 'networks'), [])
+        reindex_objects(Course, [self.graphs.pk])
+        self.assertEqual(self._pks(Course, 'networks'), [self.graphs.pk])
+        Course.objects.filter(pk=self.graphs.pk).update(is_published=False)
+        reindex_objects(Course, [self.graphs.pk])
+        self.assertEqual(self._pks(Course, 'networks'), [])
+
+    def test_search_queryset_keeps_rank_order(self):
+        queryset = search_queryset(Course.objects.all(), 'graph')
+        self.assertEqual(list(queryset.values_list('pk', flat=True)), [self.graphs.pk, self.algorithms.pk])
+        self.assertFalse(search_queryset(Course.objects.all(), 'chemistry').exists())
+
+    @override_settings(STAX_SEARCH={'MAX_RESULTS': 1})
+    def test_results_are_capped(self):
+        self.assertEqual(len(search(Course, 'algorithms', limit=20)), 1)
+        self.assertEqual(search(Course, 'algorithms', limit=20, offset=1), [])
+
+    def test_search_view(self):
+        response = self.client.get('/api/search/', {'q': 'algorithms'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['id'] for row in response.json()['courses']], [self.algorithms.pk, self.graphs.pk])
+        self.assertEqual(response.json()['questions'], [])
+        response = self.client.get('/api/search/', {'q': 'structures', 'type': 'questions'})
+        self.assertEqual([row['id'] for row in response.json()['questions']], [self.question.pk])
+        self.assertNotIn('courses', response.json())
+        for params in ({}, {'q': 'x', 'type': 'users'}, {'q': 'x', 'offset': 'first'}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get('/api/search/', params).status_code, 400)
+
+
+class RebuildTests(SearchFixtures, TransactionTestCase):
+    """rebuild_search_index repopulates the index from the rows"""
+
+    def tearDown(self):
+        # Rebuilding drops the FTS tables, which a TestCase could not roll
+        # back cleanly; flushing does not empty them, so do it here
+        Course.objects.all().delete()
+        PastQuestion.objects.all().delete()
+        call_command('rebuild_search_index', stdout=StringIO())
+
+    def test_rebuild(self):
+        Course.objects.filter(pk=self.graphs.pk).update(title='Networks')
+        out = StringIO()
+        call_command('rebuild_search_index', '--model', 'courses.Course', stdout=out)
+        self.assertEqual(out.getvalue(), 'Rebuilt search_courses_course\n')
+        self.assertEqual(self._pks(Course, 'networks'), [self.graphs.pk])
+        self.assertEqual(self._pks(PastQuestion, 'structures'), [self.question.pk])
+
+
+@override_settings(STAX_SEARCH={'BACKEND': 'search.backends.base.LikeSearchBackend'})
+class LikeSearchTests(SearchFixtures, TestCase):
+    """Databases without a native backend fall back to icontains scans"""
+
+    def test_every_term_must_match_a_searchable_row(self):
+        self.assertIsInstance(get_backend(), LikeSearchBackend)
+        self.assertEqual(self._pks(Course, 'algorithms'), [self.graphs.pk, self.algorithms.pk])
+        self.assertEqual(self._pks(Course, 'sorting graph'), [self.algorithms.pk])
+        self.assertEqual(self._pks(Course, ''), [])
+
+
+class PostgresBackendTests(SimpleTestCase):
+    """Queries sent to PostgreSQL (checked without a server)"""
+
+    def setUp(self):
+        self.connection = mock.MagicMock()
+        self.cursor = self.connection.cursor.return_value.__enter__.return_value
+        self.index = get_index(Course)
+
+    def test_search_uses_a_prefix_tsquery(self):
+        self.cursor.fetchall.return_value = [(3, 0.5)]
+        with override_settings(STAX_SEARCH={'POSTGRES_CONFIG': 'simple'}):
+            hits = PostgresBackend(self.connection).search(self.index, 'Data Struct!', 10, 20)
+        self.assertEqual(hits, [(3, 0.5)])
+        sql, params = self.cursor.execute.call_args.args
+        self.assertIn('document @@ query', sql)
+        self.assertEqual(params, ['simple', 'data:* & struct:*', 10, 20])
+
+    def test_upsert_weights_each_field(self):
+        PostgresBackend(self.connection).upsert(self.index, [(1, ['Algorithms', 'Dr. Bello', 'Sorting'])])
+        sql, params = self.cursor.executemany.call_args.args
+        self.assertEqual([sql.count(f"'{weight}')") for weight in 'ABC'], [1, 1, 1])
+        self.assertIn('ON CONFLICT (object_id) DO UPDATE', sql)
+        self.assertEqual(params, [[1, 'english', 'Algorithms', 'english', 'Dr. Bello', 'english', 'Sorting']])
+
+    def test_empty_queries_do_not_reach_the_database(self):
+        self.assertEqual(query_terms('  ?! '), [])
+        self.assertEqual(PostgresBackend(self.connection).search(self.index, '?!', 10), [])
+        PostgresBackend(self.connection).upsert(self.index, [])
+        PostgresBackend(self.connection).remove(self.index, [])
+        self.assertFalse(self.connection.cursor.called)
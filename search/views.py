@@ -0,0 +1,61 @@
+from courses.models import Course
+from courses.views import COURSE_FIELDS
+from questions.models import PastQuestion
+from questions.views import QUESTION_FIELDS
+from stax_api.fastjson import JsonResponse
+from stax_api.pagination import get_page_size
+from .engine import search
+
+SEARCH_TYPES = {
+    # model, representation of its results
+    'courses': (Course, COURSE_FIELDS),
+    'questions': (PastQuestion, QUESTION_FIELDS),
+}
+
+
+def _ranked(model, representation, query, limit, offset):
+    """Load the matching rows for one model in rank order, reading only the served columns"""
+    hits = search(model, query, limit, offset)
+    rows = representation.apply(model.objects.all()).in_bulk([pk for pk, _ in hits])
+    return [(rows[pk], rank) for pk, rank in hits if pk in rows]
+
+
+def search_view(request):
+    """
+    GET /api/search/?q=<terms>
+    Ranked full-text search over published courses and approved past questions.
+    Query params:
+        q          - search terms; each term also matches as a prefix
+        type       - courses | questions (default: both)
+        page_size  - results per type, up to 100
+        offset
+    Response JSON:
+        {
+            "query": "data structures",
+            "courses": [{course object, "rank": 1.7}, ...],
+            "questions": [{question object, "rank": 0.9}, ...]
+        }
+    """
+    if request.method != 'GET':
+        return JsonResponse({"error": "Method not allowed"}, status=405)
+    query = request.GET.get('q', '').strip()
+    if not query:
+        return JsonResponse({"error": "q is required"}, status=400)
+    types = [request.GET['type']] if request.GET.get('type') else list(SEARCH_TYPES)
+    if any(name not in SEARCH_TYPES for name in types):
+        return JsonResponse({"error": "type must be 'courses' or 'questions'"}, status=400)
+    try:
+        offset = max(0, int(request.GET.get('offset', 0)))
+    except ValueError:
+        return JsonResponse({"error": "Invalid offset"}, status=400)
+
+    limit = get_page_size(request)
+    data = {"query": query}
+    for name in types:
+        model, representation = SEARCH_TYPES[name]
+        to_dict = representation.serializer()
+        data[name] = [
+            {**to_dict(row), "rank": rank}
+            for row, rank in _ranked(model, representation, query, limit, offset)
+        ]
+    return JsonResponse(data)
@@ -0,0 +1,22 @@
+from django.apps import AppConfig
+from django.db import connections
+from django.db.models.signals import pre_migrate
+
+
+def disable_statement_timeout(sender, using, **kwargs):
+    """
+    Lift DB_STATEMENT_TIMEOUT for the rest of the migrate run: index builds
+    and data migrations on big tables take longer than any web request
+    """
+    connection = connections[using]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SET statement_timeout = 0')
+
+
+class StaxApiConfig(AppConfig):
+    name = 'stax_api'
+    verbose_name = 'Stax API'
+
+    def ready(self):
+        pre_migrate.connect(disable_statement_timeout, dispatch_uid='stax_api.disable_statement_timeout')
@@ -0,0 +1,119 @@
+# stax_api/async_cache.py
+
+import asyncio
+import threading
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.cache.backends.redis import RedisCache
+
+
+class AsyncCache:
+    """
+    Async access to a configured cache through one process-wide client.
+
+    Under ASGI, caches[alias] gives every request task its own backend
+    instance (for Redis, its own connection pool), and the backends' a*()
+    methods hop onto the single sync thread. Instead this wraps one shared
+    instance:
+
+    - locmem: called directly, as it only takes an in-process lock
+    - redis: one redis.asyncio client on the server's event loop (the one
+      running in the main thread), with the same keys, serialization and
+      connection OPTIONS as the sync backend
+    - anything else (file), and redis from the short-lived loops
+      async_to_sync() starts under WSGI: the backend's own a*() methods
+
+    Keys and values are interchangeable with the sync cache API, so sync and
+    async views share entries and invalidations.
+    """
+
+    def __init__(self, alias):
+        self.backend = caches.create_connection(alias)
+        self.direct = isinstance(self.backend, LocMemCache)
+        self.redis = isinstance(self.backend, RedisCache)
+        self._lock = threading.Lock()
+        self._loop = None
+        self._redis = None
+
+    def _client(self):
+        """The redis.asyncio client for the running loop, or None to use the backend"""
+        if not self.redis or threading.current_thread() is not threading.main_thread():
+            # A loop in another thread is one async_to_sync() runs per call:
+            # a client (and its pool) made for it would outlive it
+            return None
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._loop is not loop:
+                import redis.asyncio
+
+                options = dict(self.backend._cache._pool_options)
+                # The sync client's parser class does not apply to asyncio connections
+                options.pop('parser_class', None)
+                # Writes go to the first server, so reads do as well
+                self._redis = redis.asyncio.Redis.from_url(self.backend._servers[0], **options)
+                self._loop = loop
+            return self._redis
+
+    @property
+    def _serializer(self):
+        return self.backend._cache._serializer
+
+    async def get(self, key, default=None):
+        if self.direct:
+            return self.backend.get(key, default)
+        client = self._client()
+        if client is None:
+            return await self.backend.aget(key, default)
+        value = await client.get(self.backend.make_and_validate_key(key))
+        return default if value is None else self._serializer.loads(value)
+
+    async def set(self, key, value, timeout=DEFAULT_TIMEOUT):
+        if self.direct:
+            return self.backend.set(key, value, timeout)
+        client = self._client()
+        if client is None:
+            return await self.backend.aset(key, value, timeout)
+        key = self.backend.make_and_validate_key(key)
+        timeout = self.backend.get_backend_timeout(timeout)
+        if timeout == 0:
+            await client.delete(key)
+        else:
+            await client.set(key, self._serializer.dumps(value), ex=timeout)
+
+    async def add(self, key, value, timeout=DEFAULT_TIMEOUT):
+        if self.direct:
+            return self.backend.add(key, value, timeout)
+        client = self._client()
+        if client is None:
+            return await self.backend.aadd(key, value, timeout)
+        key = self.backend.make_and_validate_key(key)
+        timeout = self.backend.get_backend_timeout(timeout)
+        added = bool(await client.set(key, self._serializer.dumps(value), ex=timeout or None, nx=True))
+        if added and timeout == 0:
+            await client.delete(key)
+        return added
+
+    async def delete(self, key):
+        if self.direct:
+            return self.backend.delete(key)
+        client = self._client()
+        if client is None:
+            return await self.backend.adelete(key)
+        return bool(await client.delete(self.backend.make_and_validate_key(key)))
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_async_cache(alias='default'):
+    """Process-wide AsyncCache for a CACHES alias"""
+    cache = _caches.get(alias)
+    if cache is None:
+        with _caches_lock:
+            cache = _caches.get(alias)
+            if cache is None:
+                cache = _caches[alias] = AsyncCache(alias)
+    return cache
@@ -0,0 +1,251 @@
+# stax_api/changelists.py
+
+import json
+
+from django.conf import settings
+from django.contrib.admin import AllValuesFieldListFilter, RelatedFieldListFilter
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.utils import get_fields_from_path
+from django.contrib.admin.views.main import ORDER_VAR, ChangeList
+from django.core.cache import caches
+from django.core.exceptions import FieldDoesNotExist
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections, models
+from django.utils.functional import cached_property
+
+from .pagination import InvalidCursor, _after, decode_cursor, encode_cursor
+
+DEFAULTS = {
+    # Above this many (estimated) rows, show the planner's estimate instead
+    # of running COUNT(*)
+    'ESTIMATE_THRESHOLD': 100_000,
+    # Seconds list_filter choices (distinct values, related objects) are cached
+    'FILTER_CACHE_TIMEOUT': 300,
+    'CACHE_ALIAS': 'default',
+    'KEY_PREFIX': 'admin-filter',
+}
+
+CURSOR_VAR = 'cursor'
+
+# Columns not worth reading for related objects shown in a changelist
+LARGE_FIELDS = (models.TextField, models.JSONField, models.BinaryField)
+
+
+def changelist_settings():
+    return {**DEFAULTS, **getattr(settings, 'STAX_ADMIN', {})}
+
+
+def estimate_count(queryset):
+    """
+    Row count of `queryset` from planner statistics, or None when the
+    database has none to offer. PostgreSQL estimates any query (pg_class for
+    a whole table, EXPLAIN otherwise); SQLite only whole tables, from the
+    sqlite_stat1 table ANALYZE / `sqlite_checkpoint --optimize` maintains.
+    """
+    connection = connections[queryset.db]
+    table = queryset.model._meta.db_table
+    filtered = queryset.query.has_filters() or queryset.query.distinct
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                if not filtered:
+                    cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [table])
+                    row = cursor.fetchone()
+                    # -1 means the table was never analyzed
+                    return row[0] if row and row[0] >= 0 else None
+                sql, params = queryset.order_by().query.sql_with_params()
+                cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+                plan = cursor.fetchone()[0]
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                return int(plan[0]['Plan']['Plan Rows'])
+            if connection.vendor == 'sqlite' and not filtered:
+                cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1', [table])
+                row = cursor.fetchone()
+                return int(row[0].split()[0]) if row else None
+    except DatabaseError:
+        return None
+    return None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that trusts planner estimates for big tables instead of counting"""
+
+    estimated = False
+
+    @cached_property
+    def count(self):
+        estimate = estimate_count(self.object_list)
+        if estimate is not None and estimate > changelist_settings()['ESTIMATE_THRESHOLD']:
+            self.estimated = True
+            return estimate
+        return super().count
+
+
+def _cached_choices(key, compute):
+    config = changelist_settings()
+    cache = caches[config['CACHE_ALIAS']]
+    key = f"{config['KEY_PREFIX']}:{key}"
+    choices = cache.get(key)
+    if choices is None:
+        choices = list(compute())
+        cache.set(key, choices, config['FILTER_CACHE_TIMEOUT'])
+    return choices
+
+
+class CachedAllValuesFieldListFilter(AllValuesFieldListFilter):
+    """AllValuesFieldListFilter without a DISTINCT scan on every page load"""
+
+    def __init__(self, field, request, params, model, model_admin, field_path):
+        super().__init__(field, request, params, model, model_admin, field_path)
+        lookup_choices = self.lookup_choices
+        self.lookup_choices = _cached_choices(f'{model._meta.label_lower}:{field_path}', lambda: lookup_choices)
+
+
+class CachedRelatedFieldListFilter(RelatedFieldListFilter):
+    """RelatedFieldListFilter with the related objects' choices cached"""
+
+    def field_choices(self, field, request, model_admin):
+        compute = super().field_choices
+        return _cached_choices(
+            f'{field.model._meta.label_lower}:{field.name}:related',
+            lambda: compute(field, request, model_admin),
+        )
+
+
+class KeysetChangeList(ChangeList):
+    """
+    ChangeList paging by the admin's default ordering with a cursor instead
+    of OFFSET, so the millionth page costs what the first does. Sorting by
+    another column falls back to numbered pages.
+    """
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(CURSOR_VAR, None)
+        return lookup_params
+
+    def get_query_string(self, new_params=None, remove=None):
+        # Filters, searches and sorting start again from the first page
+        if CURSOR_VAR not in (new_params or {}):
+            remove = [*(remove or []), CURSOR_VAR]
+        return super().get_query_string(new_params, remove)
+
+    def keyset_ordering(self):
+        """The default ordering plus a pk tiebreaker, or None when keyset paging does not apply"""
+        if ORDER_VAR in self.params or self.show_all:
+            return None
+        ordering = list(self.model_admin.ordering or self.lookup_opts.ordering or [])
+        names = [name.lstrip('-') for name in ordering]
+        for name in names:
+            if name == 'pk':
+                continue
+            try:
+                field = self.lookup_opts.get_field(name)
+            except FieldDoesNotExist:
+                return None
+            if field.is_relation:
+                return None
+        if not {'pk', self.lookup_opts.pk.name} & set(names):
+            ordering.append('-pk')
+        return ordering
+
+    def apply_select_related(self, qs):
+        qs = super().apply_select_related(qs)
+        related = self.list_select_related
+        if related and related is not True:
+            deferred = [
+                f'{name}__{field.name}'
+                for name in related if '__' not in name
+                for field in self.lookup_opts.get_field(name).related_model._meta.concrete_fields
+                if isinstance(field, LARGE_FIELDS)
+            ]
+            if deferred:
+                qs = qs.defer(*deferred)
+        return qs
+
+    def get_results(self, request):
+        self.keyset = self.keyset_ordering()
+        if self.keyset is None:
+            super().get_results(request)
+            self.result_count_estimated = getattr(self.paginator, 'estimated', False)
+            return
+
+        paginator = self.model_admin.get_paginator(request, self.queryset, self.list_per_page)
+        queryset = self.queryset.order_by(*self.keyset)
+        cursor = self.params.get(CURSOR_VAR)
+        if cursor:
+            try:
+                queryset = queryset.filter(_after(self.keyset, decode_cursor(cursor, len(self.keyset))))
+            except InvalidCursor:
+                raise IncorrectLookupParameters
+        result_list = queryset[:self.list_per_page]
+        rows = list(result_list)
+
+        self.next_page_url = None
+        if len(rows) == self.list_per_page:
+            values = [getattr(rows[-1], name.lstrip('-')) for name in self.keyset]
+            if queryset.filter(_after(self.keyset, values)).exists():
+                self.next_page_url = self.get_query_string({CURSOR_VAR: encode_cursor(values)})
+        self.first_page_url = self.get_query_string(remove=[CURSOR_VAR]) if cursor else None
+
+        self.result_count = paginator.count
+        self.result_count_estimated = getattr(paginator, 'estimated', False)
+        self.show_full_result_count = self.model_admin.show_full_result_count
+        self.full_result_count = self.root_queryset.count() if self.show_full_result_count else None
+        self.show_admin_actions = not self.show_full_result_count or bool(self.full_result_count)
+        self.result_list = result_list
+        self.can_show_all = False
+        self.multi_page = bool(self.next_page_url or cursor)
+        self.paginator = paginator
+
+
+class ChangelistPerformanceMixin:
+    """
+    ModelAdmin mixin for big tables:
+
+    - foreign keys shown in list_display are joined explicitly (nullable
+      ones included, which Django's automatic select_related() skips), with
+      their large text/JSON columns deferred;
+    - counts above ESTIMATE_THRESHOLD come from planner statistics, and the
+      unfiltered total is not counted separately;
+    - list_filter choices for plain and foreign key fields are cached;
+    - pages follow a cursor over the admin's ordering instead of OFFSET
+      (index that ordering, with the pk as tiebreaker).
+    """
+
+    change_list_template = 'admin/keyset_change_list.html'
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
+
+    def get_list_select_related(self, request):
+        if self.list_select_related is not False:
+            return self.list_select_related
+        related = []
+        for name in self.list_display:
+            try:
+                field = self.model._meta.get_field(name)
+            except FieldDoesNotExist:
+                continue
+            if field.many_to_one or field.one_to_one:
+                if name != field.attname:
+                    related.append(name)
+        return related
+
+    def get_list_filter(self, request):
+        return [self._cached_filter(item) for item in super().get_list_filter(request)]
+
+    def _cached_filter(self, item):
+        if not isinstance(item, str):
+            return item
+        field = get_fields_from_path(self.model, item)[-1]
+        if field.many_to_one:
+            return (item, CachedRelatedFieldListFilter)
+        if field.is_relation or field.choices or isinstance(
+            field, (models.BooleanField, models.DateField, models.DateTimeField)
+        ):
+            return item
+        return (item, CachedAllValuesFieldListFilter)
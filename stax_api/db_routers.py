@@ -0,0 +1,191 @@
+# stax_api/db_routers.py
+
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from .async_cache import get_async_cache
+
+DEFAULTS = {
+    # Apps whose reads may go to a replica
+    'REPLICA_APPS': ['accounts', 'courses', 'questions'],
+    # Seconds a client reads from the primary after it wrote something;
+    # keep it above the usual replication lag
+    'STICKY_SECONDS': 10,
+    'COOKIE_NAME': 'stax_primary',
+    'CACHE_ALIAS': 'default',
+    'KEY_PREFIX': 'primary',
+}
+
+
+def routing_settings():
+    return {**DEFAULTS, **getattr(settings, 'STAX_DB_ROUTING', {})}
+
+
+def replica_aliases():
+    return [alias for alias in settings.DATABASES if alias.startswith('replica_')]
+
+
+class _RequestState:
+    """
+    Per-request routing state. Held by reference in a context variable, so
+    writes made in copied contexts (sync_to_async) are still seen by the
+    middleware.
+    """
+
+    def __init__(self, request):
+        self.request = request
+        self.wrote = False
+        self._pinned = None
+        self._user_id = False
+
+    def user_id(self):
+        """User id from a valid Bearer token, without loading the user"""
+        if self._user_id is False:
+            self._user_id = None
+            header = self.request.META.get('HTTP_AUTHORIZATION', '').split()
+            if len(header) == 2 and header[0] == 'Bearer':
+                from rest_framework_simplejwt.exceptions import TokenError
+                from rest_framework_simplejwt.settings import api_settings
+                from rest_framework_simplejwt.tokens import AccessToken
+
+                try:
+                    self._user_id = AccessToken(header[1])[api_settings.USER_ID_CLAIM]
+                except (TokenError, KeyError):
+                    pass
+        return self._user_id
+
+    def pinned(self):
+        """Whether this client wrote recently, by cookie or by its token's user id"""
+        if self._pinned is None:
+            config = routing_settings()
+            self._pinned = config['COOKIE_NAME'] in self.request.COOKIES
+            if not self._pinned and self.user_id() is not None:
+                self._pinned = bool(caches[config['CACHE_ALIAS']].get(_sticky_key(self.user_id())))
+        return self._pinned
+
+
+_request_state = ContextVar('stax_db_request_state', default=None)
+_force_primary = ContextVar('stax_db_force_primary', default=False)
+
+
+def _sticky_key(user_id):
+    return f"{routing_settings()['KEY_PREFIX']}:{user_id}"
+
+
+@contextmanager
+def use_primary():
+    """Send every read in the block to the primary, e.g. before a security check"""
+    token = _force_primary.set(True)
+    try:
+        yield
+    finally:
+        _force_primary.reset(token)
+
+
+class ReplicaRouter:
+    """
+    Send reads of REPLICA_APPS models to a random read replica; everything
+    else, and all writes, use 'default'.
+
+    Reads stay on the primary inside a transaction (so select_for_update()
+    and read-modify-write sequences see their own writes), inside
+    use_primary(), when following an instance that came from the primary,
+    and for STICKY_SECONDS after the same client wrote anything (see
+    PrimaryStickinessMiddleware), so users never read their own changes
+    back from a lagging replica.
+    """
+
+    def __init__(self):
+        self.replicas = replica_aliases()
+        self.apps = set(routing_settings()['REPLICA_APPS'])
+
+    def db_for_read(self, model, **hints):
+        if not self.replicas or model._meta.app_label not in self.apps:
+            return None
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        if _force_primary.get() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        state = _request_state.get()
+        if state is not None and state.pinned():
+            return DEFAULT_DB_ALIAS
+        return random.choice(self.replicas)
+
+    def db_for_write(self, model, **hints):
+        state = _request_state.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class PrimaryStickinessMiddleware:
+    """
+    Track writes per request and pin the client to the primary afterwards:
+    browsers through a short-lived cookie, token clients through a cache
+    entry keyed by the user id in their access token. Not loaded when no
+    replicas are configured. Runs natively under both WSGI and ASGI.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not replica_aliases():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def _set_cookie(self, request, response):
+        config = routing_settings()
+        response.set_cookie(
+            config['COOKIE_NAME'], '1', max_age=config['STICKY_SECONDS'],
+            secure=request.is_secure(), httponly=True, samesite='Lax',
+        )
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state = _RequestState(request)
+        token = _request_state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_state.reset(token)
+        if state.wrote:
+            self._set_cookie(request, response)
+            if state.user_id() is not None:
+                config = routing_settings()
+                caches[config['CACHE_ALIAS']].set(_sticky_key(state.user_id()), 1, config['STICKY_SECONDS'])
+        return response
+
+    async def __acall__(self, request):
+        state = _RequestState(request)
+        token = _request_state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_state.reset(token)
+        if state.wrote:
+            self._set_cookie(request, response)
+            if state.user_id() is not None:
+                config = routing_settings()
+                await get_async_cache(config['CACHE_ALIAS']).set(
+                    _sticky_key(state.user_id()), 1, config['STICKY_SECONDS']
+                )
+        return response
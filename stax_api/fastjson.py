@@ -0,0 +1,139 @@
+# stax_api/fastjson.py
+
+import decimal
+import json
+
+from django.conf import settings
+from django.http import HttpResponse
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder as DRFJSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+DEFAULTS = {
+    # 'auto' picks orjson, then msgspec, then the standard library. msgspec
+    # only parses: it encodes timedelta and bytes its own way, so responses
+    # are encoded by the standard library with it
+    'BACKEND': 'auto',
+}
+
+
+def json_settings():
+    return {**DEFAULTS, **getattr(settings, 'STAX_JSON', {})}
+
+
+def available_backends():
+    return ['json'] + [name for name, module in (('orjson', orjson), ('msgspec', msgspec)) if module]
+
+
+def encode_backends():
+    return ['json'] + (['orjson'] if orjson else [])
+
+
+def _backend(name=None):
+    name = name or json_settings()['BACKEND']
+    if name == 'auto':
+        return 'orjson' if orjson else 'msgspec' if msgspec else 'json'
+    return name
+
+
+class Encoder(DRFJSONEncoder):
+    """
+    DRF's encoder (datetimes in full precision with 'Z' for UTC, querysets,
+    generators, bytes, tolist()), with Decimal as a string as DRF's
+    DecimalField and Django's JsonResponse render it. It is also orjson's
+    `default`, so both backends convert everything the same way.
+    """
+
+    def default(self, o):
+        if isinstance(o, decimal.Decimal):
+            return str(o)
+        return super().default(o)
+
+
+_encoder = Encoder(separators=(',', ':'), ensure_ascii=False)
+_default = _encoder.default
+
+
+def _escape(data):
+    # \u2028 and \u2029 are valid JSON but end lines in JavaScript; escape
+    # them as DRF's renderer does
+    if b'\xe2\x80\xa8' in data or b'\xe2\x80\xa9' in data:
+        data = data.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
+    return data
+
+
+_msgspec_decoder = msgspec.json.Decoder() if msgspec else None
+
+
+def dumps(data, backend=None):
+    """Compact UTF-8 JSON bytes of `data`"""
+    if _backend(backend) == 'orjson':
+        try:
+            return _escape(orjson.dumps(data, default=_default, option=orjson.OPT_UTC_Z))
+        except TypeError:
+            # Non-string dict keys, integers beyond 64 bits and the like: the
+            # standard library accepts more
+            pass
+    return _escape(_encoder.encode(data).encode())
+
+
+def loads(data, backend=None):
+    """Parse JSON bytes or str; raises ValueError on malformed input"""
+    backend = _backend(backend)
+    if backend == 'orjson':
+        return orjson.loads(data)
+    if backend == 'msgspec':
+        try:
+            return _msgspec_decoder.decode(data)
+        except msgspec.DecodeError as e:
+            raise ValueError(str(e))
+    return json.loads(data)
+
+
+class JsonResponse(HttpResponse):
+    """Drop-in for django.http.JsonResponse encoding through dumps()"""
+
+    def __init__(self, data, safe=True, **kwargs):
+        if safe and not isinstance(data, dict):
+            raise TypeError('In order to allow non-dict objects to be serialized set the safe parameter to False.')
+        kwargs.setdefault('content_type', 'application/json')
+        super().__init__(content=dumps(data), **kwargs)
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer through dumps(); indented output (browsable API) keeps the stdlib path"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+        return dumps(data)
+
+
+class FastJSONParser(JSONParser):
+    """JSONParser through loads()"""
+
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        data = stream.read() if stream is not None else b''
+        if encoding.lower().replace('-', '') != 'utf8':
+            data = data.decode(encoding)
+        try:
+            return loads(data)
+        except ValueError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
@@ -0,0 +1,140 @@
+# stax_api/fieldsets.py
+
+from functools import lru_cache
+from operator import attrgetter
+
+
+class InvalidFields(ValueError):
+    """Raised when ?fields= or ?expand= names something we do not serve"""
+
+
+class Field:
+    """One output field: the model fields it reads and how to render it"""
+
+    __slots__ = ('columns', 'get')
+
+    def __init__(self, columns, get):
+        self.columns = tuple(columns)
+        self.get = get
+
+
+def column(name):
+    """A field rendered straight from the model attribute of the same name"""
+    return Field([name], attrgetter(name))
+
+
+def file_url(name):
+    """A FileField/ImageField rendered as its URL, or None when empty"""
+
+    def get(obj):
+        value = getattr(obj, name)
+        return value.url if value else None
+    return Field([name], get)
+
+
+class Expansion:
+    """
+    A related object rendered inline when asked for with ?expand=, through
+    the related model's representation restricted to `fields`
+    """
+
+    def __init__(self, relation, representation, fields=None):
+        self.relation = relation
+        self.representation = representation
+        self.fields = tuple(fields or representation.default)
+
+
+class Representation:
+    """
+    The public fields of a model and the relations that can be expanded.
+
+    A request picks a selection with ?fields=a,b,c and ?expand=x,y; without
+    ?fields= the `default` fields are served with `default_expand` expanded,
+    so existing clients see the full shape. A field that can be expanded is
+    rendered as the related id unless it is expanded.
+
+    Each selection is compiled once into a plain function building the dict,
+    and pushed down to the queryset as only()/select_related() so unused
+    columns and joins are never read.
+    """
+
+    def __init__(self, fields, expansions=None, default=None, default_expand=()):
+        self.fields = fields
+        self.expansions = expansions or {}
+        self.default = tuple(default or fields)
+        self.default_expand = tuple(default_expand)
+
+    def select(self, params):
+        """Validated (fields, expand) tuples from a request's query string"""
+        fields = _names(params.get('fields'))
+        expand = _names(params.get('expand'))
+        if expand is None and 'expand' in params:
+            # An empty ?expand= turns the default expansions off
+            expand = ()
+        unknown = [name for name in fields or () if name not in self.fields]
+        if unknown:
+            raise InvalidFields(f"Unknown field '{unknown[0]}'")
+        unknown = [name for name in expand or () if name not in self.expansions]
+        if unknown:
+            raise InvalidFields(f"Cannot expand '{unknown[0]}'")
+        if fields is None:
+            return self.default, expand if expand is not None else self.default_expand
+        return fields, expand or ()
+
+    def default_selection(self):
+        return self.default, self.default_expand
+
+    def serializer(self, selection=None):
+        """The compiled dict builder for a selection (default: the full shape)"""
+        return _compile(self, *(selection or self.default_selection()))
+
+    def columns(self, selection=None):
+        """Model fields a selection reads, for only()"""
+        fields, expand = selection or self.default_selection()
+        columns = []
+        for name in fields:
+            if name in expand:
+                expansion = self.expansions[name]
+                columns.append(expansion.relation)
+                nested = expansion.representation.columns((expansion.fields, ()))
+                columns.extend(f'{expansion.relation}__{col}' for col in nested)
+            else:
+                columns.extend(self.fields[name].columns)
+        return columns
+
+    def apply(self, queryset, selection=None, keep=()):
+        """
+        Restrict `queryset` to the columns and joins a selection needs; `keep`
+        lists extra model fields read by the view, e.g. the pagination keys
+        """
+        fields, expand = selection or self.default_selection()
+        related = [self.expansions[name].relation for name in expand if name in fields]
+        columns = self.columns((fields, expand)) + [name.lstrip('-') for name in keep]
+        return queryset.select_related(*related).only(*dict.fromkeys(columns))
+
+
+def _names(value):
+    names = tuple(dict.fromkeys(name.strip() for name in (value or '').split(',') if name.strip()))
+    return names or None
+
+
+def _expanded(expansion):
+    get_related = attrgetter(expansion.relation)
+    to_dict = expansion.representation.serializer((expansion.fields, ()))
+
+    def get(obj):
+        related = get_related(obj)
+        return to_dict(related) if related is not None else None
+    return get
+
+
+@lru_cache(maxsize=256)
+def _compile(representation, fields, expand):
+    getters = tuple(
+        (name, _expanded(representation.expansions[name]) if name in expand else representation.fields[name].get)
+        for name in fields
+    )
+
+    def to_dict(obj):
+        return {name: get(obj) for name, get in getters}
+    return to_dict
@@ -0,0 +1,162 @@
+# stax_api/images.py
+
+import hashlib
+import io
+import logging
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from . import object_cache
+from .tasks import submit
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    # (width, height) per rendition name; images are cropped to fill
+    'RENDITIONS': {
+        'accounts.user.profile_image': {'thumb': (64, 64), 'small': (160, 160), 'medium': (320, 320)},
+        'courses.course.instructor_image': {'thumb': (64, 64), 'small': (160, 160)},
+        'courses.course.thumbnail_image': {'small': (320, 180), 'medium': (640, 360), 'large': (1280, 720)},
+    },
+    'FORMATS': ['webp', 'jpeg'],
+    'QUALITY': 80,
+    'MAX_PIXELS': 40_000_000,  # larger uploads are left unprocessed
+    'DIRECTORY': 'renditions',
+}
+
+SAVE_OPTIONS = {
+    'webp': {'format': 'WEBP', 'method': 4},
+    'jpeg': {'format': 'JPEG', 'optimize': True, 'progressive': True},
+}
+
+
+def image_settings():
+    return {**DEFAULTS, **getattr(settings, 'STAX_IMAGES', {})}
+
+
+def renditions_field(field_name):
+    """Name of the JSONField holding the renditions of an image field"""
+    return f'{field_name}_renditions'
+
+
+def _encode(image, fmt, quality):
+    if fmt == 'jpeg' and image.mode != 'RGB':
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A') if 'A' in image.getbands() else None)
+        image = background
+    buffer = io.BytesIO()
+    # Nothing from the original's info (EXIF, ICC, XMP) is passed on
+    image.save(buffer, quality=quality, **SAVE_OPTIONS[fmt])
+    return buffer.getvalue()
+
+
+def _store(data, ext):
+    """Save under a content-addressed name; identical renditions share a file"""
+    digest = hashlib.sha256(data).hexdigest()[:32]
+    name = f"{image_settings()['DIRECTORY']}/{digest[:2]}/{digest}.{ext}"
+    if not default_storage.exists(name):
+        name = default_storage.save(name, ContentFile(data))
+    return name
+
+
+def load_image(field_file):
+    """Decode a stored image, upright and in RGB(A), refusing oversized ones"""
+    with field_file.open('rb') as handle:
+        with Image.open(handle) as original:
+            if original.width * original.height > image_settings()['MAX_PIXELS']:
+                raise ValueError(f'{field_file.name} is {original.width}x{original.height}, above MAX_PIXELS')
+            image = ImageOps.exif_transpose(original)
+            return image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+
+
+def renditions_from_image(image, sizes, source, crop=True):
+    """
+    Store every size of `image` in every format.
+
+    Sizes are filled and cropped, or with crop=False scaled to fit inside.
+    Returns {'source': source, <size>: {<format>: <storage name>}}.
+    """
+    config = image_settings()
+    renditions = {'source': source}
+    for size_name, size in sizes.items():
+        if crop:
+            resized = ImageOps.fit(image, size, Image.Resampling.LANCZOS)
+        else:
+            resized = ImageOps.contain(image, size, Image.Resampling.LANCZOS)
+        renditions[size_name] = {
+            fmt: _store(_encode(resized, fmt, config['QUALITY']), 'jpg' if fmt == 'jpeg' else fmt)
+            for fmt in config['FORMATS']
+        }
+    return renditions
+
+
+def make_renditions(field_file, sizes):
+    """Decode an uploaded image once and store every size in every format"""
+    return renditions_from_image(load_image(field_file), sizes, field_file.name)
+
+
+def rendition_urls(renditions):
+    """{size: {format: url}} for a stored renditions dict"""
+    return {
+        size_name: {fmt: default_storage.url(name) for fmt, name in formats.items()}
+        for size_name, formats in (renditions or {}).items()
+        if size_name != 'source'
+    }
+
+
+def process_image(label, pk, field_name):
+    """Background task: build renditions for one image field of one row"""
+    model = apps.get_model(label)
+    instance = model.objects.filter(pk=pk).only('pk', field_name).first()
+    if instance is None:
+        return
+    field_file = getattr(instance, field_name)
+    if not field_file:
+        return
+    sizes = image_settings()['RENDITIONS'][f'{label.lower()}.{field_name}']
+    try:
+        renditions = make_renditions(field_file, sizes)
+    except (OSError, UnidentifiedImageError, ValueError, Image.DecompressionBombError) as e:
+        logger.warning('Could not build renditions for %s %s %s: %s', label, pk, field_name, e)
+        return
+    # Only if the image was not replaced in the meantime; update() skips
+    # post_save, so this does not schedule another run
+    updated = model.objects.filter(pk=pk, **{field_name: field_file.name}).update(
+        **{renditions_field(field_name): renditions}
+    )
+    if updated:
+        object_cache.invalidate(label.lower(), pk)
+
+
+def schedule_renditions(instance, field_names, update_fields=None):
+    """
+    post_save helper: queue rendition builds for image fields whose file
+    changed since the renditions were made, and drop renditions of cleared
+    fields. Fields that were not saved or loaded are skipped.
+    """
+    label = instance._meta.label
+    deferred = instance.get_deferred_fields()
+    cleared = {}
+    for field_name in field_names:
+        if update_fields is not None and field_name not in update_fields:
+            continue
+        if field_name in deferred or renditions_field(field_name) in deferred:
+            continue
+        field_file = getattr(instance, field_name)
+        renditions = getattr(instance, renditions_field(field_name)) or {}
+        if not field_file:
+            if renditions:
+                cleared[renditions_field(field_name)] = {}
+        elif renditions.get('source') != field_file.name:
+            transaction.on_commit(
+                lambda field_name=field_name: submit(process_image, label, instance.pk, field_name)
+            )
+    if cleared:
+        type(instance).objects.filter(pk=instance.pk).update(**cleared)
+        for name, value in cleared.items():
+            setattr(instance, name, value)
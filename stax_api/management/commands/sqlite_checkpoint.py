@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+class Command(BaseCommand):
+    help = 'Checkpoint the SQLite write-ahead log into the database file (run from cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+        parser.add_argument(
+            '--mode', default='PASSIVE', choices=['PASSIVE', 'FULL', 'RESTART', 'TRUNCATE'],
+            help='PASSIVE never blocks; TRUNCATE waits for writers and also shrinks the WAL file',
+        )
+        parser.add_argument(
+            '--optimize', action='store_true',
+            help='Also run PRAGMA optimize and merge the segments of every FTS5 index (e.g. the search app\'s)',
+        )
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        if connection.vendor != 'sqlite':
+            raise CommandError(f"Database '{options['database']}' is not SQLite")
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            if cursor.fetchone()[0].lower() != 'wal':
+                raise CommandError('The database is not in WAL mode (see DB_SQLITE_WAL)')
+            if options['optimize']:
+                cursor.execute(
+                    "SELECT name FROM sqlite_master WHERE type = 'table' AND sql LIKE 'CREATE VIRTUAL TABLE%USING fts5%'"
+                )
+                for table in [row[0] for row in cursor.fetchall()]:
+                    table = connection.ops.quote_name(table)
+                    cursor.execute(f"INSERT INTO {table}({table}) VALUES ('optimize')")
+                cursor.execute('PRAGMA optimize')
+            cursor.execute(f"PRAGMA wal_checkpoint({options['mode']})")
+            busy, log_frames, checkpointed = cursor.fetchone()
+        if busy:
+            self.stdout.write(self.style.WARNING(
+                f'Checkpointed {checkpointed} of {log_frames} WAL frames; readers or a writer blocked the rest'
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Checkpointed {checkpointed} of {log_frames} WAL frames'))
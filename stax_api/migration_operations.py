@@ -0,0 +1,30 @@
+# stax_api/migration_operations.py
+
+from django.db import migrations
+
+
+def _concurrently(schema_editor):
+    return {'concurrently': True} if schema_editor.connection.vendor == 'postgresql' else {}
+
+
+class AddIndexConcurrently(migrations.AddIndex):
+    """
+    AddIndex that builds the index with CREATE INDEX CONCURRENTLY on
+    PostgreSQL, so writes to a big table carry on while it is built; a
+    plain AddIndex on other databases. The migration must set
+    `atomic = False`. A build that fails on PostgreSQL leaves an INVALID
+    index to drop before migrating again.
+
+    django.contrib.postgres's operation of the same name cannot be used as
+    it needs psycopg installed even on SQLite.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            schema_editor.add_index(model, self.index, **_concurrently(schema_editor))
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            schema_editor.remove_index(model, self.index, **_concurrently(schema_editor))
@@ -0,0 +1,135 @@
+# stax_api/object_cache.py
+
+import threading
+import uuid
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.http import HttpResponse
+
+from .async_cache import get_async_cache
+
+DEFAULTS = {
+    'CACHE_ALIAS': 'default',
+    'TIMEOUT': 300,
+    'KEY_PREFIX': 'obj',
+}
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def cache_settings():
+    return {**DEFAULTS, **getattr(settings, 'STAX_OBJECT_CACHE', {})}
+
+
+def _cache():
+    return caches[cache_settings()['CACHE_ALIAS']]
+
+
+def _version_key(label, pk):
+    return f"{cache_settings()['KEY_PREFIX']}:ver:{label}:{pk}"
+
+
+def version(label, pk):
+    """
+    Current version stamp of an object. Read it before loading the object
+    and store the response under it, so a write that lands in between makes
+    the entry unreachable rather than cached under the newer stamp.
+
+    Stamps are random rather than counters: if the stamp itself is evicted, a
+    fresh one is minted and older entries simply become unreachable instead
+    of being served again.
+    """
+    cache = _cache()
+    key = _version_key(label, pk)
+    version = cache.get(key)
+    if version is None:
+        version = uuid.uuid4().hex
+        if not cache.add(key, version, timeout=None):
+            version = cache.get(key) or version
+    return version
+
+
+async def aversion(label, pk):
+    """version() for async views"""
+    cache = get_async_cache(cache_settings()['CACHE_ALIAS'])
+    key = _version_key(label, pk)
+    version = await cache.get(key)
+    if version is None:
+        version = uuid.uuid4().hex
+        if not await cache.add(key, version, timeout=None):
+            version = await cache.get(key) or version
+    return version
+
+
+def _key(label, pk, version, variant):
+    return f"{cache_settings()['KEY_PREFIX']}:{label}:{pk}:{version}:{variant}"
+
+
+def invalidate(label, pk):
+    """
+    Make every cached entry for one object stale once the current
+    transaction commits: before that, readers still see the old row and
+    would cache it under the new stamp
+    """
+    key = _version_key(label, pk)
+    transaction.on_commit(lambda: _cache().set(key, uuid.uuid4().hex, timeout=None))
+
+
+def _count(label, outcome):
+    with _stats_lock:
+        _stats[(label, outcome)] += 1
+
+
+def stats():
+    """Hit/miss counts per model label for this process"""
+    with _stats_lock:
+        labels = {label for label, _ in _stats}
+        return {
+            label: {'hits': _stats[(label, 'hit')], 'misses': _stats[(label, 'miss')]}
+            for label in sorted(labels)
+        }
+
+
+def _hit(label, content):
+    if content is None:
+        _count(label, 'miss')
+        return None
+    _count(label, 'hit')
+    response = HttpResponse(content, content_type='application/json')
+    response['X-Cache'] = 'HIT'
+    return response
+
+
+def get_response(label, pk, version, variant=''):
+    """Return the JSON response cached for an object at `version`, or None on a miss"""
+    return _hit(label, _cache().get(_key(label, pk, version, variant)))
+
+
+def set_response(label, pk, response, version, variant=''):
+    """
+    Store a rendered 200 response under the `version` read before the
+    object was loaded; entries expire after TIMEOUT seconds
+    """
+    if response.status_code == 200:
+        _cache().set(_key(label, pk, version, variant), response.content, cache_settings()['TIMEOUT'])
+        response['X-Cache'] = 'MISS'
+    return response
+
+
+async def aget_response(label, pk, version, variant=''):
+    """get_response() for async views"""
+    cache = get_async_cache(cache_settings()['CACHE_ALIAS'])
+    return _hit(label, await cache.get(_key(label, pk, version, variant)))
+
+
+async def aset_response(label, pk, response, version, variant=''):
+    """set_response() for async views"""
+    if response.status_code == 200:
+        cache = get_async_cache(cache_settings()['CACHE_ALIAS'])
+        await cache.set(_key(label, pk, version, variant), response.content, cache_settings()['TIMEOUT'])
+        response['X-Cache'] = 'MISS'
+    return response
@@ -0,0 +1,117 @@
+# stax_api/pagination.py
+
+import base64
+import binascii
+import datetime
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+MAX_PAGE_SIZE = 100
+
+
+class InvalidCursor(ValueError):
+    """Raised when a client sends a cursor we did not issue"""
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    """DjangoJSONEncoder truncates microseconds, which would skip rows"""
+
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def encode_cursor(values):
+    """Encode the keyset values of the last row into an opaque cursor"""
+    raw = json.dumps(values, cls=CursorEncoder, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, length):
+    """Decode a cursor produced by encode_cursor"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, ValueError, UnicodeDecodeError):
+        raise InvalidCursor('Invalid cursor')
+    if not isinstance(values, list) or len(values) != length:
+        raise InvalidCursor('Invalid cursor')
+    return values
+
+
+def get_page_size(request):
+    """Read ?page_size= falling back to REST_FRAMEWORK['PAGE_SIZE']"""
+    default = settings.REST_FRAMEWORK.get('PAGE_SIZE', 20)
+    try:
+        size = int(request.GET.get('page_size', default))
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def _after(ordering, values):
+    """Build the WHERE clause selecting rows strictly after `values`"""
+    condition = Q()
+    for index in reversed(range(len(ordering))):
+        field = ordering[index].lstrip('-')
+        lookup = 'lt' if ordering[index].startswith('-') else 'gt'
+        step = Q(**{f'{field}__{lookup}': values[index]})
+        if index < len(ordering) - 1:
+            step |= Q(**{field: values[index]}) & condition
+        condition = step
+    return condition
+
+
+def _keyset_page(request, queryset, ordering):
+    """The ordered, cursor-filtered slice of page_size + 1 rows"""
+    page_size = get_page_size(request)
+    queryset = queryset.order_by(*ordering)
+
+    cursor = request.GET.get('cursor')
+    if cursor:
+        try:
+            queryset = queryset.filter(_after(ordering, decode_cursor(cursor, len(ordering))))
+        except (TypeError, ValueError, ValidationError):
+            # Values that do not fit the ordering's columns, e.g. a cursor
+            # issued before the ordering changed
+            raise InvalidCursor('Invalid cursor')
+    return queryset[:page_size + 1], page_size
+
+
+def _next_page(request, rows, ordering, page_size):
+    """Trim the extra row and build the next-page URL from the last one"""
+    next_url = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last = rows[-1]
+        values = [
+            last[field.lstrip('-')] if isinstance(last, dict) else getattr(last, field.lstrip('-'))
+            for field in ordering
+        ]
+        params = request.GET.copy()
+        params['cursor'] = encode_cursor(values)
+        next_url = request.build_absolute_uri(f'{request.path}?{params.urlencode()}')
+    return rows, next_url
+
+
+def paginate_keyset(request, queryset, ordering):
+    """
+    Seek-method pagination over `ordering` (e.g. ['-created_at', '-id']).
+
+    The last ordering field must be unique so that rows are never skipped or
+    repeated. Cost is independent of page depth as long as an index matches
+    the ordering. Returns (rows, next_url).
+    """
+    page, page_size = _keyset_page(request, queryset, ordering)
+    return _next_page(request, list(page), ordering, page_size)
+
+
+async def apaginate_keyset(request, queryset, ordering):
+    """paginate_keyset() for async views, fetching through the async ORM"""
+    page, page_size = _keyset_page(request, queryset, ordering)
+    return _next_page(request, [row async for row in page], ordering, page_size)
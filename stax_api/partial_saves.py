@@ -0,0 +1,38 @@
+# stax_api/partial_saves.py
+
+from django.core.exceptions import FieldDoesNotExist
+
+
+def changed_columns(obj, names):
+    """
+    update_fields for saving `names` (form or request fields) on `obj`:
+    their concrete columns plus auto_now timestamps. Many-to-many and
+    unknown names are left out.
+    """
+    opts = obj._meta
+    columns = []
+    for name in names:
+        try:
+            field = opts.get_field(name)
+        except FieldDoesNotExist:
+            continue
+        if field.concrete and not field.many_to_many and not field.primary_key:
+            columns.append(field.name)
+    columns += [field.name for field in opts.concrete_fields if getattr(field, 'auto_now', False)]
+    return list(dict.fromkeys(columns))
+
+
+class PartialSaveAdminMixin:
+    """
+    ModelAdmin mixin saving only the columns the change form edited, so
+    counters and other columns maintained elsewhere are not written back
+    with the values they had when the form was loaded. Additions are
+    inserted as usual.
+    """
+
+    def save_model(self, request, obj, form, change):
+        if not change:
+            return super().save_model(request, obj, form, change)
+        columns = changed_columns(obj, form.changed_data)
+        if columns:
+            obj.save(update_fields=columns)
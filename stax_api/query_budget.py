@@ -0,0 +1,193 @@
+# stax_api/query_budget.py
+
+import logging
+import os
+import re
+import sys
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ENABLED': True,
+    # 'log' a warning or 'raise' QueryBudgetExceeded (turning the request into a 500)
+    'ACTION': 'log',
+    # Queries allowed per request unless BUDGETS names the view; None for no limit
+    'DEFAULT_BUDGET': 50,
+    # URL name (with namespace, e.g. 'admin:index') -> queries allowed
+    'BUDGETS': {},
+    # The same query shape this many times in one request is reported as an N+1
+    'REPEAT_THRESHOLD': 5,
+    # URL names or namespaces that are not checked
+    'EXEMPT': [],
+}
+
+_IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+_VALUES_LIST = re.compile(r'VALUES (?:\([^()]*\), )*\([^()]*\)')
+
+
+def budget_settings():
+    return {**DEFAULTS, **getattr(settings, 'STAX_QUERY_BUDGET', {})}
+
+
+class QueryBudgetExceeded(AssertionError):
+    """A request or block ran more queries than its budget, or an N+1"""
+
+
+def _shape(sql):
+    """SQL with variable-length parameter lists collapsed, so loops over different ids match"""
+    return _VALUES_LIST.sub('VALUES (...)', _IN_LIST.sub('IN (...)', sql))
+
+
+def _caller():
+    """'file:line in function' of the innermost frame in project code"""
+    root = str(settings.BASE_DIR) + os.sep
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(root) and 'site-packages' not in filename and filename != __file__:
+            return f'{os.path.relpath(filename, root)}:{frame.f_lineno} in {frame.f_code.co_name}'
+        frame = frame.f_back
+    return 'unknown'
+
+
+class QueryLog:
+    """Queries run while recording: the total and, per query shape, a count and where it first ran"""
+
+    def __init__(self):
+        self.count = 0
+        self.shapes = {}
+
+    def record(self, sql):
+        self.count += 1
+        shape = _shape(sql)
+        entry = self.shapes.get(shape)
+        if entry is None:
+            self.shapes[shape] = [1, _caller()]
+        else:
+            entry[0] += 1
+
+    def repeated(self, threshold):
+        """(count, location, shape) of shapes run at least `threshold` times, most first"""
+        return sorted(
+            ((count, location, shape) for shape, (count, location) in self.shapes.items() if count >= threshold),
+            reverse=True,
+        )
+
+    def problems(self, budget=None, threshold=None):
+        """Human-readable budget and N+1 violations; empty when within limits"""
+        problems = []
+        if budget is not None and self.count > budget:
+            problems.append(f'{self.count} queries, budget is {budget}')
+        for count, location, shape in self.repeated(threshold or budget_settings()['REPEAT_THRESHOLD']):
+            problems.append(f'N+1: {count}x at {location}: {shape[:200]}')
+        return problems
+
+
+# Active logs, innermost last: a test's query_budget() still sees the
+# queries of a request the middleware is recording too
+_current = ContextVar('stax_query_logs', default=())
+
+
+def _record(execute, sql, params, many, context):
+    for log in _current.get():
+        log.record(sql)
+    return execute(sql, params, many, context)
+
+
+def _install(connection, **kwargs):
+    # Outermost, so it stays put when connection.execute_wrapper() blocks
+    # push and pop their own wrappers
+    if _record not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, _record)
+
+
+# Every connection opened from now on records while a log is active; the
+# log itself lives in a context variable so queries run through
+# sync_to_async are attributed to the request that awaited them
+connection_created.connect(_install)
+
+
+@contextmanager
+def record_queries():
+    """Collect the queries run in the block, on every database alias, into a QueryLog"""
+    for connection in connections.all(initialized_only=True):
+        _install(connection)
+    log = QueryLog()
+    token = _current.set(_current.get() + (log,))
+    try:
+        yield log
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def query_budget(max_queries=None, repeat_threshold=None):
+    """
+    Test helper: raise QueryBudgetExceeded if the block runs more than
+    `max_queries` queries or repeats one query shape `repeat_threshold`
+    times (REPEAT_THRESHOLD by default), listing where each ran. Usable as
+    a context manager or a decorator.
+    """
+    with record_queries() as log:
+        yield log
+    problems = log.problems(max_queries, repeat_threshold)
+    if problems:
+        raise QueryBudgetExceeded('\n'.join(problems))
+
+
+class QueryBudgetMiddleware:
+    """
+    Count the queries of every request and check them against the view's
+    budget and for N+1 patterns; violations are logged (or raised, with
+    ACTION 'raise') with the code locations that issued the queries.
+    Under DEBUG the count is returned in an X-Query-Count header.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not budget_settings()['ENABLED']:
+            raise MiddlewareNotUsed
+        for connection in connections.all(initialized_only=True):
+            _install(connection)
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with record_queries() as log:
+            response = self.get_response(request)
+        return self._check(request, response, log)
+
+    async def __acall__(self, request):
+        with record_queries() as log:
+            response = await self.get_response(request)
+        return self._check(request, response, log)
+
+    def _check(self, request, response, log):
+        if settings.DEBUG:
+            response['X-Query-Count'] = str(log.count)
+        config = budget_settings()
+        match = request.resolver_match
+        view_name = match.view_name if match else None
+        if match is None or view_name in config['EXEMPT'] or match.namespace in config['EXEMPT']:
+            return response
+        problems = log.problems(config['BUDGETS'].get(view_name, config['DEFAULT_BUDGET']), config['REPEAT_THRESHOLD'])
+        if not problems:
+            return response
+        message = f"{request.method} {request.path} ({view_name}): " + '; '.join(problems)
+        if config['ACTION'] == 'raise':
+            raise QueryBudgetExceeded(message)
+        logger.warning('Query budget exceeded: %s', message)
+        return response
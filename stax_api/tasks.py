@@ -0,0 +1,69 @@
+# stax_api/tasks.py
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'WORKERS': 4,
+    'MAX_QUEUE': 1000,  # queued + running tasks before submit() runs inline
+    'EAGER': False,     # run every task inline, e.g. in tests
+}
+
+
+def task_settings():
+    return {**DEFAULTS, **getattr(settings, 'STAX_TASKS', {})}
+
+
+_executor = None
+_slots = None
+_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor, _slots
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                config = task_settings()
+                _slots = threading.BoundedSemaphore(config['MAX_QUEUE'])
+                _executor = ThreadPoolExecutor(config['WORKERS'], thread_name_prefix='stax-task')
+    return _executor
+
+
+def _run(fn, args, kwargs):
+    close_old_connections()
+    try:
+        fn(*args, **kwargs)
+    except Exception:
+        logger.exception('Background task %s failed', getattr(fn, '__name__', fn))
+    finally:
+        close_old_connections()
+
+
+def submit(fn, *args, **kwargs):
+    """
+    Run fn(*args, **kwargs) on the in-process background pool.
+
+    For short side effects (bookkeeping rows, cache warming) that should not
+    hold up the response. When the queue is full the task runs inline rather
+    than being dropped, which doubles as back-pressure. Tasks are lost if the
+    process dies, so anything that must survive belongs in the database.
+    """
+    if task_settings()['EAGER']:
+        fn(*args, **kwargs)
+        return
+    executor = _get_executor()
+    if not _slots.acquire(blocking=False):
+        fn(*args, **kwargs)
+        return
+
+    def release(future):
+        _slots.release()
+
+    executor.submit(_run, fn, args, kwargs).add_done_callback(release)
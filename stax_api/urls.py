@@ -22,6 +22,7 @@ urlpatterns = [
     path('api/auth/', include('accounts.urls')),
     path('api/courses/', include('courses.urls')),
     path('api/questions/', include('questions.urls')),
+    path('api/search/', include('search.urls')),
 
     # Swagger UI
     path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),